@@ -210,6 +210,47 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERYD_PREFETCH_MULTIPLIER = 2
 
 
+# Cache settings (shared by all the CUBE processes, e.g. compute resource auth tokens)
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': 'redis://dragonflydb:6379/1',
+    }
+}
+
+
+# Plugin instance admission control settings
+
+# maximum number of plugin instances of a user concurrently running (-1 is unlimited)
+MAX_ACTIVE_PLUGIN_INSTANCES_PER_USER = -1
+# fair share weights by username (users not listed have weight 1)
+PLUGIN_INSTANCE_FAIR_SHARE_WEIGHTS = {}
+
+
+# Compute resource placement settings
+
+# strategy used to choose a plugin instance's compute resource when none is requested:
+# 'first', 'least_active', 'weighted_capacity', 'data_locality' or a dotted class path
+COMPUTE_RESOURCE_PLACEMENT_STRATEGY = 'first'
+
+
+# Copy job prefetch settings
+
+# start the copy jobs of a plugin instance's children while its output files are
+# being registered in the DB instead of after it has finished
+PLUGIN_INSTANCE_COPY_PREFETCH = False
+
+# seconds that the ChRIS instance, compute resources, plugins and plugin parameters
+# are cached in each process (changes are seen immediately by the changing process)
+REFERENCE_DATA_CACHE_TIMEOUT = 60
+
+# seconds of the lease on a plugin instance's output files registration lock, the
+# registering worker renews it every third of this time and a crashed worker's lease
+# is taken over by another worker once it expires
+PLUGIN_INSTANCE_LOCK_LEASE_SECONDS = 60
+
+
 # LDAP auth configuration
 AUTH_LDAP = True
 if AUTH_LDAP:
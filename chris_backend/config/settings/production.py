@@ -4,6 +4,8 @@ Production Configurations
 
 """
 
+from urllib.parse import urlsplit
+
 import ldap
 from django_auth_ldap.config import LDAPSearch, GroupOfNamesType
 from .common import *  # noqa
@@ -194,6 +196,65 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERYD_PREFETCH_MULTIPLIER = 2
 
 
+# CACHE SETTINGS
+# ------------------------------------------------------------------------------
+# shared by all the CUBE processes (e.g. compute resource auth tokens, lease locks),
+# it must not be the Celery broker's Redis DB as clearing the cache flushes the DB
+def _get_redis_db(url):
+    """Get the (host, port, db index) of a Redis URL (db 0 when not given)."""
+    parts = urlsplit(url)
+    return parts.hostname, parts.port or 6379, parts.path.strip('/') or '0'
+
+
+DJANGO_CACHE_URL = get_secret('DJANGO_CACHE_URL')
+if _get_redis_db(DJANGO_CACHE_URL) == _get_redis_db(CELERY_BROKER_URL):
+    raise ImproperlyConfigured('DJANGO_CACHE_URL must point to a different Redis DB '
+                               'than CELERY_BROKER_URL')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': DJANGO_CACHE_URL,
+    }
+}
+
+
+# PLUGIN INSTANCE ADMISSION CONTROL
+# ------------------------------------------------------------------------------
+# maximum number of plugin instances of a user concurrently running (-1 is unlimited)
+MAX_ACTIVE_PLUGIN_INSTANCES_PER_USER = get_secret('MAX_ACTIVE_PLUGIN_INSTANCES_PER_USER',
+                                                  env.int, default=-1)
+# fair share weights by username, e.g. 'alice=2,bob=0.5' (users not listed have weight 1)
+PLUGIN_INSTANCE_FAIR_SHARE_WEIGHTS = get_secret('PLUGIN_INSTANCE_FAIR_SHARE_WEIGHTS',
+                                                env.dict, default={})
+
+
+# COMPUTE RESOURCE PLACEMENT
+# ------------------------------------------------------------------------------
+# strategy used to choose a plugin instance's compute resource when none is requested:
+# 'first', 'least_active', 'weighted_capacity', 'data_locality' or a dotted class path
+COMPUTE_RESOURCE_PLACEMENT_STRATEGY = get_secret('COMPUTE_RESOURCE_PLACEMENT_STRATEGY',
+                                                 default='first')
+
+
+# COPY JOB PREFETCH
+# ------------------------------------------------------------------------------
+# start the copy jobs of a plugin instance's children while its output files are
+# being registered in the DB instead of after it has finished
+PLUGIN_INSTANCE_COPY_PREFETCH = get_secret('PLUGIN_INSTANCE_COPY_PREFETCH', env.bool,
+                                           default=False)
+
+# seconds that the ChRIS instance, compute resources, plugins and plugin parameters
+# are cached in each process (changes are seen immediately by the changing process)
+REFERENCE_DATA_CACHE_TIMEOUT = get_secret('REFERENCE_DATA_CACHE_TIMEOUT', env.int,
+                                          default=60)
+
+# seconds of the lease on a plugin instance's output files registration lock, the
+# registering worker renews it every third of this time and a crashed worker's lease
+# is taken over by another worker once it expires
+PLUGIN_INSTANCE_LOCK_LEASE_SECONDS = get_secret('PLUGIN_INSTANCE_LOCK_LEASE_SECONDS',
+                                                env.int, default=60)
+
+
 # REVERSE PROXY
 # ------------------------------------------------------------------------------
 SECURE_PROXY_SSL_HEADER = get_secret('DJANGO_SECURE_PROXY_SSL_HEADER', env.list)
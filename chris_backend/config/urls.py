@@ -21,6 +21,7 @@ from django.conf import settings
 from drf_spectacular.views import SpectacularAPIView, SpectacularRedocView, SpectacularSwaggerView
 
 from plugins import admin as plugin_admin_views
+from plugininstances import admin as plugininstance_admin_views
 
 
 urlpatterns = [
@@ -39,6 +40,14 @@ urlpatterns = [
          plugin_admin_views.ComputeResourceAdminDetail.as_view(),
          name='admin-computeresource-detail'),
 
+    path('chris-admin/api/v1/admission/',
+         plugininstance_admin_views.PluginInstanceAdmissionAdminDetail.as_view(),
+         name='admin-admission-detail'),
+
+    path('chris-admin/api/v1/timing/',
+         plugininstance_admin_views.PluginInstanceTimingAdminDetail.as_view(),
+         name='admin-timing-detail'),
+
     path('chris-admin/', admin.site.urls),
 
     path('api/', include('core.api')),
@@ -442,6 +442,10 @@ urlpatterns = format_suffix_patterns([
          plugininstance_views.PluginInstanceSplitDetail.as_view(),
          name='plugininstancesplit-detail'),
 
+    path('v1/plugins/instances/<int:pk>/callback/',
+         plugininstance_views.PluginInstanceJobStatusCallback.as_view(),
+         name='plugininstance-callback'),
+
     path('v1/plugins/instances/<int:pk>/descendants/',
          plugininstance_views.PluginInstanceDescendantList.as_view(),
          name='plugininstance-descendant-list'),
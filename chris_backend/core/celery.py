@@ -26,15 +26,26 @@ task_routes = {
     'plugininstances.tasks.sum': {'queue': 'main1'},
     'plugininstances.tasks.run_plugin_instance_job': {'queue': 'main1'},
     'plugininstances.tasks.check_plugin_instance_job_exec_status': {'queue': 'main2'},
+    'plugininstances.tasks.handle_plugin_instance_job_status_callback':
+        {'queue': 'main2'},
+    'plugininstances.tasks.check_compute_resource_jobs_exec_status':
+        {'queue': 'main2'},
+    'plugininstances.tasks.schedule_new_plugin_instances': {'queue': 'main2'},
+    'plugininstances.tasks.schedule_plugin_instance_dependents': {'queue': 'main2'},
+    'plugininstances.tasks.prefetch_plugin_instance_dependents': {'queue': 'main2'},
     'plugininstances.tasks.cancel_plugin_instance_job': {'queue': 'main2'},
+    'plugininstances.tasks.resume_plugin_instance_files_registration':
+        {'queue': 'main2'},
     'plugininstances.tasks.delete_plugin_instance_containers_from_remote': {'queue': 'main2'},
+    'plugininstances.tasks.delete_compute_resource_containers_from_remote':
+        {'queue': 'main2'},
     'plugininstances.tasks.schedule_waiting_plugin_instances':
         {'queue': 'periodic'},
     'plugininstances.tasks.check_running_plugin_instances_exec_status':
         {'queue': 'periodic'},
     'plugininstances.tasks.cancel_waiting_plugin_instances':
         {'queue': 'periodic'},
-    'plugininstances.tasks.cancel_plugin_instances_stuck_in_lock':
+    'plugininstances.tasks.resume_plugin_instances_with_expired_lock':
         {'queue': 'periodic'},
     'plugininstances.tasks.cancel_plugin_instances_stuck_in_scheduled_status':
         {'queue': 'periodic'},
@@ -58,6 +69,14 @@ POLL_INTERVAL = float(os.getenv('CUBE_CELERY_POLL_INTERVAL', '5.0'))
 How often to poll for plugin instance status changes.
 """
 
+RECONCILE_INTERVAL = float(os.getenv('CUBE_CELERY_RECONCILE_INTERVAL',
+                                     str(POLL_INTERVAL)))
+"""
+How often to sweep all the running plugin instances to reconcile their status with
+the remote compute. When the remote compute posts job status callbacks this can be
+set to a much longer interval than POLL_INTERVAL.
+"""
+
 # setup periodic tasks
 app.conf.beat_schedule = {
     'schedule-waiting-plugin-instances-every-45-seconds': {
@@ -66,7 +85,7 @@ app.conf.beat_schedule = {
     },
     'check-running-plugin-instances-exec-status-every-30-seconds': {
         'task': 'plugininstances.tasks.check_running_plugin_instances_exec_status',
-        'schedule': POLL_INTERVAL,
+        'schedule': RECONCILE_INTERVAL,
     },
     'cancel-waiting-plugin-instances-every-30-seconds': {
         'task': 'plugininstances.tasks.cancel_waiting_plugin_instances',
@@ -76,9 +95,9 @@ app.conf.beat_schedule = {
         'task': 'plugininstances.tasks.handle_remote_cleanup',
         'schedule': 60.0,
     },
-    'cancel-plugin-instances-stuck-in-lock-every-7200-seconds': {
-        'task': 'plugininstances.tasks.cancel_plugin_instances_stuck_in_lock',
-        'schedule': 7200.0,
+    'resume-plugin-instances-with-expired-lock-every-30-seconds': {
+        'task': 'plugininstances.tasks.resume_plugin_instances_with_expired_lock',
+        'schedule': 30.0,
     },
     'cancel-plugin-instances-stuck-in-scheduled_status-every-7200-seconds': {
         'task': 'plugininstances.tasks.cancel_plugin_instances_stuck_in_scheduled_status',
@@ -0,0 +1,261 @@
+"""
+Distributed lease lock module that provides a lock stored in the Dragonfly/Redis
+instance used as the Django cache. A lock is held for a limited lease time that is
+periodically renewed by its holder, so a crashed holder never blocks other processes
+for longer than the lease. Every successful acquisition atomically gets a fencing token
+that increases in acquisition order, so a holder can check before a protected write
+that nobody has acquired the lock after it.
+"""
+
+import logging
+import threading
+import time
+import uuid
+from functools import wraps
+
+import redis
+
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+
+# only allocate a fencing token if the lock was acquired
+ACQUIRE_SCRIPT = """
+if redis.call('set', KEYS[1], ARGV[1], 'NX', 'PX', ARGV[2]) then
+    return redis.call('incr', KEYS[2])
+end
+return 0
+"""
+
+# the lock is still held with the caller's value and hasn't been acquired since then
+CHECK_FENCING_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] and redis.call('get', KEYS[2]) == ARGV[2] then
+    return 1
+end
+return 0
+"""
+
+# only renew/delete the lock if it's still held with the caller's value
+RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+_client = None
+
+
+def get_redis_client():
+    """
+    Get the process-level client for the Dragonfly/Redis instance storing the locks.
+    """
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.CACHES['default']['LOCATION'])
+    return _client
+
+
+class LeaseLock(object):
+    """
+    ``LeaseLock`` is a distributed lock acquired with SET NX PX. While held, a
+    background thread renews the lease every third of its duration. Lock wait and
+    hold times are accumulated in a Redis hash per lock name.
+    """
+
+    def __init__(self, name: str, lease_seconds: float = 60, client=None):
+        self.name = name
+        self.lease_ms = int(lease_seconds * 1000)
+        self.client = client or get_redis_client()
+        self.key = f'lease_lock:{name}'
+        self.value = None
+        self.fencing_token = None
+        self.lost = False
+        self._acquired_at = None
+        self._stop_renewal = threading.Event()
+        self._renewal_thread = None
+
+    def __enter__(self):
+        if not self.acquire():
+            raise RuntimeError(f'Could not acquire lease lock {self.name}')
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+    def acquire(self, blocking: bool = False, timeout: float = 10) -> bool:
+        """
+        Try to acquire the lock. If blocking then keep trying for at most timeout
+        seconds. Returns True if the lock was acquired.
+        """
+        start = time.perf_counter()
+        deadline = start + timeout
+        value = uuid.uuid4().hex
+
+        while True:
+            fencing_token = self.client.eval(ACQUIRE_SCRIPT, 2, self.key,
+                                             self.key + ':fencing', value, self.lease_ms)
+            if fencing_token:
+                break
+            if not blocking or time.perf_counter() >= deadline:
+                self._record_metrics(skipped=1,
+                                     wait_seconds=time.perf_counter() - start)
+                return False
+            time.sleep(0.05)
+
+        self.value = value
+        self.fencing_token = int(fencing_token)
+        self.lost = False
+        self._acquired_at = time.perf_counter()
+        self._record_metrics(acquired=1, wait_seconds=self._acquired_at - start)
+        self._start_renewal()
+        return True
+
+    def renew(self) -> bool:
+        """
+        Extend the lease of a held lock. Returns False if the lock is no longer held
+        by this instance (the lease expired and someone else might hold it).
+        """
+        renewed = self.client.eval(RENEW_SCRIPT, 1, self.key, self.value,
+                                   self.lease_ms)
+        if not renewed:
+            self.lost = True
+            logger.warning(f'Lost lease lock {self.name} with fencing token '
+                           f'{self.fencing_token}')
+        return bool(renewed)
+
+    def release(self):
+        """
+        Release the lock if it's still held by this instance.
+        """
+        if self.value is None:
+            return
+        self._stop_renewal.set()
+        if self._renewal_thread is not None:
+            self._renewal_thread.join()
+            self._renewal_thread = None
+
+        self.client.eval(RELEASE_SCRIPT, 1, self.key, self.value)
+        self._record_metrics(hold_seconds=time.perf_counter() - self._acquired_at,
+                             lost=int(self.lost))
+        self.value = None
+
+    def is_held(self) -> bool:
+        """
+        Check whether the lock is still held by this instance.
+        """
+        return self.value is not None and self.client.get(
+            self.key) == self.value.encode()
+
+    def check_fencing_token(self) -> bool:
+        """
+        Check right before a write protected by the lock that the lock is still held
+        by this instance and that its fencing token is still the latest one, that is
+        the lease didn't expire and the lock wasn't acquired by another process since.
+        """
+        if self.value is None:
+            return False
+        return bool(self.client.eval(CHECK_FENCING_SCRIPT, 2, self.key,
+                                     self.key + ':fencing', self.value,
+                                     self.fencing_token))
+
+    def get_metrics(self) -> dict:
+        """
+        Get the accumulated metrics for this lock name.
+        """
+        return get_lease_lock_metrics(self.name, self.client)
+
+    def _start_renewal(self):
+        """
+        Internal method to start the background thread renewing the lease.
+        """
+        self._stop_renewal.clear()
+        interval = self.lease_ms / 3000
+
+        def renew_until_stopped():
+            while not self._stop_renewal.wait(interval):
+                try:
+                    if not self.renew():
+                        break
+                except redis.RedisError as e:
+                    logger.warning(f'Error renewing lease lock {self.name}, detail: '
+                                   f'{str(e)}')
+
+        self._renewal_thread = threading.Thread(target=renew_until_stopped,
+                                                daemon=True)
+        self._renewal_thread.start()
+
+    def _record_metrics(self, acquired=0, skipped=0, lost=0, wait_seconds=0.0,
+                        hold_seconds=None):
+        """
+        Internal method to accumulate the lock metrics in Redis.
+        """
+        key = f'lease_lock_metrics:{self.name}'
+        try:
+            pipe = self.client.pipeline()
+            if acquired:
+                pipe.hincrby(key, 'acquired', acquired)
+            if skipped:
+                pipe.hincrby(key, 'skipped', skipped)
+            if lost:
+                pipe.hincrby(key, 'lost', lost)
+            pipe.hincrbyfloat(key, 'wait_seconds_total', wait_seconds)
+            if hold_seconds is not None:
+                pipe.hincrbyfloat(key, 'hold_seconds_total', hold_seconds)
+                pipe.hset(key, 'hold_seconds_last', hold_seconds)
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f'Error recording metrics for lease lock {self.name}, '
+                           f'detail: {str(e)}')
+
+
+def get_lease_lock_metrics(name: str, client=None) -> dict:
+    """
+    Get the accumulated acquisition counts and wait/hold times for a lock name.
+    """
+    client = client or get_redis_client()
+    metrics = client.hgetall(f'lease_lock_metrics:{name}')
+    d_metrics = {'acquired': 0, 'skipped': 0, 'lost': 0, 'wait_seconds_total': 0.0,
+                 'hold_seconds_total': 0.0, 'hold_seconds_last': 0.0}
+    for field, value in metrics.items():
+        field = field.decode()
+        d_metrics[field] = type(d_metrics.get(field, 0.0))(float(value))
+    return d_metrics
+
+
+def skip_if_locked(lease_seconds: float = 60):
+    """
+    Decorator that ensures a task is only running once across all workers by holding
+    a distributed lease lock named after the task while it runs. Concurrent runs skip
+    the task instead of waiting for the lock.
+    """
+    def decorator(f):
+        lock_name = f'{f.__module__}.{f.__name__}'
+
+        @wraps(f)
+        def wrapped(*args, **kwargs):
+            lock = LeaseLock(lock_name, lease_seconds)
+            try:
+                acquired = lock.acquire()
+            except redis.RedisError as e:
+                logger.error(f'Could not reach lock store for task {lock_name}, '
+                             f'skipping, detail: {str(e)}')
+                return None
+            if not acquired:
+                logger.info('task %s is running elsewhere, skipping', lock_name)
+                return None
+            try:
+                return f(*args, **kwargs)
+            finally:
+                lock.release()
+        return wrapped
+    return decorator
@@ -413,6 +413,54 @@ class ChrisFolder(AsyncDeletableModel):
             .first()
         )
 
+    @classmethod
+    def ensure_tree(cls, paths, owner):
+        """
+        Custom class method to make sure that all the folders with the passed paths and
+        all their ancestors exist in the DB. Existing folders are fetched with a single
+        query and the missing ones are created in bulk (one query per tree level) with
+        their parents wired in. Returns a dictionary mapping each path in the tree to
+        its folder object.
+        """
+        all_paths = set()
+        for path in paths:
+            if path.startswith('/') or path.endswith('/'):
+                raise ValueError('Paths starting or ending with slashes are not allowed.')
+
+            while path not in all_paths:
+                all_paths.add(path)
+                if not path:
+                    break
+                path = os.path.dirname(path)
+
+        folders = {f.path: f for f in cls.objects.filter(path__in=all_paths)}
+
+        levels = {}
+        for path in all_paths.difference(folders):
+            depth = path.count('/') + 1 if path else 0
+            levels.setdefault(depth, []).append(path)
+
+        chris_user = None
+        for depth in sorted(levels):
+            new_folders = []
+            for path in levels[depth]:
+                folder_owner = owner
+                if path in ('', 'home', 'PUBLIC', 'SHARED') or path.startswith(
+                        ('PIPELINES', 'SERVICES')):
+                    if chris_user is None:
+                        chris_user = User.objects.get(username='chris')
+                    folder_owner = chris_user
+
+                parent = folders[os.path.dirname(path)] if path else None
+                new_folders.append(cls(path=path, owner=folder_owner, parent=parent))
+
+            # a concurrent task may have created some of these folders in the meantime
+            cls.objects.bulk_create(new_folders, update_conflicts=True,
+                                    update_fields=['path'], unique_fields=['path'])
+            for folder in new_folders:
+                folders[folder.path] = folder
+        return folders
+
 
 @receiver(post_delete, sender=ChrisFolder)
 def auto_delete_folder_from_storage(sender, instance, **kwargs):
@@ -1,7 +1,7 @@
 
 from pathlib import Path
 import shutil
-from typing import Union, List, Dict, AnyStr, Optional
+from typing import Union, List, Dict, AnyStr, Optional, Iterator
 
 from core.storage.storagemanager import StorageManager
 
@@ -29,6 +29,20 @@ class FilesystemManager(StorageManager):
         all_paths = (self.__base / path_prefix).rglob('*')
         return [str(p.relative_to(self.__base)) for p in all_paths if p.is_file()]
 
+    def ls_pages(self, path_prefix: str, page_size: int = 1000) -> Iterator[List[str]]:
+        if self.obj_exists(path_prefix):
+            yield [path_prefix]
+            return
+        page = []
+        for p in (self.__base / path_prefix).rglob('*'):
+            if p.is_file():
+                page.append(str(p.relative_to(self.__base)))
+                if len(page) == page_size:
+                    yield page
+                    page = []
+        if page:
+            yield page
+
     def path_exists(self, path: str) -> bool:
         return (self.__base / path).exists()
 
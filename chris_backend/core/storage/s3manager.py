@@ -13,7 +13,7 @@ MD5 hashes. We disable this via botocore.config.Config below.
 import logging
 import time
 from pathlib import Path
-from typing import Dict, List, AnyStr, Optional
+from typing import Dict, List, AnyStr, Optional, Iterator
 
 import boto3
 from botocore.config import Config
@@ -109,6 +109,26 @@ class S3Manager(StorageManager):
                 break
         return l_ls
 
+    def ls_pages(self, path: str, page_size: int = 1000) -> Iterator[List[str]]:
+        """
+        Yield the object keys in the bucket with the given path as prefix in pages of
+        at most page_size keys, one list request per page.
+        """
+        if not path:
+            return
+        client = self.__get_client()
+        paginator = client.get_paginator('list_objects_v2')
+        pages = paginator.paginate(Bucket=self.bucket_name, Prefix=path,
+                                   PaginationConfig={'PageSize': page_size})
+        try:
+            for page in pages:
+                keys = [obj['Key'] for obj in page.get('Contents', [])]
+                if keys:
+                    yield keys
+        except ClientError as e:
+            logger.error(str(e))
+            raise
+
     def path_exists(self, path: str) -> bool:
         """
         Return True if any objects exist under the given path prefix.
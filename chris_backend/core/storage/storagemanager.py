@@ -1,6 +1,6 @@
 
 import abc
-from typing import List, Dict, AnyStr, Optional
+from typing import List, Dict, AnyStr, Optional, Iterator
 
 
 class StorageManager(abc.ABC):
@@ -28,6 +28,13 @@ class StorageManager(abc.ABC):
         """
         ...
 
+    def ls_pages(self, path_prefix: str, page_size: int = 1000) -> Iterator[List[str]]:
+        """
+        :returns: an iterator over lists of at most page_size files under a given path
+        prefix, so a large listing never needs to be held in memory at once.
+        """
+        ...
+
     def path_exists(self, path: str) -> bool:
         """
         :returns: True if path exists (whether it be a directory OR file)
@@ -6,7 +6,7 @@ import logging
 import os
 import time
 from pathlib import Path
-from typing import Dict
+from typing import Dict, Iterator, List
 
 from swiftclient import Connection
 from swiftclient.exceptions import ClientException
@@ -85,6 +85,33 @@ class SwiftManager(StorageManager):
                     break
         return l_ls
 
+    def ls_pages(self, path, page_size: int = 1000) -> Iterator[List[str]]:
+        """
+        Yield the objects in the swift storage with the provided path as a prefix in
+        pages of at most page_size names, one listing request per page.
+        """
+        if not path:
+            return
+        conn = self.__get_connection()
+        marker = ''
+        while True:
+            for i in range(5):
+                try:
+                    ld_obj = conn.get_container(self.container_name, prefix=path,
+                                                marker=marker, limit=page_size)[1]
+                except ClientException as e:
+                    logger.error(str(e))
+                    if i == 4:
+                        raise
+                    time.sleep(0.4)
+                else:
+                    break
+            if not ld_obj:
+                return
+            page = [d_obj['name'] for d_obj in ld_obj]
+            yield page
+            marker = page[-1]
+
     def path_exists(self, path):
         """
         Return True/False if passed path exists in swift storage.
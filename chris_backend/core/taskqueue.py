@@ -0,0 +1,109 @@
+"""
+Task queue module that provides enqueue-once de-duplication of celery tasks and
+queue-depth metrics. A task enqueued through ``enqueue_once`` is not enqueued again
+with the same arguments while a previous one is still queued or running, which bounds
+the backlog of periodic fan-out tasks by the number of distinct arguments.
+"""
+
+import logging
+
+import redis
+
+from django.conf import settings
+
+from .leaselock import get_redis_client
+
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_DEDUPE_TTL = 300  # seconds after which a lost task's key expires anyway
+
+# kombu's redis transport stores each queue in a list per priority step
+PRIORITY_STEPS = (0, 3, 6, 9)
+PRIORITY_SEP = '\x06\x16'
+
+_broker_client = None
+
+
+def get_broker_client():
+    """
+    Get the process-level client for the celery broker.
+    """
+    global _broker_client
+    if _broker_client is None:
+        _broker_client = redis.Redis.from_url(settings.CELERY_BROKER_URL)
+    return _broker_client
+
+
+def enqueue_once(task, *args, ttl: int = DEFAULT_DEDUPE_TTL) -> bool:
+    """
+    Enqueue a celery task unless the same task with the same arguments is already
+    queued or running. The task's de-duplication key must be cleared when it ends
+    (see ``clear_enqueue_once``). Returns True if the task was enqueued.
+    """
+    key = _get_dedupe_key(task.name, args)
+    client = get_redis_client()
+    try:
+        enqueued = client.set(key, 1, nx=True, ex=ttl)
+        client.hincrby(_get_metrics_key(task.name),
+                       'enqueued' if enqueued else 'skipped', 1)
+    except redis.RedisError as e:
+        logger.warning(f'Could not de-duplicate task {task.name}{args}, detail: '
+                       f'{str(e)}')
+        enqueued = True
+
+    if enqueued:
+        try:
+            task.delay(*args)
+        except Exception:
+            # the task was not queued so it must not be suppressed until the key expires
+            clear_enqueue_once(task.name, args)
+            raise
+    return bool(enqueued)
+
+
+def clear_enqueue_once(task_name: str, args):
+    """
+    Clear the de-duplication key of a task enqueued with ``enqueue_once`` so it can
+    be enqueued again.
+    """
+    try:
+        get_redis_client().delete(_get_dedupe_key(task_name, args))
+    except redis.RedisError as e:
+        logger.warning(f'Could not clear de-duplication key for task {task_name}'
+                       f'{tuple(args)}, detail: {str(e)}')
+
+
+def get_queue_depths(queues) -> dict:
+    """
+    Get the number of messages waiting in each of the passed celery queues.
+    """
+    client = get_broker_client()
+    pipe = client.pipeline()
+    for queue in queues:
+        for pri in PRIORITY_STEPS:
+            pipe.llen(f'{queue}{PRIORITY_SEP}{pri}' if pri else queue)
+    lengths = pipe.execute()
+
+    n = len(PRIORITY_STEPS)
+    return {queue: sum(lengths[i * n:(i + 1) * n]) for i, queue in enumerate(queues)}
+
+
+def get_enqueue_once_metrics(task_name: str) -> dict:
+    """
+    Get the number of enqueued and skipped (duplicate) runs of a task enqueued with
+    ``enqueue_once``.
+    """
+    metrics = get_redis_client().hgetall(_get_metrics_key(task_name))
+    d_metrics = {'enqueued': 0, 'skipped': 0}
+    d_metrics.update({field.decode(): int(value) for field, value in metrics.items()})
+    return d_metrics
+
+
+def _get_dedupe_key(task_name: str, args) -> str:
+    return f'task_dedupe:{task_name}:' + ':'.join(str(arg) for arg in args)
+
+
+def _get_metrics_key(task_name: str) -> str:
+    return f'task_dedupe_metrics:{task_name}'
@@ -0,0 +1,115 @@
+
+import logging
+import time
+import uuid
+
+from django.test import SimpleTestCase
+
+from core.leaselock import (LeaseLock, get_redis_client, get_lease_lock_metrics,
+                            skip_if_locked)
+
+
+class LeaseLockTests(SimpleTestCase):
+
+    def setUp(self):
+        # avoid cluttered console output
+        logging.disable(logging.WARNING)
+        self.name = f'test_lock_{uuid.uuid4().hex}'
+        self.client = get_redis_client()
+
+    def tearDown(self):
+        self.client.delete(f'lease_lock:{self.name}', f'lease_lock:{self.name}:fencing',
+                           f'lease_lock_metrics:{self.name}')
+        # re-enable logging
+        logging.disable(logging.NOTSET)
+
+    def test_acquire_is_exclusive(self):
+        lock1 = LeaseLock(self.name)
+        lock2 = LeaseLock(self.name)
+        self.assertTrue(lock1.acquire())
+        self.assertFalse(lock2.acquire())
+        lock1.release()
+        self.assertTrue(lock2.acquire())
+        lock2.release()
+
+    def test_fencing_tokens_increase(self):
+        lock = LeaseLock(self.name)
+        lock.acquire()
+        token1 = lock.fencing_token
+        lock.release()
+        lock.acquire()
+        self.assertGreater(lock.fencing_token, token1)
+        lock.release()
+
+    def test_fencing_tokens_follow_acquisition_order(self):
+        lock1 = LeaseLock(self.name)
+        lock1.acquire()
+        lock2 = LeaseLock(self.name)
+        self.assertFalse(lock2.acquire())  # a failed attempt doesn't allocate a token
+        self.assertIsNone(lock2.fencing_token)
+        lock1.release()
+        self.assertTrue(lock2.acquire())
+        self.assertEqual(lock2.fencing_token, lock1.fencing_token + 1)
+        lock2.release()
+
+    def test_check_fencing_token(self):
+        lock1 = LeaseLock(self.name, lease_seconds=0.3)
+        lock1.acquire()
+        self.assertTrue(lock1.check_fencing_token())
+        lock1._stop_renewal.set()  # simulate a stalled holder
+        time.sleep(0.5)
+        lock2 = LeaseLock(self.name)
+        lock2.acquire()
+        self.assertFalse(lock1.check_fencing_token())
+        self.assertTrue(lock2.check_fencing_token())
+        lock1.release()
+        lock2.release()
+        self.assertFalse(lock2.check_fencing_token())
+
+    def test_lease_is_renewed_while_held(self):
+        lock = LeaseLock(self.name, lease_seconds=0.3)
+        lock.acquire()
+        time.sleep(0.6)
+        self.assertTrue(lock.is_held())
+        lock.release()
+        self.assertFalse(lock.is_held())
+
+    def test_release_does_not_delete_lock_held_by_another_holder(self):
+        lock1 = LeaseLock(self.name, lease_seconds=0.3)
+        lock1.acquire()
+        lock1._stop_renewal.set()  # simulate a stalled holder
+        time.sleep(0.5)
+        lock2 = LeaseLock(self.name)
+        self.assertTrue(lock2.acquire())
+        lock1.release()
+        self.assertTrue(lock2.is_held())
+        lock2.release()
+
+    def test_metrics(self):
+        lock1 = LeaseLock(self.name)
+        lock2 = LeaseLock(self.name)
+        lock1.acquire()
+        lock2.acquire()
+        lock1.release()
+        metrics = get_lease_lock_metrics(self.name)
+        self.assertEqual(metrics['acquired'], 1)
+        self.assertEqual(metrics['skipped'], 1)
+        self.assertGreater(metrics['hold_seconds_total'], 0)
+
+    def test_skip_if_locked(self):
+        calls = []
+
+        @skip_if_locked()
+        def task():
+            calls.append(1)
+            return 'done'
+
+        lock_name = f'{task.__module__}.{task.__name__}'
+        self.name = lock_name
+        self.assertEqual(task(), 'done')
+
+        lock = LeaseLock(lock_name)
+        lock.acquire()
+        self.assertIsNone(task())
+        lock.release()
+        self.assertEqual(len(calls), 1)
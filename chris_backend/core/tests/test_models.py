@@ -48,6 +48,38 @@ class ChrisFolderModelTests(ModelTests):
         folder = ChrisFolder.get_first_existing_folder_ancestor('home/12345678/file.txt')
         self.assertEqual(folder.path, 'home')
 
+    def test_ensure_tree(self):
+        """
+        Test whether custom ensure_tree class method creates all the folders with the
+        passed paths and their missing ancestors with the right parents.
+        """
+        owner = User.objects.get(username=self.username)
+        paths = [f'home/{self.username}/feeds/feed_1/data/a/b',
+                 f'home/{self.username}/feeds/feed_1/data/c']
+
+        folders = ChrisFolder.ensure_tree(paths, owner)
+
+        for path in paths + [f'home/{self.username}/feeds/feed_1/data/a']:
+            folder = ChrisFolder.objects.get(path=path)
+            self.assertEqual(folders[path], folder)
+            self.assertEqual(folder.owner, owner)
+            self.assertEqual(folder.parent.path, os.path.dirname(path))
+        self.assertEqual(folders['home'].owner.username, self.chris_username)
+
+        # calling it again doesn't create any new folder
+        count = ChrisFolder.objects.count()
+        ChrisFolder.ensure_tree(paths, owner)
+        self.assertEqual(ChrisFolder.objects.count(), count)
+
+    def test_ensure_tree_fails_with_invalid_paths(self):
+        """
+        Test whether custom ensure_tree class method raises ValueError for paths
+        starting or ending with slashes.
+        """
+        owner = User.objects.get(username=self.username)
+        with self.assertRaises(ValueError):
+            ChrisFolder.ensure_tree([f'/home/{self.username}/uploads'], owner)
+
 
 class ChrisFileModelTests(ModelTests):
 
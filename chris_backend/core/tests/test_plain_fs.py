@@ -77,6 +77,15 @@ class FilesystemManagerCRUDTests(TestCase):
         self.assertEqual(sorted(result),
                          ['test/ls/a.txt', 'test/ls/b.txt', 'test/ls/sub/c.txt'])
 
+    def test_ls_pages(self):
+        self.manager.upload_obj('test/ls/a.txt', b'a')
+        self.manager.upload_obj('test/ls/b.txt', b'b')
+        self.manager.upload_obj('test/ls/sub/c.txt', b'c')
+        pages = list(self.manager.ls_pages('test/ls', page_size=2))
+        self.assertEqual([len(page) for page in pages], [2, 1])
+        self.assertEqual(sorted(path for page in pages for path in page),
+                         ['test/ls/a.txt', 'test/ls/b.txt', 'test/ls/sub/c.txt'])
+
     def test_ls_single_file(self):
         """ls of an exact file path returns a list with just that path."""
         self.manager.upload_obj('test/single.txt', b'data')
@@ -0,0 +1,55 @@
+
+import logging
+import uuid
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from core.leaselock import get_redis_client
+from core.taskqueue import (enqueue_once, clear_enqueue_once, get_queue_depths,
+                            get_enqueue_once_metrics, get_broker_client)
+
+
+class TaskQueueTests(SimpleTestCase):
+
+    def setUp(self):
+        # avoid cluttered console output
+        logging.disable(logging.WARNING)
+        self.task = mock.Mock()
+        self.task.name = f'test_task_{uuid.uuid4().hex}'
+
+    def tearDown(self):
+        client = get_redis_client()
+        client.delete(f'task_dedupe_metrics:{self.task.name}')
+        clear_enqueue_once(self.task.name, (1, 'a'))
+        # re-enable logging
+        logging.disable(logging.NOTSET)
+
+    def test_enqueue_once(self):
+        self.assertTrue(enqueue_once(self.task, 1, 'a'))
+        self.assertFalse(enqueue_once(self.task, 1, 'a'))
+        self.task.delay.assert_called_once_with(1, 'a')
+
+        clear_enqueue_once(self.task.name, [1, 'a'])
+        self.assertTrue(enqueue_once(self.task, 1, 'a'))
+        self.assertEqual(self.task.delay.call_count, 2)
+        self.assertEqual(get_enqueue_once_metrics(self.task.name),
+                         {'enqueued': 2, 'skipped': 1})
+
+    def test_enqueue_once_clears_dedupe_key_if_delay_fails(self):
+        self.task.delay.side_effect = ConnectionError('broker unavailable')
+        with self.assertRaises(ConnectionError):
+            enqueue_once(self.task, 1, 'a')
+
+        self.task.delay.side_effect = None
+        self.assertTrue(enqueue_once(self.task, 1, 'a'))
+        self.assertEqual(self.task.delay.call_count, 2)
+
+    def test_get_queue_depths(self):
+        queue = f'test_queue_{uuid.uuid4().hex}'
+        client = get_broker_client()
+        client.rpush(queue, 'msg1', 'msg2')
+        try:
+            self.assertEqual(get_queue_depths([queue]), {queue: 2})
+        finally:
+            client.delete(queue)
@@ -180,33 +180,31 @@ class PACSSeriesSerializer(serializers.HyperlinkedModelSerializer):
         except PACSSeries.DoesNotExist:
             path = validated_data.pop('path')
 
-            (series_folder, _) = ChrisFolder.objects.get_or_create(path=path, owner=owner)
-
-            validated_data['pacs'] = pacs
-            validated_data['folder'] = series_folder
-
             # remove commas from the existing files/folders names and handle the
             # special cases
             storage_manager = connect_storage(settings)
             changed_file_paths = storage_manager.sanitize_obj_names(path)
 
             files_in_storage = validated_data.pop('files_in_storage')
-            files = []
-            for obj_path in files_in_storage:
-                if obj_path in changed_file_paths:
-                    obj_path = changed_file_paths[obj_path]
+            obj_paths = [changed_file_paths.get(obj_path, obj_path) for obj_path in
+                         files_in_storage]
+            obj_paths = [obj_path for obj_path in obj_paths if obj_path]
 
-                if obj_path:
-                    folder_path = os.path.dirname(obj_path)
-                    parent_folder = series_folder
+            # create the series folder and all its subfolders in bulk
+            folder_paths = {os.path.dirname(obj_path) for obj_path in obj_paths}
+            folder_paths.add(path)
+            folders = ChrisFolder.ensure_tree(folder_paths, owner)
+            series_folder = folders[path]
 
-                    if folder_path != path:
-                        (parent_folder, _) = ChrisFolder.objects.get_or_create(
-                            path=folder_path, owner=owner)
+            validated_data['pacs'] = pacs
+            validated_data['folder'] = series_folder
 
-                    pacs_file = PACSFile(owner=owner, parent_folder=parent_folder)
-                    pacs_file.fname.name = obj_path
-                    files.append(pacs_file)
+            files = []
+            for obj_path in obj_paths:
+                parent_folder = folders[os.path.dirname(obj_path)]
+                pacs_file = PACSFile(owner=owner, parent_folder=parent_folder)
+                pacs_file.fname.name = obj_path
+                files.append(pacs_file)
 
             PACSFile.objects.bulk_create(files)
 
@@ -80,7 +80,8 @@ class Pipeline(models.Model):
         dictionary tree are the pipings' ids and the values are dictionaries containing
         the piping and the list of child pipings' ids.
         """
-        pipings = list(self.plugin_pipings.all())
+        pipings = list(self.plugin_pipings.select_related('plugin__meta',
+                                                          'previous__plugin__meta'))
         root_pip = [pip for pip in pipings if not pip.previous][0]
         root_id = root_pip.id
         tree = {}
@@ -1,3 +1,99 @@
+import logging
+
+import redis
+
 from django.contrib import admin
 
-# Register your models here.
+from rest_framework import generics, permissions, serializers
+from rest_framework.renderers import JSONRenderer, BrowsableAPIRenderer
+from rest_framework.response import Response
+
+from core.celery import task_routes
+from core.leaselock import get_lease_lock_metrics
+from core.taskqueue import get_queue_depths, get_enqueue_once_metrics
+from .services.admission import PluginInstanceAdmissionController, ADMISSION_LOCK_NAME
+from .services.timing import PluginInstanceTimingReport
+
+
+logger = logging.getLogger(__name__)
+
+
+# lease locks serializing the scheduling of the plugin instances
+LEASE_LOCK_NAMES = ('plugininstances.tasks.schedule_waiting_plugin_instances',
+                    ADMISSION_LOCK_NAME)
+
+# tasks enqueued once per argument by the periodic tasks
+ENQUEUE_ONCE_TASK_NAMES = (
+    'plugininstances.tasks.check_plugin_instance_job_exec_status',
+    'plugininstances.tasks.check_compute_resource_jobs_exec_status',
+    'plugininstances.tasks.delete_compute_resource_containers_from_remote',
+)
+
+
+class PluginInstanceAdmissionAdminDetail(generics.GenericAPIView):
+    """
+    A JSON view for the current state of the plugin instance admission control (caps,
+    active and waiting plugin instances per compute resource and per user) along with
+    the wait and hold metrics of the scheduling lease locks, the celery queue depths and
+    the enqueued/skipped counts of the de-duplicated tasks that can be used by ChRIS
+    admins.
+    """
+    http_method_names = ['get']
+    permission_classes = (permissions.IsAdminUser,)
+    renderer_classes = (JSONRenderer, BrowsableAPIRenderer)
+
+    def get(self, request, *args, **kwargs):
+        """
+        Overriden to return the admission control state and the task metrics.
+        """
+        state = PluginInstanceAdmissionController().get_state()
+        state['lease_locks'] = self._get_redis_metrics(
+            lambda: [{'name': name, **get_lease_lock_metrics(name)}
+                     for name in LEASE_LOCK_NAMES])
+        queues = sorted({route['queue'] for route in task_routes.values()})
+        state['task_queues'] = self._get_redis_metrics(lambda: get_queue_depths(queues))
+        state['enqueue_once_tasks'] = self._get_redis_metrics(
+            lambda: [{'name': name, **get_enqueue_once_metrics(name)}
+                     for name in ENQUEUE_ONCE_TASK_NAMES])
+        return Response(state)
+
+    @staticmethod
+    def _get_redis_metrics(get_metrics):
+        """
+        Internal method to get metrics stored in Redis or the celery broker. Returns
+        None if they can't be reached so the rest of the state is still served.
+        """
+        try:
+            return get_metrics()
+        except redis.RedisError as e:
+            logger.warning(f'Could not get task metrics, detail: {str(e)}')
+            return None
+
+
+class PluginInstanceTimingAdminDetail(generics.GenericAPIView):
+    """
+    A JSON view for the percentiles of the job phase durations (queueing, data
+    transfer, execution, output files registration, etc) of the recently finished
+    plugin instances per plugin and compute resource that can be used by ChRIS admins.
+    The 'days', 'plugin_name' and 'compute_resource_name' query parameters can be
+    used to narrow the aggregated plugin instances.
+    """
+    http_method_names = ['get']
+    permission_classes = (permissions.IsAdminUser,)
+    renderer_classes = (JSONRenderer, BrowsableAPIRenderer)
+    MAX_DAYS = 3650
+
+    def get(self, request, *args, **kwargs):
+        """
+        Overriden to return the job phase duration percentiles.
+        """
+        days = request.query_params.get('days', '7')
+        if not days.isdigit() or not 1 <= int(days) <= self.MAX_DAYS:
+            raise serializers.ValidationError(
+                {'days': [f'This query parameter must be an integer between 1 and '
+                          f'{self.MAX_DAYS}.']})
+
+        report = PluginInstanceTimingReport(
+            int(days), request.query_params.get('plugin_name'),
+            request.query_params.get('compute_resource_name'))
+        return Response(report.get_percentiles())
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.9 on 2026-10-18 22:33
+
+from django.db import migrations, models
+
+
+def populate_ts_parents(apps, schema_editor):
+    PluginInstance = apps.get_model('plugininstances', 'PluginInstance')
+    StrParameter = apps.get_model('plugininstances', 'StrParameter')
+    TsParents = PluginInstance.ts_parents.through
+
+    params = StrParameter.objects.filter(plugin_param__name='plugininstances',
+                                         plugin_inst__plugin__meta__type='ts')
+    existing_ids = set(PluginInstance.objects.values_list('id', flat=True))
+    links = []
+
+    for param in params.exclude(value='').iterator():
+        parent_ids = {int(parent_id) for parent_id in param.value.split(',')}
+        links.extend(TsParents(from_plugininstance_id=param.plugin_inst_id,
+                               to_plugininstance_id=parent_id)
+                     for parent_id in parent_ids & existing_ids)
+    TsParents.objects.bulk_create(links, batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('plugininstances', '0005_plugininstance_copy_retry_count_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='plugininstance',
+            name='ts_parents',
+            field=models.ManyToManyField(blank=True, related_name='ts_children', to='plugininstances.plugininstance'),
+        ),
+        migrations.RunPython(populate_ts_parents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.9 on 2026-10-18 22:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('plugininstances', '0006_plugininstance_ts_parents'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='plugininstance',
+            name='next_check_date',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.9 on 2026-10-18 23:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('plugininstances', '0007_plugininstance_next_check_date'),
+        ('plugins', '0004_computeresource_max_active_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RemoteDataLocation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('creation_date', models.DateTimeField(auto_now_add=True)),
+                ('path', models.CharField(max_length=1024)),
+                ('compute_resource', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='remote_data_locations', to='plugins.computeresource')),
+                ('plugin_inst', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='remote_data_locations', to='plugininstances.plugininstance')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['compute_resource', 'path'], name='plugininsta_compute_2c4854_idx')],
+                'unique_together': {('plugin_inst', 'path')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.9 on 2026-10-18 23:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('plugininstances', '0008_remotedatalocation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='plugininstance',
+            name='timeline',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.9 on 2026-10-18 23:22
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import CharField, OuterRef, Subquery, Value
+from django.db.models.functions import Cast, Concat
+
+
+def populate_lineage(apps, schema_editor):
+    PluginInstance = apps.get_model('plugininstances', 'PluginInstance')
+
+    # one UPDATE per tree level, starting from the root plugin instances
+    PluginInstance.objects.filter(previous__isnull=True).update(
+        lineage=Concat(Value('/'), Cast('id', CharField()), Value('/')))
+
+    previous_lineage = PluginInstance.objects.filter(
+        pk=OuterRef('previous_id')).values('lineage')[:1]
+    while PluginInstance.objects.filter(lineage='').exclude(
+            previous__lineage='').update(
+            lineage=Concat(Subquery(previous_lineage), Cast('id', CharField()),
+                           Value('/'))):
+        pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_chrisfolder_deletion_error_and_more'),
+        ('feeds', '0003_feed_deletion_error_feed_deletion_requested_at_and_more'),
+        ('plugininstances', '0009_plugininstance_timeline'),
+        ('plugins', '0004_computeresource_max_active_jobs'),
+        ('workflows', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='plugininstance',
+            name='lineage',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddIndex(
+            model_name='plugininstance',
+            index=models.Index(fields=['lineage'], name='plugininstance_lineage_idx', opclasses=['text_pattern_ops']),
+        ),
+        migrations.RunPython(populate_lineage, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.9 on 2026-10-19 00:06
+
+from datetime import timedelta
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+from django.utils import timezone
+
+
+def extend_existing_leases(apps, schema_editor):
+    PluginInstanceLock = apps.get_model('plugininstances', 'PluginInstanceLock')
+
+    # locks of registrations still run by workers with the previous code are never
+    # renewed, so they only expire when the registration is considered stuck (240
+    # minutes after it started) rather than being taken over and run twice
+    PluginInstanceLock.objects.filter(plugin_inst__status='registeringFiles').update(
+        expiration_date=F('start_date') + timedelta(minutes=240))
+    PluginInstanceLock.objects.exclude(plugin_inst__status='registeringFiles').update(
+        expiration_date=timezone.now() + timedelta(
+            seconds=settings.PLUGIN_INSTANCE_LOCK_LEASE_SECONDS))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('plugininstances', '0010_plugininstance_lineage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='plugininstancelock',
+            name='expiration_date',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='plugininstancelock',
+            name='holder',
+            field=models.CharField(blank=True, max_length=32),
+        ),
+        migrations.RunPython(extend_existing_leases, migrations.RunPython.noop),
+    ]
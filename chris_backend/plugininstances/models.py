@@ -2,6 +2,7 @@
 import logging
 
 from django.db import models
+from django.db.models import F, Func, Value
 from django.db.models.signals import post_delete
 from django.dispatch import receiver
 from django.utils import timezone
@@ -58,8 +59,14 @@ class PluginInstance(AsyncDeletableModel):
                                              choices=REMOTE_CLEANUP_STATUS_CHOICES,
                                              default='notStarted')
     remote_cleanup_retry_count = models.IntegerField(default=0)
+    next_check_date = models.DateTimeField(null=True, blank=True, db_index=True)
+    timeline = models.JSONField(blank=True, default=dict)  # map from event to ISO date
+    # materialized path of ids from the root plugin instance, e.g. '/1/5/9/'
+    lineage = models.TextField(blank=True)
     previous = models.ForeignKey("self", on_delete=models.CASCADE, null=True,
                                  related_name='next')
+    ts_parents = models.ManyToManyField("self", symmetrical=False, blank=True,
+                                        related_name='ts_children')
     plugin = models.ForeignKey(Plugin, on_delete=models.CASCADE, related_name='instances')
     feed = models.ForeignKey(Feed, on_delete=models.CASCADE,
                              related_name='plugin_instances')
@@ -79,15 +86,28 @@ class PluginInstance(AsyncDeletableModel):
 
     class Meta:
         ordering = ('-start_date',)
+        indexes = [models.Index(fields=['lineage'], name='plugininstance_lineage_idx',
+                                opclasses=['text_pattern_ops'])]
 
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """
+        Overriden to remember the status loaded from the DB so that status transitions
+        can be recorded in the timeline when the instance is saved.
+        """
+        instance = super(PluginInstance, cls).from_db(db, field_names, values)
+        instance._db_status = instance.__dict__.get('status')  # status can be deferred
+        return instance
+
     def save(self, *args, **kwargs):
         """
         Overriden to save a new output folder to the DB the first time the instance
         is saved. In addition, a new feed is saved for 'fs' instances. For 'ds' and
-        'ts' instances the feed of the previous instance is assigned.
+        'ts' instances the feed of the previous instance is assigned. Status
+        transitions are recorded in the instance's timeline.
         """
         if not hasattr(self, 'feed'):
             plugin_type = self.plugin.meta.type
@@ -98,12 +118,44 @@ class PluginInstance(AsyncDeletableModel):
 
         self._set_compute_defaults()
 
-        super(PluginInstance, self).save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        status_changed = False
+        if self._state.adding:
+            self.timeline.setdefault(self.status, timezone.now().isoformat())
+        elif update_fields is None or 'status' in update_fields:
+            status_changed = self.status != getattr(self, '_db_status', None)
+
+        if status_changed:
+            # the status transition is atomically merged into the DB timeline in the
+            # same UPDATE so concurrent tasks don't lose each other's events
+            now = timezone.now()
+            timeline = self.timeline
+            timeline[self.status] = now.isoformat()
+            self.timeline = self.merge_timeline_events(self.status, date=now)
+            if update_fields is not None and 'timeline' not in update_fields:
+                kwargs['update_fields'] = [*update_fields, 'timeline']
+            try:
+                super(PluginInstance, self).save(*args, **kwargs)
+            finally:
+                self.timeline = timeline
+        else:
+            super(PluginInstance, self).save(*args, **kwargs)
+
+        self._db_status = self.status
 
         if self.output_folder is None:
+            self.lineage = self._get_lineage()
             self.output_folder = self._save_output_folder()
             self.save()
 
+    def _get_lineage(self):
+        """
+        Custom internal method to get the materialized path of the plugin instance from
+        its previous plugin instance's path.
+        """
+        previous_lineage = self.previous.lineage if self.previous else '/'
+        return f'{previous_lineage}{self.id}/'
+
     def _save_feed(self):
         """
         Custom internal method to create and save a new feed to the DB.
@@ -132,13 +184,13 @@ class PluginInstance(AsyncDeletableModel):
         # 'ds' and 'ts' plugins will output files to:
         # SWIFT_CONTAINER_NAME/home/<username>/feeds/feed_<id>/...
         # /<previous_plugin_name>_<plugin_inst_id>/<plugin_name>_<plugin_inst_id>/data
-        current = self
-        path = '/{0}_{1}/data'.format(current.plugin.meta.name, current.id)
-        while not current.plugin.meta.type == 'fs':
-            current = current.previous
-            path = '/{0}_{1}'.format(current.plugin.meta.name, current.id) + path
+        path = '/{0}_{1}/data'.format(self.plugin.meta.name, self.id)
+        ancestors = list(self.get_ancestor_instances().select_related(
+            'plugin__meta', 'feed__owner'))
+        for ancestor in reversed(ancestors):
+            path = '/{0}_{1}'.format(ancestor.plugin.meta.name, ancestor.id) + path
 
-        feed = current.feed
+        feed = ancestors[0].feed if ancestors else self.feed
         # username = self.owner.username
         username = feed.owner.username  # use creator of the feed for shared
         # feeds
@@ -165,36 +217,55 @@ class PluginInstance(AsyncDeletableModel):
         """
         Custom method to return the root plugin instance for this plugin instance.
         """
-        current = self
-        while not current.plugin.meta.type == 'fs':
-            current = current.previous
-        return current
+        root_id = self.get_lineage_ids()[0]
+        return self if root_id == self.id else PluginInstance.objects.get(pk=root_id)
+
+    def get_ancestor_instances(self):
+        """
+        Custom method to return a queryset with all the plugin instances that are an
+        ancestor of this plugin instance ordered from the root plugin instance down.
+        """
+        return PluginInstance.objects.filter(
+            pk__in=self.get_lineage_ids()[:-1]).order_by('lineage')
 
     def get_descendant_instances(self):
         """
-        Custom method to return all the plugin instances that are a descendant of this
-        plugin instance.
+        Custom method to return a queryset with all the plugin instances that are a
+        descendant of this plugin instance (including itself) in depth-first order.
+        """
+        return PluginInstance.objects.filter(
+            lineage__startswith=self._get_saved_lineage()).order_by('lineage')
+
+    def get_lineage_ids(self):
+        """
+        Custom method to return the list of ids in the plugin instance's lineage from
+        the root plugin instance down to itself.
         """
-        descendant_instances = []
-        queue = [self]
-        while len(queue) > 0:
-            visited = queue.pop()
-            queue.extend(list(visited.next.all()))
-            descendant_instances.append(visited)
-        return descendant_instances
+        lineage = self._get_saved_lineage()
+        return [int(plg_inst_id) for plg_inst_id in lineage.strip('/').split('/')]
+
+    def _get_saved_lineage(self):
+        """
+        Custom internal method to get the plugin instance's lineage. Raises ValueError
+        if it has not been set yet as an empty lineage would be a prefix of every other.
+        """
+        if not self.lineage:
+            raise ValueError(f"Lineage of plugin instance with id {self.id} has not "
+                             f"been set")
+        return self.lineage
 
     def get_parameter_instances(self):
         """
         Custom method to get all the parameter instances associated with this plugin
-        instance regardless of their type.
+        instance regardless of their type. Their plugin parameters are fetched in the
+        same queries.
         """
         parameter_instances = []
-        parameter_instances.extend(list(self.unextpath_param.all()))
-        parameter_instances.extend(list(self.path_param.all()))
-        parameter_instances.extend(list(self.string_param.all()))
-        parameter_instances.extend(list(self.integer_param.all()))
-        parameter_instances.extend(list(self.float_param.all()))
-        parameter_instances.extend(list(self.boolean_param.all()))
+        for related_manager in (self.unextpath_param, self.path_param,
+                                self.string_param, self.integer_param,
+                                self.float_param, self.boolean_param):
+            parameter_instances.extend(
+                list(related_manager.select_related('plugin_param')))
         return parameter_instances
 
     def get_output_path(self):
@@ -204,6 +275,31 @@ class PluginInstance(AsyncDeletableModel):
         """
         return str(self.output_folder.path)
 
+    def add_timeline_events(self, *events):
+        """
+        Custom method to record the passed events (status transitions or job phase
+        boundaries) at the current date in the plugin instance's timeline. The DB
+        timeline is atomically merged so concurrent tasks don't lose each other's
+        events.
+        """
+        now = timezone.now()
+        self.timeline.update({event: now.isoformat() for event in events})
+        PluginInstance.objects.filter(id=self.id).update(
+            timeline=self.merge_timeline_events(*events, date=now))
+
+    @staticmethod
+    def merge_timeline_events(*events, date=None):
+        """
+        Custom method to get an expression that merges the passed events at the
+        passed date (current date by default) into the timeline of the plugin instances
+        in a queryset update. This allows recording status transitions made with a
+        queryset update in the same DB query.
+        """
+        date = date or timezone.now()
+        d_events = {event: date.isoformat() for event in events}
+        return Func(F('timeline'), Value(d_events, output_field=models.JSONField()),
+                    template='(%(expressions)s)', arg_joiner=' || ')
+
     def set_status(self, status):
         self.status = status
 
@@ -264,17 +360,13 @@ class PluginInstanceFilter(FilterSet):
         Custom method to return the plugin instances in a queryset with a common root
         plugin instance.
         """
-        filtered_list = []
         root_queryset = queryset.filter(pk=value)
         # check whether the root id value is in the DB
-        if not root_queryset.exists():
+        root = root_queryset.first()
+        if root is None:
             return root_queryset
-        queue = [root_queryset[0]]
-        while len(queue) > 0:
-            visited = queue.pop()
-            queue.extend(list(visited.next.all()))
-            filtered_list.append(visited.id)
-        return PluginInstance.objects.filter(pk__in=filtered_list)
+        return PluginInstance.objects.filter(
+            lineage__startswith=root._get_saved_lineage())
 
     def filter_by_previous_id(self, queryset, name, value):
         """
@@ -301,11 +393,30 @@ class PluginInstanceLock(models.Model):
     plugin_inst = models.OneToOneField(PluginInstance, on_delete=models.CASCADE,
                                        related_name='lock')
     start_date = models.DateTimeField(auto_now_add=True)
+    holder = models.CharField(max_length=32, blank=True)  # token of the lease holder
+    expiration_date = models.DateTimeField(default=timezone.now, db_index=True)
 
     def __str__(self):
         return str(self.plugin_inst.id)
 
 
+class RemoteDataLocation(models.Model):
+    creation_date = models.DateTimeField(auto_now_add=True)
+    path = models.CharField(max_length=1024)  # storage path resident in the remote
+    compute_resource = models.ForeignKey(ComputeResource, on_delete=models.CASCADE,
+                                         related_name='remote_data_locations')
+    # plugin instance whose remote job directory holds the data
+    plugin_inst = models.ForeignKey(PluginInstance, on_delete=models.CASCADE,
+                                    related_name='remote_data_locations')
+
+    class Meta:
+        unique_together = ('plugin_inst', 'path',)
+        indexes = [models.Index(fields=['compute_resource', 'path'])]
+
+    def __str__(self):
+        return self.path
+
+
 class PluginInstanceSplit(models.Model):
     creation_date = models.DateTimeField(auto_now_add=True)
     filter = models.CharField(max_length=600, blank=True)
@@ -24,6 +24,15 @@ class IsOwnerOrChrisOrHasFeedPermissionReadOnlyOrPublicFeedReadOnly(
                 obj.feed.public or obj.feed.has_user_permission(user))
 
 
+class IsChris(permissions.BasePermission):
+    """
+    Custom permission to only allow access to superuser 'chris'.
+    """
+
+    def has_permission(self, request, view):
+        return request.user.username == 'chris'
+
+
 class IsNotDeleteFSPluginInstance(permissions.BasePermission):
     """
     Custom permission to only allow deleting a plugin instance if it is not of type
@@ -7,7 +7,10 @@ from rest_framework.reverse import reverse
 from drf_spectacular.utils import OpenApiTypes, extend_schema_field
 
 from collectionjson.fields import ItemLinkField
-from core.models import ChrisFolder, ChrisFile, ChrisLinkFile
+from core.models import (ChrisFolder, ChrisFile, ChrisLinkFile, FolderUserPermission,
+                         FolderGroupPermission, FileUserPermission,
+                         FileGroupPermission, LinkFileUserPermission,
+                         LinkFileGroupPermission)
 from plugins.enums import TYPES
 from plugins.models import Plugin
 
@@ -31,6 +34,7 @@ class PluginInstanceSerializer(serializers.HyperlinkedModelSerializer):
     feed_id = serializers.ReadOnlyField(source='feed.id')
     output_path = serializers.ReadOnlyField(source='output_folder.path')
     summary = serializers.JSONField(binary=True, read_only=True)
+    timeline = serializers.ReadOnlyField()
     raw = serializers.ReadOnlyField()
     owner_username = serializers.ReadOnlyField(source='owner.username')
     size = serializers.ReadOnlyField()
@@ -65,8 +69,8 @@ class PluginInstanceSerializer(serializers.HyperlinkedModelSerializer):
                   'plugin_id', 'plugin_name', 'plugin_version', 'plugin_type',
                   'feed_id', 'start_date', 'end_date', 'output_path', 'status', 'active',
                   'pipeline_id', 'pipeline_name', 'workflow_id', 'summary', 'raw',
-                  'owner_username', 'cpu_limit', 'memory_limit', 'number_of_workers',
-                  'gpu_limit', 'size', 'error_code', 'deletion_status',
+                  'timeline', 'owner_username', 'cpu_limit', 'memory_limit',
+                  'number_of_workers', 'gpu_limit', 'size', 'error_code', 'deletion_status',
                   'deletion_requested_at', 'deletion_error', 'previous', 'output_folder',
                   'feed', 'plugin', 'workflow', 'compute_resource',
                   'descendants', 'parameters', 'splits')
@@ -343,52 +347,96 @@ class BoolParameterSerializer(serializers.HyperlinkedModelSerializer):
 def validate_paths(user, string):
     """
     Custom function to check whether a user is allowed to access the provided paths.
+    All the paths are resolved and their permissions checked with a fixed number of
+    queries. The errors for all the offending paths are reported together.
     """
     path_list = [s.strip().strip('/') for s in string.split(',')]
+    errors = []
+    paths = []  # syntactically valid paths
 
     for path in path_list:
         path_parts = pathlib.Path(path).parts
 
         if len(path_parts) < 2:
             # trying to access a top-level folder or an unknown folder
-            raise serializers.ValidationError(
-                [f"This field may not reference a top-level folder path '{path}'."])
-
-        if path_parts[0] not in ('home', 'SERVICES', 'PIPELINES'):
-            raise serializers.ValidationError(
-                [f"This field may not reference an invalid path '{path}'."])
-
-        if len(path_parts) == 2 and path_parts[0] == 'home':
-            raise serializers.ValidationError(
-                [f"This field may not reference a home folder path '{path}'."])
-
-        if len(path_parts) == 3 and path_parts[0] == 'home' and path_parts[2] == 'feeds':
-            raise serializers.ValidationError(
-                [f"This field may not reference a home's feeds folder path '{path}'."])
+            errors.append(f"This field may not reference a top-level folder path "
+                          f"'{path}'.")
+        elif path_parts[0] not in ('home', 'SERVICES', 'PIPELINES'):
+            errors.append(f"This field may not reference an invalid path '{path}'.")
+        elif len(path_parts) == 2 and path_parts[0] == 'home':
+            errors.append(f"This field may not reference a home folder path '{path}'.")
+        elif len(path_parts) == 3 and path_parts[0] == 'home' and path_parts[2] == 'feeds':
+            errors.append(f"This field may not reference a home's feeds folder path "
+                          f"'{path}'.")
+        else:
+            paths.append(path)
+
+    objs = _resolve_paths(paths)
+    permitted = _get_permitted_objs(user, [obj for obj in objs.values()
+                                           if not (obj.owner_id == user.id or
+                                                   user.username == 'chris' or
+                                                   obj.public)])
+    for path in paths:
+        obj = objs.get(path)
+
+        if obj is None or (isinstance(obj, ChrisLinkFile) and
+                           obj.path in ('PUBLIC', 'SHARED')):
+            errors.append(f"This field may not reference an invalid path '{path}'.")
+
+        elif not (obj.owner_id == user.id or user.username == 'chris' or obj.public
+                  or (type(obj), obj.id) in permitted):
+            errors.append(f"User does not have permission to access path '{path}'.")
+
+    if errors:
+        raise serializers.ValidationError(errors)
+    return ','.join(path_list)
 
-        try:
-            obj = ChrisFolder.objects.get(path=path)
-        except ChrisFolder.DoesNotExist:  # path is not a folder
-            try:
-                obj = ChrisFile.objects.get(fname=path)
-            except ChrisFile.DoesNotExist:  # path is not a file
-                try:
-                    obj = ChrisLinkFile.objects.get(fname=path)
 
-                    if obj.path in ('PUBLIC', 'SHARED'):
-                        raise serializers.ValidationError(
-                            [f"This field may not reference an invalid path '{path}'."])
+def _resolve_paths(paths):
+    """
+    Custom internal function to resolve a list of paths into a dictionary mapping each
+    existing path to its folder, file or link file object (in that order of
+    precedence) with a single query per model.
+    """
+    objs = {}
+    if not paths:
+        return objs
 
-                except ChrisLinkFile.DoesNotExist:  # path is not a link file
-                    raise serializers.ValidationError(
-                        [f"This field may not reference an invalid path '{path}'."])
+    for link_file in ChrisLinkFile.objects.filter(fname__in=paths):
+        objs[link_file.fname.name] = link_file
+    for f in ChrisFile.objects.filter(fname__in=paths):
+        objs[f.fname.name] = f
+    for folder in ChrisFolder.objects.filter(path__in=paths):
+        objs[folder.path] = folder
+    return objs
 
-        if not (obj.owner == user or user.username == 'chris' or obj.public
-                or obj.has_user_permission(user)):
-            raise serializers.ValidationError(
-                [f"User does not have permission to access path '{path}'."])
 
-    return ','.join(path_list)
+def _get_permitted_objs(user, objs):
+    """
+    Custom internal function to get the set of (model, id) pairs of the passed
+    folders, files and link files that the user has been granted a permission to
+    access (perhaps through one of its groups) with a single query per permission
+    table.
+    """
+    permitted = set()
+    grp_qs = user.groups.all()
+
+    for model, user_perm_model, group_perm_model, field in (
+            (ChrisFolder, FolderUserPermission, FolderGroupPermission, 'folder'),
+            (ChrisFile, FileUserPermission, FileGroupPermission, 'file'),
+            (ChrisLinkFile, LinkFileUserPermission, LinkFileGroupPermission,
+             'link_file')):
+        ids = {obj.id for obj in objs if type(obj) is model}
+
+        for perm_model, lookup in ((user_perm_model, {'user': user}),
+                                   (group_perm_model, {'group__in': grp_qs})):
+            if ids:
+                granted_ids = set(perm_model.objects.filter(
+                    **{f'{field}_id__in': ids}, **lookup).values_list(
+                    f'{field}_id', flat=True))
+                permitted.update((model, obj_id) for obj_id in granted_ids)
+                ids -= granted_ids
+    return permitted
 
 
 class PathParameterSerializer(serializers.HyperlinkedModelSerializer):
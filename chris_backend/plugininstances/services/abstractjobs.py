@@ -7,6 +7,8 @@ environment (ChRIS / pfcon interface) as well as deleting them when finished.
 import logging
 import io
 import abc
+import copy
+from functools import cached_property
 
 from pfconclient import client as pfcon
 from pfconclient.client import JobType
@@ -14,10 +16,16 @@ from pfconclient.exceptions import (PfconRequestException,
                                     PfconRequestInvalidTokenException)
 
 from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
 
 from core.storage import connect_storage
+from core.utils import json_zip2str
 from core.models import ChrisInstance
+from plugininstances.models import PluginInstance
+from .authtokens import (get_compute_resource_auth_token,
+                         refresh_compute_resource_auth_token)
+from .refcache import get_chris_instance, get_compute_resource, get_plugin
 
 
 logger = logging.getLogger(__name__)
@@ -37,20 +45,36 @@ class PluginInstanceJob(abc.ABC):
 
         self.c_plugin_inst = plugin_instance
 
-        self.str_job_id_prefix = ChrisInstance.load().job_id_prefix
+        self.str_job_id_prefix = get_chris_instance().job_id_prefix
         self.str_job_id = self.str_job_id_prefix + str(plugin_instance.id)
 
+        # share the process-level cached compute resource and plugin if not loaded yet
+        if (plugin_instance.compute_resource_id is not None and
+                not PluginInstance.compute_resource.is_cached(plugin_instance)):
+            plugin_instance.compute_resource = get_compute_resource(
+                plugin_instance.compute_resource_id)
+        if not PluginInstance.plugin.is_cached(plugin_instance):
+            plugin_instance.plugin = get_plugin(plugin_instance.plugin_id)
+
         cr = self.c_plugin_inst.compute_resource
-        self.pfcon_client = pfcon.Client(cr.compute_url, cr.compute_auth_token)
+        self.pfcon_client = pfcon.Client(cr.compute_url,
+                                         get_compute_resource_auth_token(cr))
         self.pfcon_client.pfcon_innetwork = cr.compute_innetwork
         self.pfcon_client.requires_copy_job = cr.compute_requires_copy_job
         self.pfcon_client.requires_upload_job = cr.compute_requires_upload_job
 
-        self.plugin_inst_output_files = set()  # set of obj names in object storage
-
         self.storage_manager = connect_storage(settings)
         self.storage_env = settings.STORAGE_ENV
 
+    @cached_property
+    def l_plugin_inst_param_instances(self):
+        """
+        The plugin instance's parameter instances together with their plugin
+        parameters. They are only fetched the first time they are needed (status checks
+        don't need them) and then memoized for the job's lifetime.
+        """
+        return self.c_plugin_inst.get_parameter_instances()
+
     @abc.abstractmethod
     def run(self):
         """
@@ -108,8 +132,16 @@ class PluginInstanceJob(abc.ABC):
         """
         Get a job status JSON summary from pfcon response.
         """
-        d_jobStatusSummary = self.c_plugin_inst.summary
+        return self.update_job_status_summary(self.c_plugin_inst.summary, d_resp,
+                                              push_path_status, pull_path_status)
 
+    @staticmethod
+    def update_job_status_summary(d_jobStatusSummary: dict, d_resp: dict | None = None,
+                                  push_path_status: bool | None = None,
+                                  pull_path_status: bool | None = None) -> dict:
+        """
+        Update a job status JSON summary in place from pfcon response.
+        """
         if push_path_status is not None:
             d_jobStatusSummary['pushPath']['status'] = push_path_status
 
@@ -132,6 +164,31 @@ class PluginInstanceJob(abc.ABC):
                 d_jobStatusSummary['compute']['return']['job_logs'] = logs[-1800:]
         return d_jobStatusSummary
 
+    @classmethod
+    def save_job_status_summary(cls, plugin_inst, d_resp: dict, **lookup) -> list:
+        """
+        Update a plugin instance's job status summary from a pfcon status response and
+        atomically persist only the fields that changed, provided the plugin instance
+        still matches the passed lookup in the DB. The summary is only written when it
+        differs from the previous one and the raw pfcon response is only kept when the
+        remote job status has changed (a state transition), so the DB write load scales
+        with transitions rather than polls. Returns the list of written fields.
+        """
+        prev_summary = copy.deepcopy(plugin_inst.summary)
+        summary = cls.update_job_status_summary(plugin_inst.summary, d_resp)
+
+        fields = {}
+        if summary != prev_summary:
+            fields['summary'] = summary
+        if (summary['compute']['return']['job_status'] !=
+                prev_summary['compute']['return']['job_status']):
+            plugin_inst.raw = fields['raw'] = json_zip2str(d_resp)
+
+        if fields:
+            type(plugin_inst).objects.filter(id=plugin_inst.id, **lookup).update(
+                **fields)
+        return list(fields)
+
     def schedule_remote_cleanup(self):
         """
         Schedule a remote cleanup operation to delete storeBase data and all containers
@@ -150,6 +207,34 @@ class PluginInstanceJob(abc.ABC):
         run_plugin_instance_job.delay(self.c_plugin_inst.id,
                                       'PluginInstanceDeleteJob')
 
+    def schedule_dependent_plugin_instances(self):
+        """
+        Schedule (or cancel) the waiting plugin instances that depend on this plugin
+        instance as soon as its final status has been committed to the DB rather than
+        waiting for the next run of the periodic scheduling tasks.
+        """
+        from plugininstances.tasks import schedule_plugin_instance_dependents
+
+        plg_inst_id = self.c_plugin_inst.id
+        transaction.on_commit(
+            lambda: schedule_plugin_instance_dependents.delay(plg_inst_id))
+
+    def prefetch_dependent_plugin_instances(self):
+        """
+        Schedule the copy jobs of the waiting plugin instances that depend on this
+        plugin instance as soon as its output files are in storage, so they overlap
+        with the registration of the files in the DB. Only done if the
+        PLUGIN_INSTANCE_COPY_PREFETCH setting is enabled.
+        """
+        if not settings.PLUGIN_INSTANCE_COPY_PREFETCH:
+            return
+
+        from plugininstances.tasks import prefetch_plugin_instance_dependents
+
+        plg_inst_id = self.c_plugin_inst.id
+        transaction.on_commit(
+            lambda: prefetch_plugin_instance_dependents.delay(plg_inst_id))
+
     def delete_all_remote_containers(self) -> bool:
         """
         Delete all remote containers (copy, plugin, upload, delete) for this plugin
@@ -182,14 +267,12 @@ class PluginInstanceJob(abc.ABC):
     
     def _refresh_compute_resource_auth_token(self):
         """
-        Get a new auth token from a remote pfcon service and update the DB.
+        Get a new auth token from a remote pfcon service (or from a concurrent task
+        that has already refreshed it) and share it through the token cache.
         """
         cr = self.c_plugin_inst.compute_resource
-        token = pfcon.Client.get_auth_token(cr.compute_auth_url, cr.compute_user,
-                                            cr.compute_password)
+        token = refresh_compute_resource_auth_token(cr, self.pfcon_client.auth_token)
         self.pfcon_client.set_auth_token(token)
-        cr.compute_auth_token = token
-        cr.save()
 
     def _submit(self, job_type: JobType, job_id: str, job_descriptors: dict, 
                 dfile: io.BytesIO | None = None, timeout: int = 200) -> dict:
@@ -0,0 +1,159 @@
+"""
+Admission control module that provides the interface for deciding which plugin
+instances ready to run can be submitted to their compute resource without exceeding
+the configured concurrency caps.
+"""
+
+import heapq
+from collections import defaultdict, deque
+from typing import Dict, List
+
+from django.conf import settings
+from django.db.models import Count
+
+from plugins.models import ComputeResource
+from plugininstances.models import PluginInstance
+
+
+# statuses of the plugin instances that are using a compute resource
+ADMITTED_STATUSES = ('copying', 'scheduled', 'started', 'uploading')
+
+# name of the lease lock serializing the admission decisions across workers
+ADMISSION_LOCK_NAME = 'plugininstances.admission'
+
+
+class PluginInstanceAdmissionController(object):
+    """
+    ``PluginInstanceAdmissionController`` admits plugin instances ready to run while
+    enforcing a cap on the number of concurrently active plugin instances per user
+    (MAX_ACTIVE_PLUGIN_INSTANCES_PER_USER setting) and per compute resource (its
+    max_active_jobs field). Candidates are admitted in weighted fair share order: the
+    next admitted plugin instance is always the oldest one of the user with the lowest
+    number of active plugin instances relative to the user's weight
+    (PLUGIN_INSTANCE_FAIR_SHARE_WEIGHTS setting).
+    """
+
+    def __init__(self):
+        self.max_active_per_user = settings.MAX_ACTIVE_PLUGIN_INSTANCES_PER_USER
+        self.weights = {username: float(weight) for username, weight in
+                        settings.PLUGIN_INSTANCE_FAIR_SHARE_WEIGHTS.items()}
+
+    def admit(self, candidates: List[dict]) -> List[dict]:
+        """
+        Select the candidate plugin instances that can be submitted now. Candidates are
+        dictionaries with at least the 'id', 'owner__username' and
+        'compute_resource_id' keys. Returns the admitted candidates in admission order.
+        """
+        if not candidates:
+            return []
+
+        user_queues = defaultdict(deque)  # FIFO queue of candidates per user
+        for candidate in sorted(candidates, key=lambda c: c['id']):
+            user_queues[candidate['owner__username']].append(candidate)
+
+        user_active = self._count_active('owner__username', user_queues.keys())
+        cr_ids = {candidate['compute_resource_id'] for candidate in candidates}
+        cr_active = self._count_active('compute_resource_id', cr_ids)
+        cr_caps = dict(ComputeResource.objects.filter(id__in=cr_ids).values_list(
+            'id', 'max_active_jobs'))
+
+        heap = [(self._get_share(username, user_active[username]), queue[0]['id'],
+                 username) for username, queue in user_queues.items()]
+        heapq.heapify(heap)
+        admitted = []
+
+        while heap:
+            _, _, username = heapq.heappop(heap)
+
+            if self._is_full(user_active[username], self.max_active_per_user):
+                continue
+
+            queue = user_queues[username]
+            candidate = None
+            for c in list(queue):
+                cr_id = c['compute_resource_id']
+                if self._is_full(cr_active[cr_id], cr_caps.get(cr_id, -1)):
+                    queue.remove(c)  # compute resource can't admit anything else
+                else:
+                    candidate = c
+                    queue.remove(c)
+                    break
+
+            if candidate is None:
+                continue
+
+            admitted.append(candidate)
+            user_active[username] += 1
+            cr_active[candidate['compute_resource_id']] += 1
+
+            if queue:
+                heapq.heappush(heap, (self._get_share(username, user_active[username]),
+                                      queue[0]['id'], username))
+        return admitted
+
+    def get_state(self) -> dict:
+        """
+        Get the current admission control state: caps, active and waiting plugin
+        instances per compute resource and per user.
+        """
+        active = PluginInstance.objects.filter(status__in=ADMITTED_STATUSES)
+        waiting = PluginInstance.objects.filter(status='waiting')
+
+        cr_active = self._count_by(active, 'compute_resource_id')
+        cr_waiting = self._count_by(waiting, 'compute_resource_id')
+        user_active = self._count_by(active, 'owner__username')
+        user_waiting = self._count_by(waiting, 'owner__username')
+
+        compute_resources = [
+            {'id': cr.id, 'name': cr.name, 'max_active_jobs': cr.max_active_jobs,
+             'active': cr_active.get(cr.id, 0), 'waiting': cr_waiting.get(cr.id, 0)}
+            for cr in ComputeResource.objects.order_by('id')]
+
+        usernames = sorted(set(user_active) | set(user_waiting))
+        users = [{'username': username, 'weight': self._get_weight(username),
+                  'active': user_active.get(username, 0),
+                  'waiting': user_waiting.get(username, 0)}
+                 for username in usernames]
+
+        return {'max_active_plugin_instances_per_user': self.max_active_per_user,
+                'compute_resources': compute_resources, 'users': users}
+
+    def _get_weight(self, username: str) -> float:
+        """
+        Internal method to get a user's fair share weight.
+        """
+        return self.weights.get(username, 1.0)
+
+    def _get_share(self, username: str, nactive: int) -> float:
+        """
+        Internal method to get a user's current share of the active plugin instances
+        relative to the user's weight.
+        """
+        weight = self._get_weight(username)
+        return nactive / weight if weight > 0 else float('inf')
+
+    @staticmethod
+    def _is_full(nactive: int, cap: int) -> bool:
+        """
+        Internal method to check whether a cap has been reached (negative caps mean
+        unlimited).
+        """
+        return 0 <= cap <= nactive
+
+    @classmethod
+    def _count_active(cls, field: str, values) -> Dict:
+        """
+        Internal method to count the active plugin instances for each of the passed
+        values of a field.
+        """
+        lookup = {f'{field}__in': list(values), 'status__in': ADMITTED_STATUSES}
+        counts = defaultdict(int)
+        counts.update(cls._count_by(PluginInstance.objects.filter(**lookup), field))
+        return counts
+
+    @staticmethod
+    def _count_by(queryset, field: str) -> Dict:
+        """
+        Internal method to count the plugin instances in a queryset grouped by a field.
+        """
+        return dict(queryset.order_by().values_list(field).annotate(n=Count('id')))
@@ -0,0 +1,119 @@
+"""
+Asynchronous pfcon client module that provides an asyncio-based interface for the
+I/O-bound requests made to a remote pfcon service (job status and job deletion). A
+single process can multiplex many in-flight requests through one connection pool.
+"""
+
+import asyncio
+
+import httpx
+from pfconclient.client import JobType
+from pfconclient.exceptions import (PfconRequestException,
+                                    PfconRequestInvalidTokenException)
+
+
+class AsyncPfconClient(object):
+    """
+    ``AsyncPfconClient`` is an asyncio counterpart of ``pfconclient.client.Client``
+    for the job status and job delete requests. It raises the same exceptions as the
+    synchronous client. Must be used as an async context manager.
+    """
+
+    def __init__(self, url: str, auth_token: str, max_connections: int = 20):
+        self.url = url
+        self.auth_token = auth_token
+        self.max_connections = max_connections
+        self._client: httpx.AsyncClient | None = None
+        self._token_lock = asyncio.Lock()
+
+        # pending requests wait here rather than in the connection pool, which scales
+        # poorly with thousands of waiters
+        self._semaphore = asyncio.Semaphore(max_connections)
+
+    async def __aenter__(self):
+        limits = httpx.Limits(max_connections=self.max_connections,
+                              max_keepalive_connections=self.max_connections)
+        self._client = httpx.AsyncClient(limits=limits)
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self._client.aclose()
+        self._client = None
+
+    def set_auth_token(self, auth_token: str):
+        """
+        Set the auth token used by all the subsequent requests.
+        """
+        self.auth_token = auth_token
+
+    async def get_job_status(self, job_type: JobType, job_id: str,
+                             timeout: int = 100) -> dict:
+        """
+        Get a job's execution status.
+        """
+        url = self.url + self._get_job_url_base_path(job_type) + job_id + '/'
+        resp = await self._request('GET', url, timeout)
+
+        if resp.status_code not in (200, 201):
+            self._raise_for_status(resp)
+        return resp.json()
+
+    async def delete_job(self, job_type: JobType, job_id: str, timeout: int = 200):
+        """
+        Delete an existing job.
+        """
+        url = self.url + self._get_job_url_base_path(job_type) + job_id + '/'
+        resp = await self._request('DELETE', url, timeout)
+
+        if resp.status_code != 204:
+            self._raise_for_status(resp)
+
+    async def refresh_auth_token(self, get_new_token, expired_token: str) -> str:
+        """
+        Replace an expired auth token with the one returned by the passed coroutine
+        function. Only the first of several concurrent callers that found the same
+        token expired awaits it.
+        """
+        async with self._token_lock:
+            if self.auth_token == expired_token:
+                self.set_auth_token(await get_new_token(expired_token))
+        return self.auth_token
+
+    async def _request(self, method: str, url: str, timeout: int) -> httpx.Response:
+        """
+        Internal method to make an authenticated request to pfcon.
+        """
+        async with self._semaphore:
+            headers = {'Authorization': 'Bearer ' + self.auth_token}
+            try:
+                resp = await self._client.request(method, url, headers=headers,
+                                                  timeout=timeout)
+            except httpx.HTTPError as e:
+                raise PfconRequestException(str(e))
+        return resp
+
+    @staticmethod
+    def _raise_for_status(resp: httpx.Response):
+        """
+        Internal method to raise the appropriate exception for an error response.
+        """
+        if resp.status_code == 401:
+            raise PfconRequestInvalidTokenException(resp.text, code=resp.status_code)
+        raise PfconRequestException(resp.text, code=resp.status_code)
+
+    @staticmethod
+    def _get_job_url_base_path(job_type: JobType) -> str:
+        """
+        Internal method to get a job's url base path given the job type.
+        """
+        match job_type:
+            case JobType.COPY:
+                return 'copyjobs/'
+            case JobType.PLUGIN:
+                return 'pluginjobs/'
+            case JobType.UPLOAD:
+                return 'uploadjobs/'
+            case JobType.DELETE:
+                return 'deletejobs/'
+            case _:
+                raise ValueError(f'Unsupported job type: {job_type}')
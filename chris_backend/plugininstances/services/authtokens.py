@@ -0,0 +1,153 @@
+"""
+Compute resource auth token cache module. Tokens are cached both in the current process
+and in the cluster-wide Django cache (Dragonfly) and are proactively refreshed shortly
+before they expire. Only one process in the cluster refreshes a compute resource's token
+at a time (single-flight lock) while the others wait for the new token.
+"""
+
+import logging
+import time
+
+import jwt
+from pfconclient import client as pfcon
+
+from django.core.cache import cache
+
+from plugins.models import ComputeResource
+
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_TOKEN_TTL = 3600  # lifetime assumed for tokens without an expiration claim
+REFRESH_MARGIN = 300  # seconds before expiration at which a token gets refreshed
+LOCK_TIMEOUT = 30  # maximum seconds that a refresh is allowed to take
+
+_local_tokens = {}  # process-level cache {compute resource id: (token, expiration)}
+
+
+def get_compute_resource_auth_token(compute_resource: ComputeResource) -> str:
+    """
+    Get a valid auth token for a compute resource from the process-level cache, the
+    cluster-level cache or the DB (in this order). The token is refreshed from pfcon
+    if it's about to expire.
+    """
+    cr_id = compute_resource.id
+
+    entry = _local_tokens.get(cr_id)
+    if entry and not _expires_soon(entry[1]):
+        return entry[0]
+
+    entry = cache.get(_get_cache_key(cr_id))
+    if entry and not _expires_soon(entry[1]):
+        _local_tokens[cr_id] = entry
+        return entry[0]
+
+    token = compute_resource.compute_auth_token
+    expiration = _get_token_expiration(token)
+    if not _expires_soon(expiration):
+        _store_token(cr_id, token, expiration)
+        return token
+
+    return refresh_compute_resource_auth_token(compute_resource, token)
+
+
+def refresh_compute_resource_auth_token(compute_resource: ComputeResource,
+                                        expired_token: str | None = None) -> str:
+    """
+    Get a new auth token for a compute resource from pfcon and share it through the
+    caches and the DB. If another process is already refreshing the token then just
+    wait for its result. The passed expired token is never returned.
+    """
+    cr_id = compute_resource.id
+    lock_key = _get_cache_key(cr_id) + '_lock'
+
+    if cache.add(lock_key, 1, timeout=LOCK_TIMEOUT):
+        try:
+            # the token might have been refreshed just before getting the lock
+            entry = cache.get(_get_cache_key(cr_id))
+            if entry and entry[0] != expired_token and not _expires_soon(entry[1]):
+                _local_tokens[cr_id] = entry
+                return entry[0]
+            return _fetch_token(compute_resource)
+        finally:
+            cache.delete(lock_key)
+
+    # another process holds the lock, wait for the new token
+    deadline = time.time() + LOCK_TIMEOUT
+    while time.time() < deadline:
+        time.sleep(0.1)
+        entry = cache.get(_get_cache_key(cr_id))
+        if entry and entry[0] != expired_token and not _expires_soon(entry[1]):
+            _local_tokens[cr_id] = entry
+            return entry[0]
+        if not cache.get(lock_key):
+            break
+
+    logger.info(f'Timed out waiting for a concurrent auth token refresh for compute '
+                f'resource {compute_resource.name}')
+    return _fetch_token(compute_resource)
+
+
+def set_compute_resource_auth_token(compute_resource: ComputeResource, token: str):
+    """
+    Share an auth token obtained from pfcon for a compute resource through the caches
+    and the DB.
+    """
+    _store_token(compute_resource.id, token, _get_token_expiration(token))
+    _save_token(compute_resource, token)
+
+
+def _fetch_token(compute_resource: ComputeResource) -> str:
+    """
+    Internal function to get a new auth token for a compute resource from pfcon.
+    """
+    cr = compute_resource
+    logger.info(f'Refreshing auth token for compute resource {cr.name}')
+    token = pfcon.Client.get_auth_token(cr.compute_auth_url, cr.compute_user,
+                                        cr.compute_password)
+    set_compute_resource_auth_token(cr, token)
+    return token
+
+
+def _save_token(compute_resource: ComputeResource, token: str):
+    """
+    Internal function to persist a compute resource's auth token in the DB.
+    """
+    compute_resource.compute_auth_token = token
+    ComputeResource.objects.filter(id=compute_resource.id).exclude(
+        compute_auth_token=token).update(compute_auth_token=token)
+
+
+def _store_token(cr_id: int, token: str, expiration: float):
+    """
+    Internal function to store a compute resource's auth token in both caches.
+    """
+    entry = (token, expiration)
+    _local_tokens[cr_id] = entry
+    cache.set(_get_cache_key(cr_id), entry,
+              timeout=max(int(expiration - time.time()), 1))
+
+
+def _get_token_expiration(token: str) -> float:
+    """
+    Internal function to get the expiration timestamp of an auth token. pfcon tokens
+    are JWTs with an 'exp' claim, otherwise the default token lifetime is assumed.
+    """
+    try:
+        claims = jwt.decode(token, options={'verify_signature': False})
+        return float(claims['exp'])
+    except (jwt.InvalidTokenError, KeyError, TypeError, ValueError):
+        return time.time() + DEFAULT_TOKEN_TTL
+
+
+def _expires_soon(expiration: float) -> bool:
+    """
+    Internal function to check whether an expiration timestamp is within the refresh
+    margin.
+    """
+    return expiration - time.time() < REFRESH_MARGIN
+
+
+def _get_cache_key(cr_id: int) -> str:
+    return f'compute_resource_auth_token_{cr_id}'
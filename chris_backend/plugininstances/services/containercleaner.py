@@ -0,0 +1,125 @@
+"""
+Compute resource container cleaner module that provides the interface for deleting the
+remote containers of many plugin instances' jobs from a remote compute environment in a
+single sweep (ChRIS / pfcon interface).
+"""
+
+import logging
+import asyncio
+from typing import Dict
+
+from asgiref.sync import sync_to_async
+from pfconclient.client import JobType
+from pfconclient.exceptions import (PfconRequestException,
+                                    PfconRequestInvalidTokenException)
+
+from .asyncpfcon import AsyncPfconClient
+from .authtokens import (get_compute_resource_auth_token,
+                         refresh_compute_resource_auth_token)
+from .refcache import get_chris_instance
+
+
+logger = logging.getLogger(__name__)
+
+
+class ComputeResourceContainerCleaner(object):
+    """
+    ``ComputeResourceContainerCleaner`` deletes all the remote containers (copy, plugin,
+    upload, delete) of the jobs of many plugin instances running on a compute resource
+    with an asynchronous pfcon client that multiplexes at most MAX_CONCURRENT_REQUESTS
+    requests over a keep-alive connection pool.
+    """
+    MAX_CONCURRENT_REQUESTS = 20
+
+    def __init__(self, compute_resource):
+        self.compute_resource = compute_resource
+        self.str_job_id_prefix = get_chris_instance().job_id_prefix
+
+    def delete_all_remote_containers(self, plugin_instances) -> Dict[int, bool]:
+        """
+        Delete all the remote containers for the passed plugin instances' jobs. Returns
+        a dictionary mapping each plugin instance id to True if all its deletions
+        succeeded or False if any failed.
+        """
+        plg_inst_ids = [plg_inst.id for plg_inst in plugin_instances]
+
+        if not plg_inst_ids:
+            return {}
+
+        auth_token = get_compute_resource_auth_token(self.compute_resource)
+        results = asyncio.run(self._delete_all(plg_inst_ids, auth_token))
+        return dict(zip(plg_inst_ids, results))
+
+    def _get_job_types(self):
+        """
+        Internal method to get the types of the remote jobs run for a plugin instance
+        on the compute resource.
+        """
+        cr = self.compute_resource
+        job_types = []
+
+        if cr.compute_requires_copy_job:
+            job_types.append(JobType.COPY)
+
+        job_types.append(JobType.PLUGIN)
+
+        if cr.compute_requires_upload_job:
+            job_types.append(JobType.UPLOAD)
+
+        job_types.append(JobType.DELETE)
+        return job_types
+
+    async def _delete_all(self, plg_inst_ids, auth_token: str):
+        """
+        Internal coroutine to concurrently delete the remote containers for the passed
+        plugin instance ids' jobs.
+        """
+        cr = self.compute_resource
+        job_types = self._get_job_types()
+
+        async with AsyncPfconClient(cr.compute_url, auth_token,
+                                    self.MAX_CONCURRENT_REQUESTS) as pfcon_client:
+            results = await asyncio.gather(
+                *[self._delete_job_containers(pfcon_client, plg_inst_id, job_types)
+                  for plg_inst_id in plg_inst_ids])
+        return results
+
+    async def _delete_job_containers(self, pfcon_client, plg_inst_id,
+                                     job_types) -> bool:
+        """
+        Internal coroutine to delete all the remote containers for a plugin instance's
+        job. Returns True if all deletions succeeded, False if any failed.
+        """
+        job_id = self.str_job_id_prefix + str(plg_inst_id)
+        results = await asyncio.gather(
+            *[self._delete(pfcon_client, job_type, job_id) for job_type in job_types])
+        return all(results)
+
+    async def _delete(self, pfcon_client, job_type: JobType, job_id: str) -> bool:
+        """
+        Internal coroutine to delete a job container from the remote pfcon service.
+        """
+        try:
+            auth_token = pfcon_client.auth_token
+            try:
+                await pfcon_client.delete_job(job_type, job_id)
+            except PfconRequestInvalidTokenException:
+                logger.info(f'Auth token has expired while requesting to delete '
+                            f'{job_type} job {job_id} from pfcon url '
+                            f'-->{pfcon_client.url}<--')
+                await pfcon_client.refresh_auth_token(self._refresh_auth_token,
+                                                      auth_token)
+                await pfcon_client.delete_job(job_type, job_id)
+        except PfconRequestException:
+            logger.error(f'[CODE12,{job_id}]: Error deleting {job_type} container '
+                         f'from pfcon at url -->{pfcon_client.url}<--')
+            return False
+        return True
+
+    async def _refresh_auth_token(self, expired_token: str) -> str:
+        """
+        Internal coroutine to get a new auth token for the compute resource through
+        the cluster-wide single-flight refresh shared with the synchronous jobs.
+        """
+        return await sync_to_async(refresh_compute_resource_auth_token)(
+            self.compute_resource, expired_token)
@@ -19,6 +19,7 @@ from core.utils import json_zip2str
 from core.models import  ChrisFile
 from plugininstances.models import PluginInstance
 from .abstractjobs import PluginInstanceJob
+from .locality import DataLocalityTracker
 from .pluginjobs import PluginInstanceAppJob
 
 
@@ -31,10 +32,6 @@ class PluginInstanceCopyJob(PluginInstanceJob):
     copy job related to a plugin instance.
     """
 
-    def __init__(self, plugin_instance):
-        super().__init__(plugin_instance)
-        self.l_plugin_inst_param_instances = self.c_plugin_inst.get_parameter_instances()
-
     def run(self):
         """
         Run the plugin instance copy job via a call to a remote pfcon service.
@@ -45,13 +42,7 @@ class PluginInstanceCopyJob(PluginInstanceJob):
         job_id = self.str_job_id        
         plugin = self.c_plugin_inst.plugin
         plugin_type = plugin.meta.type
-        inputdirs = []
-
-        _, d_path_params = self.get_plugin_instance_path_parameters()
-        for path_param_value in [param_value for param_value in d_path_params.values()]:
-            # the value of each parameter of type 'path' is a string
-            # representing a comma-separated list of paths in obj storage
-            inputdirs = inputdirs + path_param_value.split(',')
+        inputdirs = self.get_path_parameters_input_dirs()
 
         try:
             if plugin_type == 'ds':
@@ -61,6 +52,7 @@ class PluginInstanceCopyJob(PluginInstanceJob):
             self.c_plugin_inst.status = 'cancelled'  # giving up
             self.c_plugin_inst.error_code = 'CODE01'
             self.c_plugin_inst.save(update_fields=['status', 'error_code'])
+            self.schedule_dependent_plugin_instances()
             self.schedule_remote_cleanup()
             return
 
@@ -94,6 +86,7 @@ class PluginInstanceCopyJob(PluginInstanceJob):
                 self.c_plugin_inst.error_code = 'CODE01'
                 self.c_plugin_inst.status = 'cancelled'  # giving up
                 self.c_plugin_inst.save(update_fields=['status', 'error_code'])
+                self.schedule_dependent_plugin_instances()
                 self.schedule_remote_cleanup()
             else:
                 self.c_plugin_inst.save(update_fields=['copy_retry_count'])
@@ -110,7 +103,8 @@ class PluginInstanceCopyJob(PluginInstanceJob):
             now = timezone.now()
             self.c_plugin_inst.start_date = now
             self.c_plugin_inst.end_date = now
-            self.c_plugin_inst.save()
+            self.c_plugin_inst.save(update_fields=['summary', 'raw', 'start_date',
+                                                   'end_date'])
 
     def check_exec_status(self):
         """
@@ -147,15 +141,9 @@ class PluginInstanceCopyJob(PluginInstanceJob):
             logger.info(f'Current copy job {job_id} plugin instance DB status = '
                         f'{self.c_plugin_inst.status}')
 
-            summary = self.get_job_status_summary(d_resp)
-            self.c_plugin_inst.summary = summary
-            raw = json_zip2str(d_resp)
-            self.c_plugin_inst.raw = raw
-
             # only update (atomically) if still in copy phase to avoid concurrency problems
-            PluginInstance.objects.filter(
-                id=self.c_plugin_inst.id,
-                status=self.c_plugin_inst.status).update(summary=summary, raw=raw)
+            self.save_job_status_summary(self.c_plugin_inst, d_resp,
+                                         status=self.c_plugin_inst.status)
 
             if status == 'finishedSuccessfully':
                 self.handle_finished_successfully_status()
@@ -172,6 +160,7 @@ class PluginInstanceCopyJob(PluginInstanceJob):
         """
         self.c_plugin_inst.status = 'cancelled'
         self.c_plugin_inst.save(update_fields=['status'])
+        self.schedule_dependent_plugin_instances()
         self.schedule_remote_cleanup()
 
     def delete(self):
@@ -224,6 +213,18 @@ class PluginInstanceCopyJob(PluginInstanceJob):
         self.c_plugin_inst.error_code = 'CODE11'
         raise NameError('Presumable eventual consistency problem.')
 
+    def get_path_parameters_input_dirs(self):
+        """
+        Get the list of storage paths passed in the plugin instance's path parameters.
+        """
+        inputdirs = []
+        _, d_path_params = self.get_plugin_instance_path_parameters()
+        for path_param_value in d_path_params.values():
+            # the value of each parameter of type 'path' is a string
+            # representing a comma-separated list of paths in obj storage
+            inputdirs = inputdirs + path_param_value.split(',')
+        return inputdirs
+
     def get_plugin_instance_path_parameters(self):
         """
         Get the unextpath and path parameters dictionaries in a tuple. The keys and
@@ -251,13 +252,35 @@ class PluginInstanceCopyJob(PluginInstanceJob):
         
         logger.info(f'Successfully finished plugin instance copy job {job_id}')
         
-        # data successfully copied so update instance summary
-        self.c_plugin_inst.summary['pushPath']['status'] = True
+        # data successfully copied so update instance summary and locality table
+        if not self.c_plugin_inst.summary['pushPath']['status']:
+            self.c_plugin_inst.summary['pushPath']['status'] = True
+            self.c_plugin_inst.save(update_fields=['summary'])
+            self.c_plugin_inst.add_timeline_events('copied')
+            inputdirs = self.get_path_parameters_input_dirs()
+            if self.c_plugin_inst.plugin.meta.type == 'ds':
+                inputdirs.append(self.c_plugin_inst.previous.get_output_path())
+            DataLocalityTracker.record(self.c_plugin_inst, inputdirs)
+
+        # a prefetched copy job can finish before its previous plugin instance
+        previous_status = PluginInstance.objects.filter(
+            id=self.c_plugin_inst.previous_id).values_list('status', flat=True).first()
+
+        if previous_status not in (None, 'finishedSuccessfully'):
+            if previous_status in ('finishedWithError', 'cancelled'):
+                logger.info(f'Cancelling prefetched copy job {job_id} as its previous '
+                            f'plugin instance ended with {previous_status} status')
+                self.cancel_exec()
+            else:
+                logger.info(f'Holding prefetched copy job {job_id} until its previous '
+                            f'plugin instance has finished successfully')
+            return
+
         now = timezone.now()
         self.c_plugin_inst.start_date = now  # save scheduling date
         self.c_plugin_inst.end_date = now
         self.c_plugin_inst.status = 'scheduled'
-        self.c_plugin_inst.save()
+        self.c_plugin_inst.save(update_fields=['start_date', 'end_date', 'status'])
         plg_inst_app_job = PluginInstanceAppJob(self.c_plugin_inst)
         plg_inst_app_job.run()
 
@@ -273,6 +296,7 @@ class PluginInstanceCopyJob(PluginInstanceJob):
         self.c_plugin_inst.status = 'cancelled'
         self.c_plugin_inst.error_code = 'CODE18'
         self.c_plugin_inst.save(update_fields=['status', 'error_code'])
+        self.schedule_dependent_plugin_instances()
         self.schedule_remote_cleanup()
 
     def handle_undefined_status(self):
@@ -291,6 +315,7 @@ class PluginInstanceCopyJob(PluginInstanceJob):
             self.c_plugin_inst.status = 'cancelled'
             self.c_plugin_inst.error_code = 'CODE18'
             self.c_plugin_inst.save(update_fields=['status', 'error_code'])
+            self.schedule_dependent_plugin_instances()
             self.schedule_remote_cleanup()
         else:
             self.c_plugin_inst.save(update_fields=['copy_retry_count'])
@@ -0,0 +1,148 @@
+"""
+DAG builder module that provides the interface for instantiating a whole tree of plugin
+instances (e.g. a workflow) with a constant number of DB queries regardless of the
+number of nodes in the tree.
+"""
+
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core.models import ChrisFolder
+from plugins.models import Plugin, PluginParameter, ComputeResource
+from plugininstances.models import PluginInstance, PARAMETER_MODELS
+
+
+class PluginInstanceDAGBuilder(object):
+    """
+    ``PluginInstanceDAGBuilder`` prepares all the plugin instances of a tree hanging
+    from an existing plugin instance, their output folders and typed parameters in
+    memory and then inserts them with a handful of bulk queries. The DB ids are
+    reserved upfront from the tables' sequences so that previous pointers, lineages,
+    output folder paths, ts parents and 'plugininstances' parameters can all be
+    resolved before anything is written.
+    """
+
+    def __init__(self, owner: User, previous: PluginInstance, workflow=None):
+        self.owner = owner
+        self.previous = previous
+        self.workflow = workflow
+        self.nodes = []  # nodes in the order they were added
+
+    def add_node(self, key: Hashable, plugin: Plugin, compute_resource: ComputeResource,
+                 title: str = '', params: Sequence[Tuple[PluginParameter, Any]] = (),
+                 previous_key: Optional[Hashable] = None,
+                 ts_parent_keys: Iterable[Hashable] = (),
+                 ts_parent_ids: Iterable[int] = (), status: str = 'created'):
+        """
+        Add a new node to the tree. A node without a previous key hangs from the
+        builder's previous plugin instance. Nodes must be added after their previous
+        node. The ts parents of a 'ts' node can be both other nodes (ts_parent_keys)
+        and existing plugin instances (ts_parent_ids). When ts parent nodes are given
+        the value of the node's 'plugininstances' parameter is set to the ids of the
+        plugin instances created for them.
+        """
+        self.nodes.append({'key': key, 'plugin': plugin,
+                           'compute_resource': compute_resource, 'title': title,
+                           'params': params, 'previous_key': previous_key,
+                           'ts_parent_keys': list(ts_parent_keys),
+                           'ts_parent_ids': list(ts_parent_ids), 'status': status})
+
+    def create(self) -> Dict[Hashable, PluginInstance]:
+        """
+        Create all the plugin instances in the tree with their output folders,
+        parameters and ts parents. Returns a dictionary mapping each node key to its
+        new plugin instance.
+        """
+        if not self.nodes:
+            return {}
+
+        now = timezone.now().isoformat()
+        with transaction.atomic():
+            plg_inst_ids = self._reserve_ids(PluginInstance, len(self.nodes))
+            folder_ids = self._reserve_ids(ChrisFolder, 2 * len(self.nodes))
+
+            previous_dir = self.previous.output_folder.parent
+            instances = {}
+            dirs = {}  # map from node key to the parent folder of its output folder
+            folders = []
+            for i, node in enumerate(self.nodes):
+                plg_inst_id = plg_inst_ids[i]
+                key = node['key']
+                prev_key = node['previous_key']
+                previous = self.previous if prev_key is None else instances[prev_key]
+                parent_dir = previous_dir if prev_key is None else dirs[prev_key]
+
+                plugin = node['plugin']
+                dir_folder = ChrisFolder(
+                    id=folder_ids[2 * i],
+                    path=f'{parent_dir.path}/{plugin.meta.name}_{plg_inst_id}',
+                    owner=self.owner, parent=parent_dir)
+                output_folder = ChrisFolder(id=folder_ids[2 * i + 1],
+                                            path=f'{dir_folder.path}/data',
+                                            owner=self.owner, parent=dir_folder)
+                folders.extend([dir_folder, output_folder])
+                dirs[key] = dir_folder
+
+                plg_inst = PluginInstance(
+                    id=plg_inst_id, plugin=plugin, owner=self.owner, previous=previous,
+                    title=node['title'], status=node['status'],
+                    compute_resource=node['compute_resource'], workflow=self.workflow,
+                    feed=self.previous.feed, output_folder=output_folder,
+                    lineage=f'{previous.lineage}{plg_inst_id}/',
+                    timeline={node['status']: now})
+                plg_inst._set_compute_defaults()
+                instances[key] = plg_inst
+
+            ChrisFolder.objects.bulk_create(folders)
+            PluginInstance.objects.bulk_create(instances.values())
+            self._create_parameters(instances)
+            self._create_ts_parents(instances)
+        return instances
+
+    def _create_parameters(self, instances: Dict[Hashable, PluginInstance]):
+        """
+        Internal method to bulk create the typed parameters of the new plugin
+        instances.
+        """
+        d_params: Dict[str, List] = {}  # map from parameter type to parameter objects
+        for node in self.nodes:
+            plg_inst = instances[node['key']]
+            ts_parent_ids = [str(instances[k].id) for k in node['ts_parent_keys']]
+            for plugin_param, value in node['params']:
+                if ts_parent_ids and plugin_param.name == 'plugininstances':
+                    value = ','.join(ts_parent_ids)
+                param = PARAMETER_MODELS[plugin_param.type](
+                    plugin_inst=plg_inst, plugin_param=plugin_param, value=value)
+                d_params.setdefault(plugin_param.type, []).append(param)
+
+        for param_type, params in d_params.items():
+            PARAMETER_MODELS[param_type].objects.bulk_create(params)
+
+    def _create_ts_parents(self, instances: Dict[Hashable, PluginInstance]):
+        """
+        Internal method to bulk create the ts parents join table rows of the new 'ts'
+        plugin instances.
+        """
+        through = PluginInstance.ts_parents.through
+        rows = []
+        for node in self.nodes:
+            parent_ids = [instances[k].id for k in node['ts_parent_keys']]
+            parent_ids.extend(node['ts_parent_ids'])
+            rows.extend([through(from_plugininstance_id=instances[node['key']].id,
+                                 to_plugininstance_id=parent_id)
+                         for parent_id in parent_ids])
+        if rows:
+            through.objects.bulk_create(rows)
+
+    @staticmethod
+    def _reserve_ids(model, n: int) -> List[int]:
+        """
+        Internal method to reserve n new ids from the sequence of a model's table.
+        """
+        sql = 'SELECT nextval(pg_get_serial_sequence(%s, %s)) FROM generate_series(1, %s)'
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [model._meta.db_table, model._meta.pk.column, n])
+            return sorted(row[0] for row in cursor.fetchall())
@@ -14,6 +14,7 @@ from core.utils import json_zip2str
 from core.models import ChrisFolder
 from plugininstances.models import PluginInstance
 from .abstractjobs import PluginInstanceJob
+from .locality import DataLocalityTracker
 
 
 logger = logging.getLogger(__name__)
@@ -84,15 +85,9 @@ class PluginInstanceDeleteJob(PluginInstanceJob):
         status = d_resp['compute']['status']
         logger.info(f'Current delete job {job_id} remote status = {status}')
 
-        summary = self.get_job_status_summary(d_resp)
-        self.c_plugin_inst.summary = summary
-        raw = json_zip2str(d_resp)
-        self.c_plugin_inst.raw = raw
-
         # only update (atomically) if remote_cleanup_status='deletingData'
-        PluginInstance.objects.filter(
-            id=self.c_plugin_inst.id,
-            remote_cleanup_status='deletingData').update(summary=summary, raw=raw)
+        self.save_job_status_summary(self.c_plugin_inst, d_resp,
+                                     remote_cleanup_status='deletingData')
 
         if status == 'finishedSuccessfully':
             self.handle_finished_successfully_status()
@@ -140,6 +135,7 @@ class PluginInstanceDeleteJob(PluginInstanceJob):
         """
         job_id = self.str_job_id
         logger.info(f'Delete data job {job_id} finished successfully')
+        DataLocalityTracker.clear(self.c_plugin_inst)
 
         self.c_plugin_inst.remote_cleanup_status = 'deletingContainers'
         self.c_plugin_inst.save(update_fields=['remote_cleanup_status'])
@@ -0,0 +1,138 @@
+"""
+Plugin instance lock module that provides a DB lease lock guarding the registration of
+a plugin instance's output files. The registering worker periodically renews its lease
+so that a lock held by a crashed worker expires within seconds and can be taken over
+by another worker to resume the registration.
+"""
+
+import logging
+import threading
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction, IntegrityError
+from django.utils import timezone
+
+from plugininstances.models import PluginInstance, PluginInstanceLock
+
+
+logger = logging.getLogger(__name__)
+
+
+class PluginInstanceLockLostException(Exception):
+    pass
+
+
+class PluginInstanceLeaseLock(object):
+    """
+    ``PluginInstanceLeaseLock`` holds a plugin instance's ``PluginInstanceLock`` row
+    for a limited lease time. While held, a background thread renews the lease every
+    third of its duration. The row is kept after the lock is released so the files
+    registration can't be started again.
+    """
+
+    def __init__(self, plugin_inst: PluginInstance, lease_seconds: float = None):
+        self.plugin_inst = plugin_inst
+        self.lease_seconds = lease_seconds or settings.PLUGIN_INSTANCE_LOCK_LEASE_SECONDS
+        self.holder = uuid.uuid4().hex
+        self.held = False
+        self.taken_over = False
+        self.lost = False
+        self._stop_renewal = threading.Event()
+        self._renewal_thread = None
+
+    def acquire(self, takeover: bool = False) -> bool:
+        """
+        Try to acquire the lock. If takeover then an existing lock whose lease has
+        expired while its plugin instance is still registering files is taken over.
+        Returns True if the lock was acquired.
+        """
+        lock = PluginInstanceLock(plugin_inst=self.plugin_inst, holder=self.holder,
+                                  expiration_date=self._get_expiration_date())
+        try:
+            with transaction.atomic():
+                lock.save()
+        except IntegrityError:
+            # another worker has already entered the lock section of the code
+            if not takeover:
+                return False
+            # only take over (atomically) if the lease of the previous holder expired
+            now = timezone.now()
+            n = PluginInstanceLock.objects.filter(
+                plugin_inst_id=self.plugin_inst.id, expiration_date__lt=now,
+                plugin_inst__status='registeringFiles').update(
+                holder=self.holder, expiration_date=self._get_expiration_date())
+            if not n:
+                return False
+            self.taken_over = True
+            logger.info(f'Took over expired lock of plugin instance with id '
+                        f'{self.plugin_inst.id}')
+        self.held = True
+        self.lost = False
+        self._start_renewal()
+        return True
+
+    def renew(self) -> bool:
+        """
+        Extend the lease of a held lock. Returns False if the lock is no longer held
+        by this instance (the lease expired and it was taken over by another worker).
+        """
+        n = PluginInstanceLock.objects.filter(
+            plugin_inst_id=self.plugin_inst.id, holder=self.holder).update(
+            expiration_date=self._get_expiration_date())
+        if not n:
+            self.lost = True
+            logger.warning(f'Lost lock of plugin instance with id '
+                           f'{self.plugin_inst.id}')
+        return bool(n)
+
+    def check(self):
+        """
+        Raise PluginInstanceLockLostException if the lock has been taken over by
+        another worker.
+        """
+        if self.lost:
+            raise PluginInstanceLockLostException(
+                f'Lost lock of plugin instance with id {self.plugin_inst.id}')
+
+    def release(self):
+        """
+        Stop renewing the lease of a held lock.
+        """
+        if not self.held:
+            return
+        self._stop_renewal.set()
+        if self._renewal_thread is not None:
+            self._renewal_thread.join()
+            self._renewal_thread = None
+        self.held = False
+
+    def _get_expiration_date(self):
+        """
+        Internal method to get the expiration date of a lease starting now.
+        """
+        return timezone.now() + timedelta(seconds=self.lease_seconds)
+
+    def _start_renewal(self):
+        """
+        Internal method to start the background thread renewing the lease.
+        """
+        self._stop_renewal.clear()
+        interval = self.lease_seconds / 3
+
+        def renew_until_stopped():
+            try:
+                while not self._stop_renewal.wait(interval):
+                    try:
+                        if not self.renew():
+                            break
+                    except Exception as e:
+                        logger.warning(f'Error renewing lock of plugin instance with '
+                                       f'id {self.plugin_inst.id}, detail: {str(e)}')
+            finally:
+                connection.close()  # the thread's own DB connection
+
+        self._renewal_thread = threading.Thread(target=renew_until_stopped,
+                                                daemon=True)
+        self._renewal_thread.start()
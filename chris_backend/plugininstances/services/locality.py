@@ -0,0 +1,83 @@
+"""
+Data locality module that provides the interface for tracking which storage paths are
+currently resident in the job directories of a remote compute environment. A path
+becomes resident when a copy job has copied it to the remote or a plugin job has
+produced it there, and stops being resident when the job's remote data is deleted.
+"""
+
+import logging
+from typing import Dict, Iterable
+
+from django.db import IntegrityError
+
+from plugins.models import ComputeResource
+from plugininstances.models import PluginInstance, RemoteDataLocation
+
+
+logger = logging.getLogger(__name__)
+
+
+class DataLocalityTracker(object):
+    """
+    ``DataLocalityTracker`` maintains the locality table (``RemoteDataLocation``) of
+    the storage paths held by the remote job directories of the plugin instances.
+    """
+
+    @staticmethod
+    def record(plugin_inst: PluginInstance, paths: Iterable[str]):
+        """
+        Record that the passed storage paths are resident in the remote job directory
+        of a plugin instance.
+        """
+        paths = {path.strip('/') for path in paths if path.strip('/')}
+        locations = [RemoteDataLocation(path=path, plugin_inst=plugin_inst,
+                                        compute_resource=plugin_inst.compute_resource)
+                     for path in paths]
+        try:
+            RemoteDataLocation.objects.bulk_create(locations, ignore_conflicts=True)
+        except IntegrityError as e:  # the plugin instance has been deleted meanwhile
+            logger.warning(f'Could not record remote data locations for plugin '
+                           f'instance {plugin_inst.id}, detail: {str(e)}')
+
+    @staticmethod
+    def clear(plugin_inst: PluginInstance):
+        """
+        Forget all the storage paths held by the remote job directory of a plugin
+        instance (its remote data has been deleted).
+        """
+        RemoteDataLocation.objects.filter(plugin_inst=plugin_inst).delete()
+
+    @classmethod
+    def get_resident_paths(cls, compute_resource: ComputeResource,
+                           paths: Iterable[str]) -> Dict[str, int]:
+        """
+        Get the passed storage paths that are already resident in a remote compute
+        environment, either themselves or through an ancestor folder. Returns a
+        dictionary mapping each resident path to the id of a plugin instance whose
+        remote job directory holds it.
+        """
+        d_candidates = {}  # map from each path or ancestor to the requested paths
+        for path in {path.strip('/') for path in paths if path.strip('/')}:
+            for ancestor in cls._get_ancestor_paths(path):
+                d_candidates.setdefault(ancestor, []).append(path)
+
+        if not d_candidates:
+            return {}
+
+        locations = RemoteDataLocation.objects.filter(
+            compute_resource=compute_resource, path__in=list(d_candidates)).values_list(
+            'path', 'plugin_inst_id')
+
+        resident = {}
+        for location_path, plugin_inst_id in locations:
+            for path in d_candidates[location_path]:
+                resident.setdefault(path, plugin_inst_id)
+        return resident
+
+    @staticmethod
+    def _get_ancestor_paths(path: str) -> list:
+        """
+        Internal method to get a path and all its ancestor paths.
+        """
+        parts = path.split('/')
+        return ['/'.join(parts[:i]) for i in range(1, len(parts) + 1)]
@@ -0,0 +1,149 @@
+"""
+Placement module that provides the interface for choosing the compute resource a new
+plugin instance is scheduled to when the client doesn't explicitly request one.
+"""
+
+import abc
+from collections import defaultdict
+from typing import Dict, Iterable, Optional
+
+from django.conf import settings
+from django.db.models import Count
+from django.utils.module_loading import import_string
+
+from plugins.models import ComputeResource
+from plugininstances.models import PluginInstance
+
+from .admission import ADMITTED_STATUSES
+
+
+# statuses of the plugin instances that count towards a compute resource's load
+LOAD_STATUSES = ADMITTED_STATUSES + ('waiting',)
+
+
+class PlacementStrategy(abc.ABC):
+    """
+    Abstract class for the compute resource placement strategies. The compute resource
+    with the lowest sort key among the eligible ones is chosen (ties are broken by
+    registration order).
+    """
+
+    @abc.abstractmethod
+    def get_sort_key(self, compute_resource: ComputeResource, load: int,
+                     previous_compute_resource_id: Optional[int]) -> tuple:
+        """
+        Get the sort key of an eligible compute resource given its current load
+        (number of active and waiting plugin instances) and the id of the previous
+        plugin instance's compute resource.
+        """
+        ...
+
+
+class FirstPlacementStrategy(PlacementStrategy):
+    """
+    Always choose the first registered compute resource.
+    """
+
+    def get_sort_key(self, compute_resource, load, previous_compute_resource_id):
+        return ()
+
+
+class LeastActivePlacementStrategy(PlacementStrategy):
+    """
+    Choose the compute resource with the lowest number of active and waiting plugin
+    instances.
+    """
+
+    def get_sort_key(self, compute_resource, load, previous_compute_resource_id):
+        return (load,)
+
+
+class WeightedCapacityPlacementStrategy(PlacementStrategy):
+    """
+    Choose the compute resource with the largest number of free job slots according
+    to its max_active_jobs field (compute resources without a cap have unlimited free
+    slots and are ranked among themselves by load).
+    """
+
+    def get_sort_key(self, compute_resource, load, previous_compute_resource_id):
+        cap = compute_resource.max_active_jobs
+        free_slots = cap - load if cap >= 0 else float('inf')
+        return -free_slots, load
+
+
+class DataLocalityPlacementStrategy(PlacementStrategy):
+    """
+    Choose the compute resource of the previous plugin instance (where its output
+    data is produced) if eligible, otherwise fall back to the least active one.
+    """
+
+    def get_sort_key(self, compute_resource, load, previous_compute_resource_id):
+        return int(compute_resource.id != previous_compute_resource_id), load
+
+
+PLACEMENT_STRATEGIES = {
+    'first': FirstPlacementStrategy,
+    'least_active': LeastActivePlacementStrategy,
+    'weighted_capacity': WeightedCapacityPlacementStrategy,
+    'data_locality': DataLocalityPlacementStrategy,
+}
+
+
+def get_placement_strategy(name: str) -> PlacementStrategy:
+    """
+    Get a placement strategy instance from either its registered name or the dotted
+    path of a ``PlacementStrategy`` subclass.
+    """
+    if name in PLACEMENT_STRATEGIES:
+        return PLACEMENT_STRATEGIES[name]()
+    return import_string(name)()
+
+
+class ComputeResourcePlacementPolicy(object):
+    """
+    ``ComputeResourcePlacementPolicy`` chooses among a plugin's eligible compute
+    resources using the strategy configured in the COMPUTE_RESOURCE_PLACEMENT_STRATEGY
+    setting and the live number of active plugin instances in each compute resource.
+    The load is fetched once per policy instance and updated with its own placements,
+    so a single instance can be used to spread a batch of new plugin instances.
+    """
+
+    def __init__(self, strategy: Optional[str] = None):
+        self.strategy = get_placement_strategy(
+            strategy or settings.COMPUTE_RESOURCE_PLACEMENT_STRATEGY)
+        self.load = {}
+
+    def select(self, compute_resources: Iterable[ComputeResource],
+               previous_compute_resource_id: Optional[int] = None
+               ) -> Optional[ComputeResource]:
+        """
+        Choose a compute resource among the passed eligible ones (for instance a
+        plugin's compute_resources related manager). Returns None if there isn't any.
+        """
+        if hasattr(compute_resources, 'all'):
+            compute_resources = compute_resources.all()
+        compute_resources = sorted(compute_resources, key=lambda cr: cr.id)
+
+        if len(compute_resources) < 2:
+            return compute_resources[0] if compute_resources else None
+
+        self._fetch_load([cr.id for cr in compute_resources if cr.id not in self.load])
+
+        selected = min(compute_resources, key=lambda cr: self.strategy.get_sort_key(
+            cr, self.load[cr.id], previous_compute_resource_id))
+        self.load[selected.id] += 1
+        return selected
+
+    def _fetch_load(self, cr_ids: Iterable[int]):
+        """
+        Internal method to fetch the current load of the passed compute resources.
+        """
+        cr_ids = list(cr_ids)
+        if not cr_ids:
+            return
+        counts: Dict[int, int] = defaultdict(int)
+        counts.update(PluginInstance.objects.filter(
+            compute_resource_id__in=cr_ids, status__in=LOAD_STATUSES).order_by(
+            ).values_list('compute_resource_id').annotate(n=Count('id')))
+        for cr_id in cr_ids:
+            self.load[cr_id] = counts[cr_id]
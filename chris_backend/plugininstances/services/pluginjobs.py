@@ -19,15 +19,17 @@ from pfconclient.exceptions import (PfconRequestException,
 
 from django.utils import timezone
 from django.conf import settings
-from django.db.utils import IntegrityError
+from django.db import transaction
 from rest_framework.authtoken.models import Token
 
 from core.utils import json_zip2str
 from core.models import ChrisFolder, ChrisFile, ChrisLinkFile
-from plugininstances.models import PluginInstance, PluginInstanceLock
+from plugininstances.models import PluginInstance
 from userfiles.models import UserFile
 from .abstractjobs import PluginInstanceJob
 from .uploadjobs import PluginInstanceUploadJob
+from .instancelock import PluginInstanceLeaseLock
+from .locality import DataLocalityTracker
 
 
 logger = logging.getLogger(__name__)
@@ -38,10 +40,7 @@ class PluginInstanceAppJob(PluginInstanceJob):
     ``PluginInstanceAppJob`` provides a concrete implementation for managing a remote 
     app job related to a plugin instance.
     """
-
-    def __init__(self, plugin_instance):
-        super().__init__(plugin_instance)
-        self.l_plugin_inst_param_instances = self.c_plugin_inst.get_parameter_instances()
+    OUTPUT_FILES_BATCH_SIZE = 5000
 
     def run(self):
         """
@@ -71,6 +70,7 @@ class PluginInstanceAppJob(PluginInstanceJob):
             self.c_plugin_inst.status = 'cancelled'  # giving up
             self.c_plugin_inst.error_code = 'CODE01'
             self.c_plugin_inst.save(update_fields=['status', 'error_code'])
+            self.schedule_dependent_plugin_instances()
             self.schedule_remote_cleanup()
             return
 
@@ -109,6 +109,7 @@ class PluginInstanceAppJob(PluginInstanceJob):
                 self.c_plugin_inst.status = 'cancelled'  # giving up
                 self.c_plugin_inst.error_code = 'CODE01'
                 self.c_plugin_inst.save(update_fields=['status', 'error_code'])
+                self.schedule_dependent_plugin_instances()
                 self.schedule_remote_cleanup()
                 return
             job_zip_file_content = job_zip_file.getvalue()
@@ -127,6 +128,7 @@ class PluginInstanceAppJob(PluginInstanceJob):
             self.c_plugin_inst.error_code = 'CODE01'
             self.c_plugin_inst.status = 'cancelled'  # giving up
             self.c_plugin_inst.save(update_fields=['status', 'error_code'])
+            self.schedule_dependent_plugin_instances()
             self.schedule_remote_cleanup()
         else:
             logger.info(f'Successfully submitted plugin job {job_id} to pfcon url '
@@ -144,7 +146,10 @@ class PluginInstanceAppJob(PluginInstanceJob):
             now = timezone.now()
             self.c_plugin_inst.start_date = now
             self.c_plugin_inst.end_date = now
-            self.c_plugin_inst.save()
+            self.c_plugin_inst.next_check_date = None  # check soon after submission
+            self.c_plugin_inst.save(update_fields=['status', 'summary', 'raw',
+                                                   'start_date', 'end_date',
+                                                   'next_check_date'])
 
     @staticmethod
     def _assemble_exec(selfpath: Optional[str], selfexec: str, execshell: Optional[str]) -> List[str]:
@@ -223,15 +228,8 @@ class PluginInstanceAppJob(PluginInstanceJob):
             logger.info(f'Current plugin job {job_id} plugin instance DB status = '
                         f'{self.c_plugin_inst.status}')
 
-            summary = self.get_job_status_summary(d_resp)
-            self.c_plugin_inst.summary = summary
-            raw = json_zip2str(d_resp)
-            self.c_plugin_inst.raw = raw
-            
             # only update (atomically) if status='started' to avoid concurrency problems
-            PluginInstance.objects.filter(
-                id=self.c_plugin_inst.id,
-                status='started').update(summary=summary, raw=raw)
+            self.save_job_status_summary(self.c_plugin_inst, d_resp, status='started')
 
             if status == 'finishedSuccessfully':
                 self.handle_finished_successfully_status()
@@ -247,6 +245,7 @@ class PluginInstanceAppJob(PluginInstanceJob):
         """
         self.c_plugin_inst.status = 'cancelled'
         self.c_plugin_inst.save(update_fields=['status'])
+        self.schedule_dependent_plugin_instances()
         self.schedule_remote_cleanup()
 
     def delete(self):
@@ -516,7 +515,6 @@ class PluginInstanceAppJob(PluginInstanceJob):
                                      f'{storage_fname} to storage, detail: {str(e)}')
                         self.c_plugin_inst.error_code = 'CODE07'
                         raise ValueError(str(e))
-                    self.plugin_inst_output_files.add(storage_fname)
         except ValueError:
             raise
         except Exception as e:
@@ -562,7 +560,6 @@ class PluginInstanceAppJob(PluginInstanceJob):
                     self.c_plugin_inst.error_code = 'CODE14'
                     raise ValueError(err_msg)
                 time.sleep(1)
-        self.plugin_inst_output_files = files_from_json
 
     def _handle_unextpath_parameters(self, unextpath_parameters_dict):
         """
@@ -580,7 +577,11 @@ class PluginInstanceAppJob(PluginInstanceJob):
             path_list = unextpath_parameters_dict[param_flag].split(',')
 
             for path in path_list:
-                self._create_chris_link_file(path, link_parent_folder)
+                try:
+                    ChrisLinkFile.objects.get(path=path.rstrip('/'),
+                                              parent_folder=link_parent_folder)
+                except ChrisLinkFile.DoesNotExist:
+                    self._create_chris_link_file(path, link_parent_folder)
 
     def _create_chris_link_file(self, linked_path, parent_folder):
         """
@@ -692,7 +693,6 @@ class PluginInstanceAppJob(PluginInstanceJob):
                                      f'detail: {str(e)}')
                         self.c_plugin_inst.error_code = 'CODE09'
                         raise
-                    self.plugin_inst_output_files.add(obj_output_path)
 
     def _handle_ts_unextracted_input_objs(self, d_ts_input_objs, group_by_instance):
         """
@@ -702,7 +702,7 @@ class PluginInstanceAppJob(PluginInstanceJob):
         job_id = self.str_job_id
         outputdir = self.c_plugin_inst.get_output_path()
         owner = self.c_plugin_inst.owner
-        link_folders = {}
+        obj_output_paths = []
 
         for plg_inst_id in d_ts_input_objs:
             plg_inst_output_path = d_ts_input_objs[plg_inst_id]['output_path']
@@ -715,51 +715,57 @@ class PluginInstanceAppJob(PluginInstanceJob):
             for obj in obj_list:
                 obj_output_path = os.path.join(plg_inst_outputdir, obj.replace(
                     plg_inst_output_path, '', 1).lstrip('/'))
+                obj_output_paths.append((obj, obj_output_path))
 
-                if obj.endswith('.chrislink'):
-                    try:
-                        path = self.storage_manager.download_obj(obj).decode().strip()
-                    except Exception as e:
-                        logger.error(f'[CODE08,{job_id}]: Error while downloading file '
-                                     f'{obj} from storage, detail: {str(e)}')
-                        self.c_plugin_inst.error_code = 'CODE08'
-                        raise
+        # create all the folders that will contain link files in bulk
+        link_folders = ChrisFolder.ensure_tree(
+            {os.path.dirname(obj_output_path) for (obj, obj_output_path) in
+             obj_output_paths if obj.endswith('.chrislink')}, owner)
 
-                    folder_path = os.path.dirname(obj_output_path)
-                    parent_folder = link_folders.get(folder_path)
+        for (obj, obj_output_path) in obj_output_paths:
+            if obj.endswith('.chrislink'):
+                try:
+                    path = self.storage_manager.download_obj(obj).decode().strip()
+                except Exception as e:
+                    logger.error(f'[CODE08,{job_id}]: Error while downloading file '
+                                 f'{obj} from storage, detail: {str(e)}')
+                    self.c_plugin_inst.error_code = 'CODE08'
+                    raise
 
-                    if parent_folder is None:
-                        (parent_folder, _) = ChrisFolder.objects.get_or_create(
-                            path=folder_path,
-                            owner=owner)
-                        link_folders[folder_path] = parent_folder
+                parent_folder = link_folders[os.path.dirname(obj_output_path)]
 
-                    try:
-                        ChrisLinkFile.objects.get(path=path, parent_folder=parent_folder)
-                    except ChrisLinkFile.DoesNotExist:
-                        self._create_chris_link_file(path, parent_folder)
-                else:
-                    try:
-                        if not self.storage_manager.obj_exists(obj_output_path):
-                            self.storage_manager.copy_obj(obj, obj_output_path)
-                    except Exception as e:
-                        logger.error(f'[CODE09,{job_id}]: Error while copying file '
-                                     f'from {obj} to {obj_output_path} in storage, '
-                                     f'detail: {str(e)}')
-                        self.c_plugin_inst.error_code = 'CODE09'
-                        raise
-                    self.plugin_inst_output_files.add(obj_output_path)
+                try:
+                    ChrisLinkFile.objects.get(path=path, parent_folder=parent_folder)
+                except ChrisLinkFile.DoesNotExist:
+                    self._create_chris_link_file(path, parent_folder)
+            else:
+                try:
+                    if not self.storage_manager.obj_exists(obj_output_path):
+                        self.storage_manager.copy_obj(obj, obj_output_path)
+                except Exception as e:
+                    logger.error(f'[CODE09,{job_id}]: Error while copying file '
+                                 f'from {obj} to {obj_output_path} in storage, '
+                                 f'detail: {str(e)}')
+                    self.c_plugin_inst.error_code = 'CODE09'
+                    raise
 
     def handle_finished_successfully_status(self):
         """
         Handle the 'finishedSuccessfully' status returned by the remote compute.
         """
+        if self.pfcon_client.requires_copy_job:
+            # the output data stays in the remote job directory until remote cleanup
+            DataLocalityTracker.record(self.c_plugin_inst,
+                                       [self.c_plugin_inst.get_output_path()])
+
         if self.pfcon_client.requires_upload_job:
             # only update (atomically) if status='started' to avoid concurrency problems
             self.c_plugin_inst.status = 'uploading'
             PluginInstance.objects.filter(
                 id=self.c_plugin_inst.id,
-                status='started').update(status='uploading', end_date=timezone.now())
+                status='started').update(
+                status='uploading', end_date=timezone.now(), next_check_date=None,
+                timeline=PluginInstance.merge_timeline_events('uploading'))
             
             # upload job will fetch files into CUBE storage; after that finishes
             # the register_output_files_on_success method is called once to register with the DB
@@ -767,28 +773,67 @@ class PluginInstanceAppJob(PluginInstanceJob):
             plg_inst_upload_job.run()
             return
         
-        plg_inst_lock = PluginInstanceLock(plugin_inst=self.c_plugin_inst)
-        try:
-            plg_inst_lock.save()
-        except IntegrityError:
+        lease_lock = PluginInstanceLeaseLock(self.c_plugin_inst)
+        if not lease_lock.acquire():
             # another async task has already entered the lock section of the code
             # only update (atomically) if status='started' to avoid concurrency problems
             PluginInstance.objects.filter(
                 id=self.c_plugin_inst.id,
-                status='started').update(status='registeringFiles', 
-                                         end_date=timezone.now())
+                status='started').update(
+                status='registeringFiles', end_date=timezone.now(),
+                timeline=PluginInstance.merge_timeline_events('registeringFiles'))
         else:
             # only one concurrent async task should execute this lock section of the code
-            self.c_plugin_inst.status = 'registeringFiles'
-            self.c_plugin_inst.end_date=timezone.now()
-            self.c_plugin_inst.save(update_fields=['status', 'end_date'])
-            self.register_output_files_on_success()
+            try:
+                self.c_plugin_inst.status = 'registeringFiles'
+                self.c_plugin_inst.end_date=timezone.now()
+                self.c_plugin_inst.save(update_fields=['status', 'end_date'])
+                self.register_output_files_on_success(lease_lock)
+            finally:
+                lease_lock.release()
+
+    def resume_output_files_registration(self):
+        """
+        Resume the registration of the output files of a plugin instance whose
+        registering worker crashed. The lock is taken over only if its lease expired and
+        then the registration is executed again, which is idempotent.
+        """
+        if self.c_plugin_inst.status != 'registeringFiles':
+            return
 
-    def register_output_files_on_success(self):
+        lease_lock = PluginInstanceLeaseLock(self.c_plugin_inst)
+        if not lease_lock.acquire(takeover=True):
+            return  # the lock is still held by a live worker
+
+        try:
+            job_id = self.str_job_id
+            pfcon_url = self.pfcon_client.url
+            logger.info(f'Resuming output files registration for job {job_id}, '
+                        f'sending job status request to pfcon url -->{pfcon_url}<--')
+            try:
+                d_resp = self._get_status(JobType.PLUGIN, job_id)
+            except PfconRequestException as e:
+                # return, the lease will expire and the resume be retried later
+                logger.error(f'[CODE02,{job_id}]: Error getting plugin job status at '
+                             f'pfcon url -->{pfcon_url}<-- while resuming files '
+                             f'registration, detail: {str(e)}')
+                return
+
+            status = d_resp['compute']['status']
+            if status == 'finishedSuccessfully':
+                self.register_output_files_on_success(lease_lock)
+            elif status == 'finishedWithError':
+                self.register_output_files_on_error(lease_lock)
+        finally:
+            lease_lock.release()
+
+    def register_output_files_on_success(self, lease_lock=None):
         """
         Fetch output file data/metadata from pfcon, verify/unpack files in storage,
         handle special path parameters and register all output files in the DB. Sets the
-        final plugin instance status and schedules remote cleanup.
+        final plugin instance status and schedules its dependent plugin instances and
+        remote cleanup. If the passed lease lock is lost to another worker then the
+        registration is aborted and left to that worker.
         """
         pfcon_url = self.pfcon_client.url
         job_id = self.str_job_id
@@ -837,13 +882,20 @@ class PluginInstanceAppJob(PluginInstanceJob):
                     d_ts_input_objs, tf = self.get_ts_plugin_instance_input_objs()
                     self._handle_ts_unextracted_input_objs(d_ts_input_objs, tf)
 
-                self._register_output_files()  # register output files in the DB
+                # all output files are in storage now
+                self.c_plugin_inst.add_timeline_events('outputStored')
+                self.prefetch_dependent_plugin_instances()
+
+                # register output files in the DB
+                self._register_output_files(lease_lock)
             except Exception:
                 self.c_plugin_inst.status = 'cancelled'  # giving up
             else:
                 self.c_plugin_inst.status = 'finishedSuccessfully'
 
-        self.c_plugin_inst.save(update_fields=['status', 'error_code'])
+        if not self._save_registration_status(lease_lock):
+            return
+        self.schedule_dependent_plugin_instances()
         self.schedule_remote_cleanup()
 
     def _get_job_json_data(self, job_id, job_output_path, timeout=500):
@@ -885,7 +937,9 @@ class PluginInstanceAppJob(PluginInstanceJob):
             self.c_plugin_inst.status = 'uploading'
             PluginInstance.objects.filter(
                 id=self.c_plugin_inst.id,
-                status='started').update(status='uploading', end_date=timezone.now())
+                status='started').update(
+                status='uploading', end_date=timezone.now(), next_check_date=None,
+                timeline=PluginInstance.merge_timeline_events('uploading'))
             
             # upload job will fetch files into CUBE storage; after that finishes
             # the register_output_files_on_erro method is called once to register with the DB
@@ -893,28 +947,32 @@ class PluginInstanceAppJob(PluginInstanceJob):
             plg_inst_upload_job.run()
             return
         
-        plg_inst_lock = PluginInstanceLock(plugin_inst=self.c_plugin_inst)
-        try:
-            plg_inst_lock.save()
-        except IntegrityError:
+        lease_lock = PluginInstanceLeaseLock(self.c_plugin_inst)
+        if not lease_lock.acquire():
             # another async task has already entered the lock section of the code
             # only update (atomically) if status='started' to avoid concurrency problems
             PluginInstance.objects.filter(
                 id=self.c_plugin_inst.id,
-                status='started').update(status='registeringFiles', 
-                                         end_date=timezone.now())
+                status='started').update(
+                status='registeringFiles', end_date=timezone.now(),
+                timeline=PluginInstance.merge_timeline_events('registeringFiles'))
         else:
             # only one concurrent async task should execute this lock section of the code
-            self.c_plugin_inst.status = 'registeringFiles'
-            self.c_plugin_inst.end_date=timezone.now()
-            self.c_plugin_inst.save(update_fields=['status', 'end_date'])
-            self.register_output_files_on_error()
-
-    def register_output_files_on_error(self):
+            try:
+                self.c_plugin_inst.status = 'registeringFiles'
+                self.c_plugin_inst.end_date=timezone.now()
+                self.c_plugin_inst.save(update_fields=['status', 'end_date'])
+                self.register_output_files_on_error(lease_lock)
+            finally:
+                lease_lock.release()
+
+    def register_output_files_on_error(self, lease_lock=None):
         """
         Fetch output file data/metadata from pfcon, verify/unpack files in storage and 
         register all output files in the DB. Sets the final plugin instance status 
-        and schedules remote cleanup.
+        and schedules its dependent plugin instances and remote cleanup. If the passed
+        lease lock is lost to another worker then the registration is aborted and left
+        to that worker.
         """
         pfcon_url = self.pfcon_client.url
         job_id = self.str_job_id
@@ -946,12 +1004,15 @@ class PluginInstanceAppJob(PluginInstanceJob):
                                 'storage', job_id)
                     self.unpack_zip_file(job_file_content)
 
-                self._register_output_files()  # register output files in the DB
+                # register output files in the DB
+                self._register_output_files(lease_lock)
             except Exception:
                 pass  # giving up
             
         self.c_plugin_inst.status = 'finishedWithError'
-        self.c_plugin_inst.save(update_fields=['status', 'error_code'])
+        if not self._save_registration_status(lease_lock):
+            return
+        self.schedule_dependent_plugin_instances()
         self.schedule_remote_cleanup()
 
     def handle_undefined_status(self):
@@ -963,10 +1024,14 @@ class PluginInstanceAppJob(PluginInstanceJob):
         self.c_plugin_inst.error_code = 'CODE10'
         self.cancel_exec()
 
-    def _register_output_files(self):
+    def _register_output_files(self, lease_lock=None):
         """
         Internal method to register output files generated for the plugin instance with
-        the DB. Handles special cases:
+        the DB. The files are streamed from the storage listing of the output dir in
+        pages of at most OUTPUT_FILES_BATCH_SIZE files so that memory use doesn't grow
+        with the number of files. If the passed lease lock is lost to another worker
+        then PluginInstanceLockLostException is raised before the next batch. Handles
+        special cases:
             - Files with names that only contain commas and white spaces are deleted.
             - Folders with names that only contain commas and white spaces are removed
             after moving their contents to the parent folder.
@@ -976,35 +1041,96 @@ class PluginInstanceAppJob(PluginInstanceJob):
 
         owner = self.c_plugin_inst.owner
         outputdir = self.c_plugin_inst.get_output_path()
-        files = []
-        folders = {}
 
         # remove commas from the existing files/folders names and handle the special cases
-        changed_file_paths = self.storage_manager.sanitize_obj_names(outputdir)
-
-        for obj_path in self.plugin_inst_output_files:
-            if obj_path in changed_file_paths:
-                obj_path = changed_file_paths[obj_path]
-
-            if obj_path:
-                logger.info(f'Registering file -->{obj_path}<-- for job {job_id}')
-
-                folder_path = os.path.dirname(obj_path)
-                parent_folder = folders.get(folder_path)
-
-                if parent_folder is None:
-                    (parent_folder, _) = ChrisFolder.objects.get_or_create(
-                        path=folder_path, owner=owner)
-                    folders[folder_path] = parent_folder
-
-                plg_inst_file = UserFile(owner=owner, parent_folder=parent_folder)
-                plg_inst_file.fname.name = obj_path
-                files.append(plg_inst_file)
+        self.storage_manager.sanitize_obj_names(outputdir)
 
-        self.plugin_inst_output_files = {f.fname.name for f in files}
-        db_files = UserFile.objects.bulk_create(files)
+        # files may have been registered by a previous holder of a taken over lock
+        resuming = lease_lock is not None and lease_lock.taken_over
 
+        nfiles = 0
+        folders = {}
         total_size = 0
-        for plg_inst_file in db_files:
-            total_size += plg_inst_file.fname.size
+
+        for batch in self.storage_manager.ls_pages(outputdir + '/',
+                                                   self.OUTPUT_FILES_BATCH_SIZE):
+            if lease_lock is not None:
+                lease_lock.check()
+
+            # link files in the output dir are already registered as ChRIS link files
+            link_paths = set(ChrisLinkFile.objects.filter(fname__in=batch).values_list(
+                'fname', flat=True))
+            batch = [obj_path for obj_path in batch if obj_path not in link_paths]
+            if not batch:
+                continue
+            nfiles += len(batch)
+
+            if resuming:
+                # files registered by the previous lock holder are skipped
+                registered_paths = set(UserFile.objects.filter(
+                    fname__in=batch).values_list('fname', flat=True))
+                batch = [obj_path for obj_path in batch
+                         if obj_path not in registered_paths]
+
+            with transaction.atomic():
+                # only create the folders that haven't been seen in a previous batch
+                new_folder_paths = {os.path.dirname(obj_path) for obj_path in
+                                    batch}.difference(folders)
+                if new_folder_paths:
+                    folders.update(ChrisFolder.ensure_tree(new_folder_paths, owner))
+
+                files = []
+                for obj_path in batch:
+                    parent_folder = folders[os.path.dirname(obj_path)]
+                    plg_inst_file = UserFile(owner=owner, parent_folder=parent_folder)
+                    plg_inst_file.fname.name = obj_path
+                    files.append(plg_inst_file)
+
+                if files:
+                    # conflicts are only expected with a lock holder that hasn't yet
+                    # noticed it lost the lock, otherwise integrity errors are raised
+                    UserFile.objects.bulk_create(files, ignore_conflicts=resuming)
+
+                for plg_inst_file in files:
+                    total_size += plg_inst_file.fname.size
+
+                self._update_registration_summary(nfiles, False)
+
+            logger.info(f'Registered {nfiles} output files for job {job_id}')
+
+        self._update_registration_summary(nfiles, True)
         self.c_plugin_inst.size += total_size
+
+    def _save_registration_status(self, lease_lock=None):
+        """
+        Internal method to save the final status of the plugin instance after the
+        registration of its output files. If a lease lock is passed then the status is
+        only saved (atomically) while the lock is still held by it. Returns False if
+        the lock has been lost to another worker.
+        """
+        if lease_lock is None:
+            self.c_plugin_inst.save(update_fields=['status', 'error_code'])
+            return True
+
+        status = self.c_plugin_inst.status
+        n = PluginInstance.objects.filter(
+            id=self.c_plugin_inst.id,
+            lock__holder=lease_lock.holder).update(
+            status=status, error_code=self.c_plugin_inst.error_code,
+            timeline=PluginInstance.merge_timeline_events(status))
+        if not n:
+            logger.warning(f'Lost lock of plugin instance with id '
+                           f'{self.c_plugin_inst.id} before saving its status '
+                           f'{status}, leaving it to the new lock holder')
+            return False
+        return True
+
+    def _update_registration_summary(self, nfiles, status):
+        """
+        Internal method to atomically save the output files registration progress
+        in the plugin instance's summary.
+        """
+        self.c_plugin_inst.summary['registration'] = {'status': status,
+                                                      'nfiles': nfiles}
+        PluginInstance.objects.filter(id=self.c_plugin_inst.id).update(
+            summary=self.c_plugin_inst.summary)
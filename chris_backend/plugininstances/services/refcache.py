@@ -0,0 +1,106 @@
+"""
+Reference data cache module that provides a process-level cache for the rarely changing
+singletons and reference data needed by every job construction and status check: the
+ChRIS instance, compute resources, plugins (with their meta) and plugin parameter
+definitions. Entries are invalidated by model signals in the process that changed them
+and expire after REFERENCE_DATA_CACHE_TIMEOUT seconds so changes made by other
+processes are eventually seen too.
+"""
+
+import time
+from typing import Hashable, List
+
+from django.conf import settings
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from core.models import ChrisInstance
+from plugins.models import ComputeResource, Plugin, PluginMeta, PluginParameter
+
+
+_local_entries = {}  # process-level cache {key: (value, expiration)}
+
+
+def get_chris_instance() -> ChrisInstance:
+    """
+    Get the ChRIS instance singleton.
+    """
+    return _get(('chris_instance',), ChrisInstance.load)
+
+
+def get_compute_resource(compute_resource_id: int) -> ComputeResource:
+    """
+    Get a compute resource given its id.
+    """
+    return _get(('compute_resource', compute_resource_id),
+                lambda: ComputeResource.objects.get(id=compute_resource_id))
+
+
+def get_plugin(plugin_id: int) -> Plugin:
+    """
+    Get a plugin together with its meta given its id.
+    """
+    return _get(('plugin', plugin_id),
+                lambda: Plugin.objects.select_related('meta').get(id=plugin_id))
+
+
+def get_plugin_parameters(plugin_id: int) -> List[PluginParameter]:
+    """
+    Get the list of parameter definitions of a plugin given its id.
+    """
+    return _get(('plugin_parameters', plugin_id),
+                lambda: list(PluginParameter.objects.filter(plugin_id=plugin_id)))
+
+
+def clear():
+    """
+    Remove all the entries from the cache.
+    """
+    _local_entries.clear()
+
+
+def _get(key: Hashable, loader):
+    """
+    Internal function to get a value from the cache or load it and cache it if it's
+    missing or expired.
+    """
+    entry = _local_entries.get(key)
+    if entry and entry[1] > time.monotonic():
+        return entry[0]
+    value = loader()
+    _local_entries[key] = (value, time.monotonic() + settings.REFERENCE_DATA_CACHE_TIMEOUT)
+    return value
+
+
+def _invalidate(key: Hashable):
+    """
+    Internal function to remove an entry from the cache.
+    """
+    _local_entries.pop(key, None)
+
+
+@receiver([post_save, post_delete], sender=ChrisInstance)
+def invalidate_chris_instance(sender, instance, **kwargs):
+    _invalidate(('chris_instance',))
+
+
+@receiver([post_save, post_delete], sender=ComputeResource)
+def invalidate_compute_resource(sender, instance, **kwargs):
+    _invalidate(('compute_resource', instance.id))
+
+
+@receiver([post_save, post_delete], sender=Plugin)
+def invalidate_plugin(sender, instance, **kwargs):
+    _invalidate(('plugin', instance.id))
+    _invalidate(('plugin_parameters', instance.id))
+
+
+@receiver([post_save, post_delete], sender=PluginMeta)
+def invalidate_plugin_meta(sender, instance, **kwargs):
+    for key in [key for key in _local_entries if key[0] == 'plugin']:
+        _invalidate(key)
+
+
+@receiver([post_save, post_delete], sender=PluginParameter)
+def invalidate_plugin_parameters(sender, instance, **kwargs):
+    _invalidate(('plugin_parameters', instance.plugin_id))
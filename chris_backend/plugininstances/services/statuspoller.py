@@ -0,0 +1,229 @@
+"""
+Compute resource status poller module that provides the interface for fetching the
+execution status of all the active jobs running in a remote compute environment in a
+single sweep (ChRIS / pfcon interface).
+"""
+
+import logging
+import asyncio
+from datetime import timedelta
+from typing import Dict, List, Tuple
+
+from asgiref.sync import sync_to_async
+from pfconclient.client import JobType
+from pfconclient.exceptions import (PfconRequestException,
+                                    PfconRequestInvalidTokenException)
+
+from django.db.models import Avg, F
+from django.utils import timezone
+
+from plugininstances.models import PluginInstance
+from .abstractjobs import PluginInstanceJob
+from .asyncpfcon import AsyncPfconClient
+from .authtokens import (get_compute_resource_auth_token,
+                         refresh_compute_resource_auth_token)
+from .refcache import get_chris_instance
+
+
+logger = logging.getLogger(__name__)
+
+
+# map each active plugin instance status to the type and class of its remote job
+ACTIVE_JOBS = {
+    'copying': (JobType.COPY, 'PluginInstanceCopyJob'),
+    'started': (JobType.PLUGIN, 'PluginInstanceAppJob'),
+    'uploading': (JobType.UPLOAD, 'PluginInstanceUploadJob'),
+}
+
+
+class ComputeResourceStatusPoller(object):
+    """
+    ``ComputeResourceStatusPoller`` fetches the remote job status of all the active
+    plugin instances running on a compute resource with an asynchronous pfcon client
+    that multiplexes at most MAX_CONCURRENT_REQUESTS requests over a keep-alive
+    connection pool. Only the plugin instances whose remote job has reached a state
+    that requires handling are returned to the caller.
+
+    The other plugin instances get a next check date that backs off with the elapsed
+    time of their current job and, for plugin jobs, with the average runtime of the
+    plugin's recently finished jobs.
+    """
+    MAX_CONCURRENT_REQUESTS = 20
+    MIN_CHECK_INTERVAL = 5  # seconds
+    MAX_CHECK_INTERVAL = 300  # seconds
+    CHECK_INTERVAL_FACTOR = 0.1  # fraction of the elapsed job time
+    RUNTIME_STATS_DAYS = 30  # age of the finished jobs used for runtime statistics
+
+    def __init__(self, compute_resource):
+        self.compute_resource = compute_resource
+        self.str_job_id_prefix = get_chris_instance().job_id_prefix
+
+    def poll(self, plugin_instances) -> List[Tuple[PluginInstance, str]]:
+        """
+        Fetch the remote job status of the passed active plugin instances and return a
+        list of (plugin instance, job class name) tuples for the plugin instances whose
+        status must be handled by their job's check_exec_status method (finished,
+        undefined or timed out jobs). The job status summary of the other plugin
+        instances is updated in the DB if it has changed.
+        """
+        to_handle = []
+        to_fetch = []
+
+        for plg_inst in plugin_instances:
+            job_type, job_class_name = ACTIVE_JOBS[plg_inst.status]
+
+            if self._job_has_timeout(plg_inst):
+                to_handle.append((plg_inst, job_class_name))
+            else:
+                to_fetch.append((plg_inst, job_type, job_class_name))
+
+        if not to_fetch:
+            return to_handle
+
+        auth_token = get_compute_resource_auth_token(self.compute_resource)
+        responses = asyncio.run(self._fetch_statuses(
+            [(plg_inst, job_type) for plg_inst, job_type, _ in to_fetch], auth_token))
+
+        to_reschedule = []
+
+        for (plg_inst, _, job_class_name), d_resp in zip(to_fetch, responses):
+            if d_resp is None:
+                continue  # periodic task will retry later
+
+            status = d_resp['compute']['status']
+
+            if status in ('finishedSuccessfully', 'finishedWithError', 'undefined'):
+                to_handle.append((plg_inst, job_class_name))
+            else:
+                self._update_job_status_summary(plg_inst, d_resp)
+                to_reschedule.append(plg_inst)
+
+        self._schedule_next_checks(to_reschedule)
+        return to_handle
+
+    def _schedule_next_checks(self, plugin_instances):
+        """
+        Internal method to set the next check date of the passed still running plugin
+        instances in the DB.
+        """
+        if not plugin_instances:
+            return
+
+        now = timezone.now()
+        expected_runtimes = self._get_expected_runtimes(
+            {plg_inst.plugin_id for plg_inst in plugin_instances
+             if plg_inst.status == 'started'})
+
+        for plg_inst in plugin_instances:
+            interval = self._get_next_check_interval(
+                plg_inst, now, expected_runtimes.get(plg_inst.plugin_id))
+            plg_inst.next_check_date = now + timedelta(seconds=interval)
+        PluginInstance.objects.bulk_update(plugin_instances, ['next_check_date'])
+
+    def _get_next_check_interval(self, plg_inst, now,
+                                 expected_runtime: float | None = None) -> float:
+        """
+        Internal method to get the number of seconds until the next status check of a
+        running plugin instance's job. Checks are frequent just after the job starts
+        and slow down as it runs for longer. If the job is expected to run for longer
+        then it's checked again halfway to its expected end. A job is never checked
+        later than its timeout.
+        """
+        # uploading jobs start when the plugin job ends
+        job_start = (plg_inst.end_date if plg_inst.status == 'uploading'
+                     else plg_inst.start_date)
+        elapsed = (now - job_start).total_seconds()
+        interval = elapsed * self.CHECK_INTERVAL_FACTOR
+
+        if expected_runtime is not None and elapsed < expected_runtime:
+            interval = max(interval, (expected_runtime - elapsed) / 2)
+
+        interval = min(max(interval, self.MIN_CHECK_INTERVAL), self.MAX_CHECK_INTERVAL)
+
+        max_job_exec_sec = self.compute_resource.max_job_exec_seconds
+        if max_job_exec_sec >= 0:
+            start_elapsed = (now - plg_inst.start_date).total_seconds()
+            interval = min(interval, max(max_job_exec_sec - start_elapsed, 0) + 1)
+        return interval
+
+    def _get_expected_runtimes(self, plugin_ids) -> Dict[int, float]:
+        """
+        Internal method to get the average runtime in seconds of the recently finished
+        jobs of the passed plugins.
+        """
+        if not plugin_ids:
+            return {}
+
+        cutoff = timezone.now() - timedelta(days=self.RUNTIME_STATS_DAYS)
+        stats = PluginInstance.objects.filter(
+            plugin_id__in=plugin_ids, status='finishedSuccessfully',
+            end_date__gt=cutoff).values('plugin_id').annotate(
+            runtime=Avg(F('end_date') - F('start_date'))).order_by()
+        return {d['plugin_id']: d['runtime'].total_seconds() for d in stats
+                if d['runtime'] is not None}
+
+    async def _fetch_statuses(self, jobs, auth_token: str) -> List[dict | None]:
+        """
+        Internal coroutine to concurrently get the status of the passed list of
+        (plugin instance, job type) tuples from the remote pfcon service.
+        """
+        cr = self.compute_resource
+        async with AsyncPfconClient(cr.compute_url, auth_token,
+                                    self.MAX_CONCURRENT_REQUESTS) as pfcon_client:
+            responses = await asyncio.gather(
+                *[self._fetch_status(pfcon_client, plg_inst, job_type)
+                  for plg_inst, job_type in jobs])
+        return responses
+
+    async def _fetch_status(self, pfcon_client, plg_inst,
+                            job_type: JobType) -> dict | None:
+        """
+        Internal coroutine to get a job status from the remote pfcon service. Returns
+        None if the request fails.
+        """
+        job_id = self.str_job_id_prefix + str(plg_inst.id)
+        try:
+            auth_token = pfcon_client.auth_token
+            try:
+                d_resp = await pfcon_client.get_job_status(job_type, job_id)
+            except PfconRequestInvalidTokenException:
+                logger.info(f'Auth token has expired while getting status for '
+                            f'{job_type} job {job_id} from pfcon url '
+                            f'-->{pfcon_client.url}<--')
+                await pfcon_client.refresh_auth_token(self._refresh_auth_token,
+                                                      auth_token)
+                d_resp = await pfcon_client.get_job_status(job_type, job_id)
+        except PfconRequestException as e:
+            logger.error(f'[CODE02,{job_id}]: Error getting {job_type} job status at '
+                         f'pfcon url -->{pfcon_client.url}<--, detail: {str(e)}')
+            return None
+        return d_resp
+
+    async def _refresh_auth_token(self, expired_token: str) -> str:
+        """
+        Internal coroutine to get a new auth token for the compute resource through
+        the cluster-wide single-flight refresh shared with the synchronous jobs.
+        """
+        return await sync_to_async(refresh_compute_resource_auth_token)(
+            self.compute_resource, expired_token)
+
+    def _job_has_timeout(self, plg_inst) -> bool:
+        """
+        Internal method to check if a plugin instance's job has timed out.
+        """
+        max_job_exec_sec = self.compute_resource.max_job_exec_seconds
+
+        if max_job_exec_sec >= 0:
+            delta_exec_time = timezone.now() - plg_inst.start_date
+            return delta_exec_time.total_seconds() > max_job_exec_sec
+        return False
+
+    @staticmethod
+    def _update_job_status_summary(plg_inst, d_resp):
+        """
+        Internal method to atomically update a running plugin instance's job status
+        summary in the DB when it has changed.
+        """
+        # only update (atomically) if status hasn't changed in the meantime
+        PluginInstanceJob.save_job_status_summary(plg_inst, d_resp,
+                                                  status=plg_inst.status)
@@ -0,0 +1,138 @@
+"""
+Job timing module that provides the interface for aggregating the durations of the
+phases of the plugin instances' jobs (queueing, data transfer, execution, output files
+registration, etc) from the status transitions and job phase boundaries recorded in
+their timelines.
+"""
+
+from datetime import timedelta
+from typing import Optional, Tuple
+
+from django.db import connection
+from django.utils import timezone
+
+from plugins.models import Plugin, PluginMeta, ComputeResource
+from plugininstances.models import PluginInstance
+
+
+# (phase name, events starting the phase, events ending the phase), for both the start
+# and the end the first event recorded in the timeline is used
+PHASES = (
+    ('queued', ('created', 'waiting'), ('copying', 'scheduled')),
+    ('copy', ('copying',), ('copied',)),
+    ('submission', ('scheduled',), ('started',)),
+    ('execution', ('started',), ('uploading', 'registeringFiles')),
+    ('upload', ('uploading',), ('registeringFiles',)),
+    ('registration', ('registeringFiles',), ('finishedSuccessfully',
+                                             'finishedWithError')),
+    ('total', ('created', 'waiting'), ('finishedSuccessfully', 'finishedWithError')),
+)
+
+# GROUPING() values of the grouping sets of the percentiles query
+GROUPS = {0: 'plugin_compute_resource', 1: 'plugin', 6: 'compute_resource', 7: 'all'}
+
+
+class PluginInstanceTimingReport(object):
+    """
+    ``PluginInstanceTimingReport`` computes the percentiles of the duration in seconds
+    of each job phase over the plugin instances that have finished (with or without
+    error) in the last days. Percentiles are aggregated per plugin and compute
+    resource, per plugin, per compute resource and over all plugin instances.
+    """
+
+    PERCENTILES = (50, 90, 99)
+
+    def __init__(self, days: int = 7, plugin_name: Optional[str] = None,
+                 compute_resource_name: Optional[str] = None):
+        self.days = days
+        self.plugin_name = plugin_name
+        self.compute_resource_name = compute_resource_name
+
+    def get_percentiles(self) -> dict:
+        """
+        Get the job phase duration percentiles with a single DB query.
+        """
+        sql, params = self._get_percentiles_sql()
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            columns = [col[0] for col in cursor.description]
+            rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+        d_groups = {group: [] for group in GROUPS.values()}
+        for row in rows:
+            entry = {'count': row['count'], 'phases': self._get_phases(row)}
+            group = GROUPS[row['grouping_id']]
+            if group in ('plugin_compute_resource', 'plugin'):
+                entry['plugin_name'] = row['plugin_name']
+                entry['plugin_version'] = row['plugin_version']
+            if group in ('plugin_compute_resource', 'compute_resource'):
+                entry['compute_resource_name'] = row['compute_resource_name']
+            d_groups[group].append(entry)
+
+        return {'days': self.days, 'percentiles': list(self.PERCENTILES),
+                'phases': [phase[0] for phase in PHASES], **d_groups}
+
+    def _get_phases(self, row: dict) -> dict:
+        """
+        Internal method to get the count and the duration percentiles of each phase
+        from a row of the percentiles query.
+        """
+        d_phases = {}
+        for phase, _, _ in PHASES:
+            values = row[f'{phase}_percentiles'] or [None] * len(self.PERCENTILES)
+            d_phase = {'count': row[f'{phase}_count']}
+            for percentile, value in zip(self.PERCENTILES, values):
+                d_phase[f'p{percentile}'] = None if value is None else round(value, 3)
+            d_phases[phase] = d_phase
+        return d_phases
+
+    def _get_percentiles_sql(self) -> Tuple[str, list]:
+        """
+        Internal method to get the percentiles SQL query and its parameters.
+        """
+        fractions = [percentile / 100 for percentile in self.PERCENTILES]
+        params = []
+        phase_columns = []
+        for phase, start_events, end_events in PHASES:
+            duration = (f'EXTRACT(EPOCH FROM {self._get_date_sql(end_events)} - '
+                        f'{self._get_date_sql(start_events)})')
+            phase_columns.append(f'COUNT({duration}) AS {phase}_count')
+            phase_columns.append(f'percentile_cont(%s::float8[]) WITHIN GROUP '
+                                 f'(ORDER BY {duration}) AS {phase}_percentiles')
+            params.append(fractions)
+
+        where = ['pi.status IN (%s, %s)', 'pi.end_date >= %s']
+        params.extend(['finishedSuccessfully', 'finishedWithError',
+                       timezone.now() - timedelta(days=self.days)])
+        if self.plugin_name:
+            where.append('pm.name = %s')
+            params.append(self.plugin_name)
+        if self.compute_resource_name:
+            where.append('cr.name = %s')
+            params.append(self.compute_resource_name)
+
+        sql = f"""
+            SELECT GROUPING(pm.name, p.version, cr.name) AS grouping_id,
+                   pm.name AS plugin_name, p.version AS plugin_version,
+                   cr.name AS compute_resource_name, COUNT(*) AS count,
+                   {', '.join(phase_columns)}
+            FROM {PluginInstance._meta.db_table} pi
+            JOIN {Plugin._meta.db_table} p ON p.id = pi.plugin_id
+            JOIN {PluginMeta._meta.db_table} pm ON pm.id = p.meta_id
+            LEFT JOIN {ComputeResource._meta.db_table} cr
+            ON cr.id = pi.compute_resource_id
+            WHERE {' AND '.join(where)}
+            GROUP BY GROUPING SETS ((pm.name, p.version, cr.name), (pm.name, p.version),
+                                    (cr.name), ())
+            ORDER BY grouping_id, pm.name, p.version, cr.name
+        """
+        return sql, params
+
+    @staticmethod
+    def _get_date_sql(events) -> str:
+        """
+        Internal method to get the SQL expression for the date of the first of the
+        passed events recorded in a plugin instance's timeline.
+        """
+        dates = [f"(pi.timeline->>'{event}')::timestamptz" for event in events]
+        return f"COALESCE({', '.join(dates)})"
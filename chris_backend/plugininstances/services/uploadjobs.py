@@ -11,11 +11,11 @@ from pfconclient.client import JobType
 from pfconclient.exceptions import PfconRequestException
 
 from django.utils import timezone
-from django.db.utils import IntegrityError
 
 from core.utils import json_zip2str
-from plugininstances.models import PluginInstance, PluginInstanceLock
+from plugininstances.models import PluginInstance
 from .abstractjobs import PluginInstanceJob
+from .instancelock import PluginInstanceLeaseLock
 
 
 logger = logging.getLogger(__name__)
@@ -59,6 +59,7 @@ class PluginInstanceUploadJob(PluginInstanceJob):
                 self.c_plugin_inst.error_code = 'CODE01'
                 self.c_plugin_inst.status = 'cancelled'  # giving up 
                 self.c_plugin_inst.save(update_fields=['status', 'error_code'])
+                self.schedule_dependent_plugin_instances()
                 self.schedule_remote_cleanup()
             else:
                 self.c_plugin_inst.save(update_fields=['upload_retry_count'])
@@ -70,7 +71,7 @@ class PluginInstanceUploadJob(PluginInstanceJob):
             # update the job status and summary
             self.c_plugin_inst.summary = self.get_job_status_summary(d_resp)
             self.c_plugin_inst.raw = json_zip2str(d_resp)
-            self.c_plugin_inst.save()
+            self.c_plugin_inst.save(update_fields=['summary', 'raw'])
 
     def check_exec_status(self):
         """
@@ -107,15 +108,9 @@ class PluginInstanceUploadJob(PluginInstanceJob):
             logger.info(f'Current upload job {job_id} plugin instance DB status = '
                         f'{self.c_plugin_inst.status}')
 
-            summary = self.get_job_status_summary(d_resp)
-            self.c_plugin_inst.summary = summary
-            raw = json_zip2str(d_resp)
-            self.c_plugin_inst.raw = raw
-
             # only update (atomically) if still in upload phase to avoid concurrency problems
-            PluginInstance.objects.filter(
-                id=self.c_plugin_inst.id,
-                status=self.c_plugin_inst.status).update(summary=summary, raw=raw)
+            self.save_job_status_summary(self.c_plugin_inst, d_resp,
+                                         status=self.c_plugin_inst.status)
 
             if status == 'finishedSuccessfully':
                 self.handle_finished_successfully_status()
@@ -132,6 +127,7 @@ class PluginInstanceUploadJob(PluginInstanceJob):
         """
         self.c_plugin_inst.status = 'cancelled'
         self.c_plugin_inst.save(update_fields=['status'])
+        self.schedule_dependent_plugin_instances()
         self.schedule_remote_cleanup()
 
     def delete(self):
@@ -162,50 +158,61 @@ class PluginInstanceUploadJob(PluginInstanceJob):
         files in storage and register them with the DB. The files registration
         must execute only once.
         """
-        plg_inst_lock = PluginInstanceLock(plugin_inst=self.c_plugin_inst)
-        try:
-            plg_inst_lock.save()
-        except IntegrityError:
+        lease_lock = PluginInstanceLeaseLock(self.c_plugin_inst)
+        if not lease_lock.acquire():
             # another async task has already entered the lock section of the code
             # only update (atomically) if status='started' to avoid concurrency problems
             PluginInstance.objects.filter(
                 id=self.c_plugin_inst.id,
-                status='uploading').update(status='registeringFiles', 
-                                         end_date=timezone.now())
+                status='uploading').update(
+                status='registeringFiles', end_date=timezone.now(),
+                timeline=PluginInstance.merge_timeline_events('registeringFiles'))
         else:
             # only one concurrent async task should execute this lock section of the code
-            self.c_plugin_inst.status = 'registeringFiles'
-            self.c_plugin_inst.save(update_fields=['status'])
+            try:
+                self._delegate_output_files_registration(lease_lock)
+            finally:
+                lease_lock.release()
 
-            job_id = self.str_job_id
-            logger.info(f'Successfully finished plugin instance upload job {job_id}')
+    def _delegate_output_files_registration(self, lease_lock):
+        """
+        Internal method to fetch the plugin job status from pfcon and delegate the
+        registration of the output files (guarded by the passed lease lock) to
+        PluginInstanceAppJob accordingly.
+        """
+        self.c_plugin_inst.status = 'registeringFiles'
+        self.c_plugin_inst.save(update_fields=['status'])
 
-            pfcon_url = self.pfcon_client.url
-            logger.info(f'Sending job status request to pfcon url -->{pfcon_url}<-- for '
-                        f'plugin job {job_id}')
-            try:
-                d_resp = self._get_status(JobType.PLUGIN, job_id)
-            except PfconRequestException as e:
-                logger.error(f'[CODE02,{job_id}]: Error getting plugin job status at '
-                             f'pfcon url -->{pfcon_url}<-- while registering files, '
-                             f'detail: {str(e)}')
-                
-                self.c_plugin_inst.status = 'cancelled'
-                self.c_plugin_inst.error_code = 'CODE02'
-                self.c_plugin_inst.save(update_fields=['status', 'error_code'])
-                self.schedule_remote_cleanup()
-            else:
-                logger.info(f'Successful job status response from pfcon url '
-                            f'-->{pfcon_url}<-- for plugin job {job_id}: '
-                            f'{json.dumps(d_resp, indent=4)} while registering files')
-                
-                from .pluginjobs import PluginInstanceAppJob
-                app_job = PluginInstanceAppJob(self.c_plugin_inst)  
-                
-                if d_resp['compute']['status'] == 'finishedSuccessfully':
-                    app_job.register_output_files_on_success()
-                elif d_resp['compute']['status'] == 'finishedWithError':
-                    app_job.register_output_files_on_error()
+        job_id = self.str_job_id
+        logger.info(f'Successfully finished plugin instance upload job {job_id}')
+
+        pfcon_url = self.pfcon_client.url
+        logger.info(f'Sending job status request to pfcon url -->{pfcon_url}<-- for '
+                    f'plugin job {job_id}')
+        try:
+            d_resp = self._get_status(JobType.PLUGIN, job_id)
+        except PfconRequestException as e:
+            logger.error(f'[CODE02,{job_id}]: Error getting plugin job status at '
+                         f'pfcon url -->{pfcon_url}<-- while registering files, '
+                         f'detail: {str(e)}')
+
+            self.c_plugin_inst.status = 'cancelled'
+            self.c_plugin_inst.error_code = 'CODE02'
+            self.c_plugin_inst.save(update_fields=['status', 'error_code'])
+            self.schedule_dependent_plugin_instances()
+            self.schedule_remote_cleanup()
+        else:
+            logger.info(f'Successful job status response from pfcon url '
+                        f'-->{pfcon_url}<-- for plugin job {job_id}: '
+                        f'{json.dumps(d_resp, indent=4)} while registering files')
+
+            from .pluginjobs import PluginInstanceAppJob
+            app_job = PluginInstanceAppJob(self.c_plugin_inst)  
+
+            if d_resp['compute']['status'] == 'finishedSuccessfully':
+                app_job.register_output_files_on_success(lease_lock)
+            elif d_resp['compute']['status'] == 'finishedWithError':
+                app_job.register_output_files_on_error(lease_lock)
 
     def handle_finished_with_error_status(self):
         """
@@ -219,6 +226,7 @@ class PluginInstanceUploadJob(PluginInstanceJob):
         self.c_plugin_inst.status = 'cancelled'
         self.c_plugin_inst.error_code = 'CODE18'
         self.c_plugin_inst.save(update_fields=['status', 'error_code'])
+        self.schedule_dependent_plugin_instances()
         self.schedule_remote_cleanup()
 
     def handle_undefined_status(self):
@@ -237,6 +245,7 @@ class PluginInstanceUploadJob(PluginInstanceJob):
             self.c_plugin_inst.status = 'cancelled'
             self.c_plugin_inst.error_code = 'CODE18'
             self.c_plugin_inst.save(update_fields=['status', 'error_code'])
+            self.schedule_dependent_plugin_instances()
             self.schedule_remote_cleanup()
         else:
             self.c_plugin_inst.save(update_fields=['upload_retry_count'])
@@ -1,20 +1,28 @@
 
+import json
 import logging
-from functools import wraps
 from datetime import timedelta
 
-from django.db.models import Q
+from django.db import connection, transaction
+from django.db.models import Q, Exists, OuterRef
 from django.utils import timezone
 from django.conf import settings
 
 from celery import shared_task
-from celery.signals import task_failure
+from celery.signals import task_failure, task_postrun
 
+from core.leaselock import LeaseLock, skip_if_locked
+from core.taskqueue import enqueue_once, clear_enqueue_once
+from plugins.models import ComputeResource
 from .models import PluginInstance, INACTIVE_STATUSES
 from .services.pluginjobs import PluginInstanceAppJob
 from .services.copyjobs import PluginInstanceCopyJob
 from .services.uploadjobs import PluginInstanceUploadJob
 from .services.deletejobs import PluginInstanceDeleteJob
+from .services.statuspoller import ComputeResourceStatusPoller
+from .services.containercleaner import ComputeResourceContainerCleaner
+from .services.admission import (PluginInstanceAdmissionController,
+                                 ADMISSION_LOCK_NAME)
 
 
 logger = logging.getLogger(__name__)
@@ -28,31 +36,6 @@ JOB_CLASSES = {
 }
 
 
-def skip_if_running(f):
-    """
-    This decorator is supposed to ensure that a task is only running once across all
-    workers.
-    https://stackoverflow.com/questions/20894771/celery-beat-limit-to-single-task-instance-at-a-time
-    """
-    task_name = f'{f.__module__}.{f.__name__}'
-    @wraps(f)
-    def wrapped(self, *args, **kwargs):
-        workers = self.app.control.inspect().active()
-        if workers is None:
-            logger.info('could not find worker for task %s (%s, %s), skipping',
-                        task_name, args, kwargs)
-            return None
-        for worker, tasks in workers.items():
-            for task in tasks:
-                if (task_name == task['name'] and tuple(args) == tuple(task['args']) and
-                        kwargs == task['kwargs'] and self.request.id != task['id']):
-                    logger.info('task %s (%s, %s) is running on %s, skipping',
-                                task_name, args, kwargs, worker)
-                    return None
-        return f(self, *args, **kwargs)
-    return wrapped
-
-
 @shared_task(bind=True, autoretry_for=(Exception,), retry_kwargs={"max_retries": 3})
 def delete_plugin_instance(self, plugin_inst_id):
     try:
@@ -103,6 +86,41 @@ def check_plugin_instance_job_exec_status(plg_inst_id, job_class_name):
         plg_inst_job.check_exec_status()
 
 
+@shared_task
+def resume_plugin_instance_files_registration(plg_inst_id):
+    """
+    Take over the expired output files registration lock of this plugin instance and
+    resume the registration.
+    """
+    try:
+        plugin_inst = PluginInstance.objects.get(pk=plg_inst_id)
+    except PluginInstance.DoesNotExist:
+        logger.error(f"Plugin instance with id {plg_inst_id} not found when running "
+                     f"resume_plugin_instance_files_registration task.")
+    else:
+        plg_inst_job = PluginInstanceAppJob(plugin_inst)
+        plg_inst_job.resume_output_files_registration()
+
+
+@shared_task
+def handle_plugin_instance_job_status_callback(plg_inst_id):
+    """
+    Check the execution status of the currently running job for this plugin instance
+    after the remote compute has notified a job status change.
+    """
+    try:
+        plugin_inst = PluginInstance.objects.get(pk=plg_inst_id)
+    except PluginInstance.DoesNotExist:
+        logger.error(f"Plugin instance with id {plg_inst_id} not found when running "
+                     f"handle_plugin_instance_job_status_callback task.")
+    else:
+        if plugin_inst.status in ('copying', 'started', 'uploading'):
+            job_class_name = _detect_job_class_name(plugin_inst)
+            job_class = JOB_CLASSES[job_class_name]
+            plg_inst_job = job_class(plugin_inst)
+            plg_inst_job.check_exec_status()
+
+
 @shared_task
 def cancel_plugin_instance_job(plg_inst_id, job_class_name=None):
     """
@@ -163,56 +181,231 @@ def delete_plugin_instance_containers_from_remote(plg_inst_id):
                                      'remote_cleanup_retry_count'])
 
 
-@shared_task(bind=True)
-@skip_if_running
-def schedule_waiting_plugin_instances(self):  # task is passed info about itself
+@shared_task
+@skip_if_locked(lease_seconds=60)
+def schedule_waiting_plugin_instances():
     """
     Schedule the jobs corresponding to all plugin instances in 'waiting' DB status
     and whose previous plugin instance is in 'finishedSuccessfully' DB status.
-    However, if the plugin instance is of type 'ts' all the ancestor plugin instances
-    with id in the list given by the plugininstances parameter must also be in
-    'finishedSuccessfully' DB status.
+    However, if the plugin instance is of type 'ts' all its parent plugin instances
+    must also be in 'finishedSuccessfully' DB status. Jobs are only scheduled when
+    admitted by the fair share admission controller.
     """
-    all_instances = PluginInstance.objects.filter(status='waiting',
-                                                  previous__status='finishedSuccessfully')
-    ts_instances = all_instances.filter(plugin__meta__type='ts')
+    schedule_plugin_instances(_get_ready_waiting_plugin_instances())
 
-    for plg_inst in ts_instances:
-        param = plg_inst.string_param.filter(plugin_param__name='plugininstances').first()
 
-        if param and param.value:
-            parent_ids = [int(parent_id) for parent_id in param.value.split(',')]
-            parents = PluginInstance.objects.filter(pk__in=parent_ids)
-            finished = [parent.status == 'finishedSuccessfully' for parent in parents]
+@shared_task
+def schedule_new_plugin_instances(plg_inst_ids):
+    """
+    Schedule a group of newly created plugin instances in 'waiting' DB status that are
+    ready to run. This runs the admission control in a worker rather than in the
+    request that created the plugin instances. Plugin instances that are not admitted
+    are left waiting for the periodic scheduling task.
+    """
+    schedule_plugin_instances(
+        _get_ready_waiting_plugin_instances().filter(id__in=plg_inst_ids))
 
-            if all(finished):
-                _schedule_plugin_instance(plg_inst)
-        else:
-            _schedule_plugin_instance(plg_inst)
 
-    for plg_inst in all_instances.difference(ts_instances):
-        _schedule_plugin_instance(plg_inst)
+@shared_task
+def schedule_plugin_instance_dependents(plg_inst_id):
+    """
+    Schedule or cancel the plugin instances in 'waiting' DB status that depend on a
+    plugin instance that has just reached a final status. Dependents are both its
+    'next' plugin instances and its 'ts' children. The same rules of the periodic
+    schedule_waiting_plugin_instances and cancel_waiting_plugin_instances tasks apply.
+    """
+    lookup = Q(previous_id=plg_inst_id) | Q(ts_parents=plg_inst_id)
+    dependent_ids = PluginInstance.objects.filter(
+        status='waiting').filter(lookup).values('id')
+
+    # release (or cancel) the children whose copy jobs were prefetched
+    prefetched = PluginInstance.objects.filter(previous_id=plg_inst_id,
+                                               status='copying',
+                                               previous__status__in=INACTIVE_STATUSES)
+    for prefetched_id in prefetched.values_list('id', flat=True):
+        enqueue_once(check_plugin_instance_job_exec_status, prefetched_id,
+                     'PluginInstanceCopyJob')
+
+    schedule_plugin_instances(
+        _get_ready_waiting_plugin_instances().filter(id__in=dependent_ids))
+    _cancel_failed_waiting_plugin_instances(
+        _get_failed_waiting_plugin_instances().filter(id__in=dependent_ids))
 
 
-def _schedule_plugin_instance(plg_inst):
+@shared_task
+def prefetch_plugin_instance_dependents(plg_inst_id):
     """
-    Schedule the appropriate job for a waiting plugin instance based on its compute
-    resource configuration.
+    Schedule the copy jobs of the 'ds' plugin instances in 'waiting' DB status whose
+    previous plugin instance's output files are already in storage but still being
+    registered in the DB. Their app jobs are held until the previous plugin instance
+    has finished successfully.
     """
-    cr = plg_inst.compute_resource
+    schedule_plugin_instances(PluginInstance.objects.filter(
+        status='waiting', previous_id=plg_inst_id, previous__status='registeringFiles',
+        plugin__meta__type='ds', compute_resource__compute_requires_copy_job=True))
+
+
+def _get_ready_waiting_plugin_instances():
+    """
+    Get a queryset with the plugin instances in 'waiting' DB status whose previous
+    plugin instance and 'ts' parents (if any) are all in 'finishedSuccessfully' DB
+    status. Plugin instances without a previous plugin instance wait only for
+    admission.
+    """
+    unfinished_parents = PluginInstance.objects.filter(
+        ts_children=OuterRef('pk')).exclude(status='finishedSuccessfully')
+    lookup = Q(previous__isnull=True) | Q(previous__status='finishedSuccessfully')
+    return PluginInstance.objects.filter(status='waiting').filter(
+        lookup, ~Exists(unfinished_parents))
+
+
+def _get_failed_waiting_plugin_instances():
+    """
+    Get a queryset with the plugin instances in 'waiting' DB status whose previous
+    plugin instance or any of its 'ts' parents is in either 'finishedWithError' or
+    'cancelled' DB status.
+    """
+    failed_statuses = ('finishedWithError', 'cancelled')
+    failed_parents = PluginInstance.objects.filter(ts_children=OuterRef('pk'),
+                                                   status__in=failed_statuses)
+    return PluginInstance.objects.filter(status='waiting').filter(
+        Q(previous__status__in=failed_statuses) | Exists(failed_parents))
+
+
+def _cancel_failed_waiting_plugin_instances(instances) -> int:
+    """
+    Cancel the plugin instances in a queryset of failed waiting plugin instances
+    together with all the waiting plugin instances downstream of them (through both
+    'previous' and 'ts' parent links) in a single recursive SQL statement. Returns the
+    number of cancelled plugin instances.
+    """
+    seed_sql, seed_params = instances.order_by().values('id').query.sql_with_params()
+    table = PluginInstance._meta.db_table
+    ts_table = PluginInstance.ts_parents.through._meta.db_table
+
+    sql = f"""
+        WITH RECURSIVE failed(id) AS (
+            {seed_sql}
+            UNION
+            SELECT edge.child_id
+            FROM (
+                SELECT id AS child_id, previous_id AS parent_id
+                FROM {table} WHERE status = 'waiting'
+                UNION ALL
+                SELECT ts.from_plugininstance_id, ts.to_plugininstance_id
+                FROM {ts_table} ts JOIN {table} child
+                ON child.id = ts.from_plugininstance_id AND child.status = 'waiting'
+            ) edge
+            JOIN failed ON edge.parent_id = failed.id
+        )
+        UPDATE {table} SET status = 'cancelled', timeline = timeline || %s::jsonb
+        WHERE status = 'waiting' AND id IN (SELECT id FROM failed)
+    """
+    d_events = {'cancelled': timezone.now().isoformat()}
+    with connection.cursor() as cursor:
+        cursor.execute(sql, (*seed_params, json.dumps(d_events)))
+        return cursor.rowcount
+
+
+def schedule_plugin_instances(instances):
+    """
+    Schedule the appropriate jobs for a queryset of waiting plugin instances based on
+    their compute resource configuration with a fixed number of SQL statements. Only
+    the plugin instances admitted by the admission controller are scheduled while the
+    others keep waiting. The same plugin instances might be concurrently evaluated by
+    both the periodic and the event-driven scheduling tasks so rows already locked by
+    another task are skipped and admission decisions are serialized by a lease lock
+    whose fencing token is checked before they are committed. The lock is not waited
+    for, if another task holds it then the periodic task retries later.
+    """
+    if not instances.exists():
+        return
+
+    lock = LeaseLock(ADMISSION_LOCK_NAME, lease_seconds=30)
+    if not lock.acquire():
+        return  # periodic task will retry later
+
+    try:
+        now = timezone.now()
+        with transaction.atomic():
+            candidates = list(instances.select_for_update(
+                skip_locked=True, of=('self',)).values(
+                'id', 'owner__username', 'compute_resource_id',
+                'compute_resource__compute_requires_copy_job'))
+            admitted = PluginInstanceAdmissionController().admit(candidates)
+
+            copy_ids = [c['id'] for c in admitted
+                        if c['compute_resource__compute_requires_copy_job']]
+            app_ids = [c['id'] for c in admitted
+                       if not c['compute_resource__compute_requires_copy_job']]
+
+            PluginInstance.objects.filter(id__in=copy_ids).update(
+                status='copying',
+                timeline=PluginInstance.merge_timeline_events('copying', date=now))
+            PluginInstance.objects.filter(id__in=app_ids).update(
+                status='scheduled', start_date=now, end_date=now,
+                timeline=PluginInstance.merge_timeline_events('scheduled', date=now))
+
+            if not lock.check_fencing_token():
+                # the lease expired and the lock might have been acquired by another
+                # task that is admitting with a newer view of the active instances
+                logger.warning('Lost admission lock, rolling back admission of '
+                               '%s plugin instances', len(admitted))
+                transaction.set_rollback(True)
+                return  # periodic task will retry later
+    finally:
+        lock.release()
+
+    for plg_inst_id in copy_ids:
+        run_plugin_instance_job.delay(plg_inst_id, 'PluginInstanceCopyJob')
+
+    for plg_inst_id in app_ids:
+        run_plugin_instance_job.delay(plg_inst_id, 'PluginInstanceAppJob')
 
-    if cr.compute_requires_copy_job:
-        plg_inst.set_status('copying')
-        run_plugin_instance_job.delay(plg_inst.id, 'PluginInstanceCopyJob')
-    else:
-        plg_inst.set_status('scheduled')
-        run_plugin_instance_job.delay(plg_inst.id, 'PluginInstanceAppJob')
-        
 
 @shared_task
 def check_running_plugin_instances_exec_status():
     """
-    Check the execution status of all the running jobs.
+    Check the execution status of all the running jobs whose next check is due. A
+    single status sweep task is scheduled for each compute resource with such jobs.
+    """
+    instances = PluginInstance.objects.filter(_get_running_plugin_instances_lookup(),
+                                              _get_due_plugin_instances_lookup())
+    cr_ids = instances.order_by().values_list('compute_resource_id',
+                                              flat=True).distinct()
+
+    for cr_id in cr_ids:
+        if cr_id is not None:
+            # call async task unless the previous one is still queued or running
+            enqueue_once(check_compute_resource_jobs_exec_status, cr_id)
+
+
+@shared_task
+def check_compute_resource_jobs_exec_status(compute_resource_id):
+    """
+    Fetch the execution status of all the running jobs in a compute resource in one
+    sweep and only schedule the status handling of those jobs that need it.
+    """
+    try:
+        cr = ComputeResource.objects.get(pk=compute_resource_id)
+    except ComputeResource.DoesNotExist:
+        logger.error(f"Compute resource with id {compute_resource_id} not found when "
+                     f"running check_compute_resource_jobs_exec_status task.")
+        return
+
+    instances = PluginInstance.objects.filter(
+        _get_running_plugin_instances_lookup(), _get_due_plugin_instances_lookup(),
+        compute_resource=cr)
+
+    poller = ComputeResourceStatusPoller(cr)
+    for plg_inst, job_class_name in poller.poll(instances):
+        enqueue_once(check_plugin_instance_job_exec_status, plg_inst.id, job_class_name)
+
+
+def _get_running_plugin_instances_lookup():
+    """
+    Get the lookup for the plugin instances with a running job given the storage
+    environment.
     """
     lookup = Q(status='started')
 
@@ -221,19 +414,14 @@ def check_running_plugin_instances_exec_status():
 
     if settings.STORAGE_ENV not in ('filesystem', 'zipfile', 'fslink'):
         lookup = lookup | Q(status='uploading')
-    
-    instances = PluginInstance.objects.filter(lookup)
+    return lookup
 
-    for plg_inst in instances:
-        if plg_inst.status == 'copying':
-            check_plugin_instance_job_exec_status.delay(plg_inst.id, 
-                                                        'PluginInstanceCopyJob')  # call async task
-        elif plg_inst.status == 'started':
-            check_plugin_instance_job_exec_status.delay(plg_inst.id, 
-                                                        'PluginInstanceAppJob')
-        elif plg_inst.status == 'uploading':
-            check_plugin_instance_job_exec_status.delay(plg_inst.id, 
-                                                        'PluginInstanceUploadJob')
+
+def _get_due_plugin_instances_lookup():
+    """
+    Get the lookup for the running plugin instances whose next status check is due.
+    """
+    return Q(next_check_date__isnull=True) | Q(next_check_date__lte=timezone.now())
 
 
 @shared_task
@@ -245,48 +433,61 @@ def handle_remote_cleanup():
     # instances needing data deletion status check
     deleting_data = PluginInstance.objects.filter(remote_cleanup_status='deletingData')
     for plg_inst in deleting_data:
-        check_plugin_instance_job_exec_status.delay(plg_inst.id,
-                                                     'PluginInstanceDeleteJob')
+        enqueue_once(check_plugin_instance_job_exec_status, plg_inst.id,
+                     'PluginInstanceDeleteJob')
 
-    # instances needing container deletion
-    deleting_containers = PluginInstance.objects.filter(
-        remote_cleanup_status='deletingContainers')
-    for plg_inst in deleting_containers:
-        delete_plugin_instance_containers_from_remote.delay(plg_inst.id)
+    # compute resources with instances needing container deletion
+    cr_ids = PluginInstance.objects.filter(
+        remote_cleanup_status='deletingContainers').order_by().values_list(
+        'compute_resource_id', flat=True).distinct()
+    for cr_id in cr_ids:
+        if cr_id is not None:
+            enqueue_once(delete_compute_resource_containers_from_remote, cr_id)
 
 
 @shared_task
-def cancel_waiting_plugin_instances():
+def delete_compute_resource_containers_from_remote(compute_resource_id):
     """
-    Cancel all plugin instances in 'waiting' DB status when their previous plugin 
-    instance is in either 'finishedWithError' or 'cancelled' DB status. Plugin 
-    instances of type 'ts' are cancelled if at least one of their ancestors is in 
-    any of those DB statuses.
+    Delete all remote containers for all the plugin instances' jobs in a compute
+    resource that need container deletion in one sweep. Updates their cleanup status
+    accordingly.
     """
-    lookup = Q(previous__status='finishedWithError') | Q(previous__status='cancelled')
-    PluginInstance.objects.filter(
-        status='waiting'
-    ).filter(lookup).update(status='cancelled')
+    try:
+        cr = ComputeResource.objects.get(pk=compute_resource_id)
+    except ComputeResource.DoesNotExist:
+        logger.error(f"Compute resource with id {compute_resource_id} not found when "
+                     f"running delete_compute_resource_containers_from_remote task.")
+        return
 
-    ts_instances = PluginInstance.objects.filter(
-        status='waiting'
-    ).filter(plugin__meta__type='ts')
+    instances = list(PluginInstance.objects.filter(
+        remote_cleanup_status='deletingContainers', compute_resource=cr))
 
-    plg_inst_ids = []
+    cleaner = ComputeResourceContainerCleaner(cr)
+    results = cleaner.delete_all_remote_containers(instances)
 
-    for plg_inst in ts_instances:
-        param = plg_inst.string_param.filter(plugin_param__name='plugininstances').first()
+    for plugin_inst in instances:
+        if results[plugin_inst.id]:
+            plugin_inst.remote_cleanup_status = 'complete'
+        else:
+            plugin_inst.remote_cleanup_retry_count += 1
+            if (plugin_inst.remote_cleanup_retry_count >
+                    PluginInstance.MAX_REMOTE_CLEANUP_RETRIES):
+                plugin_inst.remote_cleanup_status = 'failed'
 
-        if param and param.value:
-            parent_ids = [int(parent_id) for parent_id in param.value.split(',')]
-            parents = PluginInstance.objects.filter(pk__in=parent_ids)
+        plugin_inst.save(update_fields=['remote_cleanup_status',
+                                         'remote_cleanup_retry_count'])
 
-            for parent in parents:
-                if parent.status in ('finishedWithError', 'cancelled'):
-                    plg_inst_ids.append(plg_inst.id)
-                    break
 
-    PluginInstance.objects.filter(pk__in=plg_inst_ids).update(status='cancelled')
+@shared_task
+def cancel_waiting_plugin_instances():
+    """
+    Cancel all plugin instances in 'waiting' DB status when their previous plugin 
+    instance is in either 'finishedWithError' or 'cancelled' DB status. Plugin 
+    instances of type 'ts' are cancelled if at least one of their ancestors is in 
+    any of those DB statuses. The whole downstream subtree of waiting plugin instances
+    is cancelled at once.
+    """
+    _cancel_failed_waiting_plugin_instances(_get_failed_waiting_plugin_instances())
 
 
 @shared_task
@@ -304,23 +505,30 @@ def delete_plugin_instances_jobs_from_remote():
 
 
 @shared_task
-def cancel_plugin_instances_stuck_in_lock():
+def resume_plugin_instances_with_expired_lock():
     """
-    Collect all plugin instances for which the check_plugin_instance_job_exec_status 
-    async task is stuck or failed in the lock section of the code (e.g. because of a 
-    worker crash). Then schedule a new cancel request for all of them.
+    Collect all plugin instances for which the output files registration lock's lease
+    has expired (e.g. because of a worker crash) and schedule a new task to take over
+    the lock and resume the registration for each of them. Instances whose
+    registration started more than 240 minutes ago are cancelled instead.
     """
-    cutoff = timezone.now() - timedelta(minutes=240)  # hardcoded cutoff delta
-
-    instances = PluginInstance.objects.filter(status='registeringFiles', 
-                                              lock__start_date__lt=cutoff)
-    for plg_inst in instances:
-        plg_inst.error_code = 'CODE18'
-        plg_inst.save(update_fields=['error_code'])
-
-        logger.error(f"Plugin instance with id {plg_inst.id} stuck in lock. Sending "
-                     f"cancelling task for it. ")
-        cancel_plugin_instance_job.delay(plg_inst.id)
+    now = timezone.now()
+    cutoff = now - timedelta(minutes=240)  # hardcoded cutoff delta
+
+    instances = PluginInstance.objects.filter(status='registeringFiles',
+                                              lock__expiration_date__lt=now)
+    for plg_inst in instances.select_related('lock'):
+        if plg_inst.lock.start_date < cutoff:
+            plg_inst.error_code = 'CODE18'
+            plg_inst.save(update_fields=['error_code'])
+
+            logger.error(f"Plugin instance with id {plg_inst.id} stuck in lock. Sending "
+                         f"cancelling task for it. ")
+            cancel_plugin_instance_job.delay(plg_inst.id)
+        else:
+            logger.warning(f"Plugin instance with id {plg_inst.id} lock's lease "
+                           f"expired. Sending resume registration task for it. ")
+            resume_plugin_instance_files_registration.delay(plg_inst.id)
 
 
 @shared_task
@@ -385,6 +593,23 @@ def cancel_plugin_inst_on_task_failure(sender=None, task_id=None, exception=None
             cancel_plugin_instance_job.delay(plg_inst_id)
 
 
+@task_postrun.connect
+def clear_enqueue_once_key_on_task_end(sender=None, task_id=None, task=None, args=None,
+                                       **other_kwargs):
+    """
+    Handler to allow enqueueing again the de-duplicated periodic fan-out tasks once
+    they have finished (either successfully or not).
+    """
+    # list of task names enqueued with enqueue_once
+    handled_tasks = {
+        'plugininstances.tasks.check_plugin_instance_job_exec_status',
+        'plugininstances.tasks.check_compute_resource_jobs_exec_status',
+        'plugininstances.tasks.delete_compute_resource_containers_from_remote',
+    }
+    if sender.name in handled_tasks:
+        clear_enqueue_once(sender.name, args or ())
+
+
 @shared_task  # toy task for testing celery stuff
 def sum(x, y):
     return x + y
@@ -0,0 +1,164 @@
+
+import logging
+from unittest import mock
+
+import redis
+
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.conf import settings
+from django.urls import reverse
+
+from rest_framework import status
+
+from plugins.models import PluginMeta, Plugin, ComputeResource
+from plugininstances.models import PluginInstance
+from plugininstances.services.admission import PluginInstanceAdmissionController
+
+
+COMPUTE_RESOURCE_URL = settings.COMPUTE_RESOURCE_URL
+
+
+class AdmissionControllerTests(TestCase):
+
+    def setUp(self):
+        # avoid cluttered console output (for instance logging all the http requests)
+        logging.disable(logging.WARNING)
+
+        (self.compute_resource, tf) = ComputeResource.objects.get_or_create(
+            name='host', compute_url=COMPUTE_RESOURCE_URL, compute_user='pfcon',
+            compute_password='pfcon1234')
+
+        (pl_meta, tf) = PluginMeta.objects.get_or_create(name='pacspull', type='fs')
+        (self.plugin, tf) = Plugin.objects.get_or_create(meta=pl_meta, version='0.1')
+        self.plugin.compute_resources.set([self.compute_resource])
+
+        self.user1 = User.objects.create_user(username='foo', password='foo-pass')
+        self.user2 = User.objects.create_user(username='bar', password='bar-pass')
+
+    def tearDown(self):
+        # re-enable logging
+        logging.disable(logging.NOTSET)
+
+    def _create_plugin_instances(self, user, n, status='waiting'):
+        return [PluginInstance.objects.create(plugin=self.plugin, owner=user,
+                                              status=status,
+                                              compute_resource=self.compute_resource)
+                for _ in range(n)]
+
+    def _get_candidates(self):
+        return list(PluginInstance.objects.filter(status='waiting').values(
+            'id', 'owner__username', 'compute_resource_id'))
+
+    @override_settings(MAX_ACTIVE_PLUGIN_INSTANCES_PER_USER=-1,
+                       PLUGIN_INSTANCE_FAIR_SHARE_WEIGHTS={})
+    def test_admit_interleaves_users_in_fair_share_order(self):
+        self._create_plugin_instances(self.user1, 2, status='started')
+        inst1 = self._create_plugin_instances(self.user1, 3)
+        inst2 = self._create_plugin_instances(self.user2, 3)
+
+        admitted = PluginInstanceAdmissionController().admit(self._get_candidates())
+        admitted_ids = [c['id'] for c in admitted]
+
+        # user2 has no active plugin instances so it goes first until it catches up
+        self.assertEqual(admitted_ids, [inst2[0].id, inst2[1].id, inst1[0].id,
+                                        inst2[2].id, inst1[1].id, inst1[2].id])
+
+    @override_settings(MAX_ACTIVE_PLUGIN_INSTANCES_PER_USER=2,
+                       PLUGIN_INSTANCE_FAIR_SHARE_WEIGHTS={})
+    def test_admit_enforces_per_user_cap(self):
+        self._create_plugin_instances(self.user1, 1, status='started')
+        inst1 = self._create_plugin_instances(self.user1, 3)
+        inst2 = self._create_plugin_instances(self.user2, 3)
+
+        admitted = PluginInstanceAdmissionController().admit(self._get_candidates())
+
+        self.assertEqual(sorted(c['id'] for c in admitted),
+                         sorted([inst1[0].id, inst2[0].id, inst2[1].id]))
+
+    @override_settings(MAX_ACTIVE_PLUGIN_INSTANCES_PER_USER=-1,
+                       PLUGIN_INSTANCE_FAIR_SHARE_WEIGHTS={'foo': 3})
+    def test_admit_enforces_compute_resource_cap_with_weighted_shares(self):
+        self.compute_resource.max_active_jobs = 4
+        self.compute_resource.save()
+        inst1 = self._create_plugin_instances(self.user1, 4)
+        inst2 = self._create_plugin_instances(self.user2, 4)
+
+        admitted = PluginInstanceAdmissionController().admit(self._get_candidates())
+
+        self.assertEqual(sorted(c['id'] for c in admitted),
+                         sorted([inst1[0].id, inst1[1].id, inst1[2].id, inst2[0].id]))
+
+    @override_settings(MAX_ACTIVE_PLUGIN_INSTANCES_PER_USER=5,
+                       PLUGIN_INSTANCE_FAIR_SHARE_WEIGHTS={})
+    def test_get_state(self):
+        self._create_plugin_instances(self.user1, 1, status='started')
+        self._create_plugin_instances(self.user1, 2)
+
+        state = PluginInstanceAdmissionController().get_state()
+
+        self.assertEqual(state['max_active_plugin_instances_per_user'], 5)
+        self.assertEqual(state['compute_resources'][0]['active'], 1)
+        self.assertEqual(state['compute_resources'][0]['waiting'], 2)
+        self.assertEqual(state['users'], [{'username': 'foo', 'weight': 1.0,
+                                           'active': 1, 'waiting': 2}])
+
+
+class PluginInstanceAdmissionAdminDetailViewTests(TestCase):
+    """
+    Test the admin-admission-detail view.
+    """
+
+    def setUp(self):
+        # avoid cluttered console output (for instance logging all the http requests)
+        logging.disable(logging.WARNING)
+
+        self.admin_username = 'admin'
+        self.admin_password = 'adminpass'
+        self.username = 'foo'
+        self.password = 'pass'
+        # create admin user
+        User.objects.create_superuser(username=self.admin_username,
+                                      password=self.admin_password,
+                                      email='admin@babymri.org')
+        # create normal user
+        User.objects.create_user(username=self.username,
+                                 password=self.password)
+
+        self.read_url = reverse('admin-admission-detail')
+
+    def tearDown(self):
+        # re-enable logging
+        logging.disable(logging.NOTSET)
+
+    def test_admission_detail_success(self):
+        self.client.login(username=self.admin_username, password=self.admin_password)
+        response = self.client.get(self.read_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('max_active_plugin_instances_per_user', response.data)
+        self.assertEqual([d['name'] for d in response.data['lease_locks']],
+                         ['plugininstances.tasks.schedule_waiting_plugin_instances',
+                          'plugininstances.admission'])
+        self.assertIn('wait_seconds_total', response.data['lease_locks'][0])
+        self.assertIn('main2', response.data['task_queues'])
+        self.assertIn('plugininstances.tasks.check_compute_resource_jobs_exec_status',
+                      [d['name'] for d in response.data['enqueue_once_tasks']])
+        self.assertIn('skipped', response.data['enqueue_once_tasks'][0])
+
+    def test_admission_detail_success_without_task_metrics_store(self):
+        self.client.login(username=self.admin_username, password=self.admin_password)
+        with mock.patch('plugininstances.admin.get_queue_depths',
+                        side_effect=redis.ConnectionError('down')):
+            response = self.client.get(self.read_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(response.data['task_queues'])
+        self.assertIsNotNone(response.data['lease_locks'])
+
+    def test_admission_detail_failure_unauthenticated(self):
+        response = self.client.get(self.read_url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_admission_detail_failure_access_denied(self):
+        self.client.login(username=self.username, password=self.password)
+        response = self.client.get(self.read_url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
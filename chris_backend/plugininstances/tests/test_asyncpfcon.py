@@ -0,0 +1,90 @@
+
+import logging
+import asyncio
+import functools
+from unittest import mock
+
+import httpx
+from django.test import SimpleTestCase
+
+from pfconclient.client import JobType
+from pfconclient.exceptions import (PfconRequestException,
+                                    PfconRequestInvalidTokenException)
+
+from plugininstances.services import asyncpfcon
+
+
+PFCON_URL = 'http://pfcon.remote:30005/api/v1/'
+
+
+class AsyncPfconClientTests(SimpleTestCase):
+
+    def setUp(self):
+        # avoid cluttered console output (for instance logging all the http requests)
+        logging.disable(logging.WARNING)
+        self.requests = []
+
+    def tearDown(self):
+        # re-enable logging
+        logging.disable(logging.NOTSET)
+
+    def _run(self, handler, coro_func):
+        """
+        Run the passed coroutine function with a client whose requests are answered
+        by the passed handler.
+        """
+        def record(request):
+            self.requests.append(request)
+            return handler(request)
+
+        async_client = functools.partial(httpx.AsyncClient,
+                                         transport=httpx.MockTransport(record))
+        with mock.patch.object(asyncpfcon.httpx, 'AsyncClient', async_client):
+            async def main():
+                async with asyncpfcon.AsyncPfconClient(PFCON_URL, 'token') as client:
+                    return await coro_func(client)
+            return asyncio.run(main())
+
+    def test_get_job_status(self):
+        d_resp = {'compute': {'status': 'started', 'logs': ''}}
+        result = self._run(lambda request: httpx.Response(200, json=d_resp),
+                           lambda client: client.get_job_status(JobType.PLUGIN,
+                                                                'chris-jid-1'))
+        self.assertEqual(result, d_resp)
+        self.assertEqual(str(self.requests[0].url), PFCON_URL + 'pluginjobs/chris-jid-1/')
+        self.assertEqual(self.requests[0].headers['Authorization'], 'Bearer token')
+
+    def test_get_job_status_accepts_created_response(self):
+        d_resp = {'compute': {'status': 'started', 'logs': ''}}
+        result = self._run(lambda request: httpx.Response(201, json=d_resp),
+                           lambda client: client.get_job_status(JobType.PLUGIN,
+                                                                'chris-jid-1'))
+        self.assertEqual(result, d_resp)
+
+    def test_get_job_status_raises_invalid_token_exception(self):
+        with self.assertRaises(PfconRequestInvalidTokenException):
+            self._run(lambda request: httpx.Response(401),
+                      lambda client: client.get_job_status(JobType.PLUGIN,
+                                                           'chris-jid-1'))
+
+    def test_delete_job_raises_pfcon_request_exception(self):
+        with self.assertRaises(PfconRequestException):
+            self._run(lambda request: httpx.Response(500),
+                      lambda client: client.delete_job(JobType.COPY, 'chris-jid-1'))
+
+    def test_refresh_auth_token_only_once_for_concurrent_callers(self):
+        expired_tokens = []
+
+        async def get_new_token(expired_token):
+            expired_tokens.append(expired_token)
+            await asyncio.sleep(0)
+            return 'new'
+
+        async def refresh(client):
+            return await asyncio.gather(
+                *[client.refresh_auth_token(get_new_token, 'token') for _ in range(3)])
+
+        result = self._run(lambda request: httpx.Response(200), refresh)
+        self.assertEqual(result, ['new', 'new', 'new'])
+        self.assertEqual(expired_tokens, ['token'])
+        self.assertEqual(self.requests, [])
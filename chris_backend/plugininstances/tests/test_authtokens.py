@@ -0,0 +1,95 @@
+
+import logging
+import time
+from unittest import mock
+
+import jwt
+from django.test import TestCase, override_settings
+from django.conf import settings
+from django.core.cache import cache
+
+from plugins.models import ComputeResource
+from plugininstances.services import authtokens
+
+
+COMPUTE_RESOURCE_URL = settings.COMPUTE_RESOURCE_URL
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class AuthTokensTests(TestCase):
+
+    def setUp(self):
+        # avoid cluttered console output (for instance logging all the http requests)
+        logging.disable(logging.WARNING)
+
+        self.valid_token = self._create_token(3600)
+        self.expiring_token = self._create_token(60)
+
+        (self.compute_resource, tf) = ComputeResource.objects.get_or_create(
+            name='host', compute_url=COMPUTE_RESOURCE_URL, compute_user='pfcon',
+            compute_password='pfcon1234', compute_auth_token=self.valid_token)
+
+    def tearDown(self):
+        cache.clear()
+        authtokens._local_tokens.clear()
+        # re-enable logging
+        logging.disable(logging.NOTSET)
+
+    @staticmethod
+    def _create_token(expires_in):
+        return jwt.encode({'pfcon_user': 'pfcon', 'exp': int(time.time()) + expires_in},
+                          'secret', algorithm='HS256')
+
+    def test_get_compute_resource_auth_token_uses_valid_db_token(self):
+        with mock.patch.object(authtokens.pfcon.Client,
+                               'get_auth_token') as get_auth_token_mock:
+            token = authtokens.get_compute_resource_auth_token(self.compute_resource)
+            get_auth_token_mock.assert_not_called()
+        self.assertEqual(token, self.valid_token)
+
+    def test_get_compute_resource_auth_token_refreshes_token_about_to_expire(self):
+        self.compute_resource.compute_auth_token = self.expiring_token
+        self.compute_resource.save()
+        new_token = self._create_token(7200)
+
+        with mock.patch.object(authtokens.pfcon.Client, 'get_auth_token',
+                               return_value=new_token) as get_auth_token_mock:
+            token = authtokens.get_compute_resource_auth_token(self.compute_resource)
+            self.assertEqual(token, new_token)
+
+            # the new token is shared, no other request is made
+            authtokens._local_tokens.clear()
+            cr = ComputeResource.objects.get(id=self.compute_resource.id)
+            self.assertEqual(cr.compute_auth_token, new_token)
+            self.assertEqual(authtokens.get_compute_resource_auth_token(cr), new_token)
+            get_auth_token_mock.assert_called_once()
+
+    def test_refresh_compute_resource_auth_token_reuses_token_refreshed_by_other(self):
+        new_token = self._create_token(7200)
+        authtokens.set_compute_resource_auth_token(self.compute_resource, new_token)
+
+        with mock.patch.object(authtokens.pfcon.Client,
+                               'get_auth_token') as get_auth_token_mock:
+            token = authtokens.refresh_compute_resource_auth_token(
+                self.compute_resource, self.valid_token)
+            get_auth_token_mock.assert_not_called()
+        self.assertEqual(token, new_token)
+
+    def test_refresh_compute_resource_auth_token_waits_for_concurrent_refresh(self):
+        new_token = self._create_token(7200)
+        lock_key = authtokens._get_cache_key(self.compute_resource.id) + '_lock'
+        cache.add(lock_key, 1)
+
+        def sleep(seconds):
+            # the lock holder publishes the new token while waiting
+            authtokens._store_token(self.compute_resource.id, new_token,
+                                    authtokens._get_token_expiration(new_token))
+
+        with mock.patch.object(authtokens.time, 'sleep', side_effect=sleep):
+            with mock.patch.object(authtokens.pfcon.Client,
+                                   'get_auth_token') as get_auth_token_mock:
+                token = authtokens.refresh_compute_resource_auth_token(
+                    self.compute_resource, self.valid_token)
+                get_auth_token_mock.assert_not_called()
+        self.assertEqual(token, new_token)
@@ -0,0 +1,91 @@
+
+import logging
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.conf import settings
+
+from pfconclient.client import JobType
+from pfconclient.exceptions import PfconRequestException
+
+from plugins.models import PluginMeta, Plugin, ComputeResource
+from plugininstances.models import PluginInstance
+from plugininstances.services import containercleaner, authtokens
+
+
+COMPUTE_RESOURCE_URL = settings.COMPUTE_RESOURCE_URL
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ComputeResourceContainerCleanerTests(TestCase):
+
+    def setUp(self):
+        # avoid cluttered console output (for instance logging all the http requests)
+        logging.disable(logging.WARNING)
+        logging.getLogger('plugininstances.services.containercleaner').setLevel(
+            logging.CRITICAL)
+
+        self.username = 'foo'
+        self.password = 'foo-pass'
+
+        (self.compute_resource, tf) = ComputeResource.objects.get_or_create(
+            name='host', compute_url=COMPUTE_RESOURCE_URL, compute_user='pfcon',
+            compute_password='pfcon1234', compute_requires_copy_job=True)
+
+        (pl_meta, tf) = PluginMeta.objects.get_or_create(name='pacspull', type='fs')
+        (plugin, tf) = Plugin.objects.get_or_create(meta=pl_meta, version='0.1')
+        plugin.compute_resources.set([self.compute_resource])
+        plugin.save()
+
+        user = User.objects.create_user(username=self.username, password=self.password)
+
+        self.plg_inst1 = PluginInstance.objects.create(
+            plugin=plugin, owner=user, status='finishedSuccessfully',
+            compute_resource=self.compute_resource)
+        self.plg_inst2 = PluginInstance.objects.create(
+            plugin=plugin, owner=user, status='finishedSuccessfully',
+            compute_resource=self.compute_resource)
+
+        self.cleaner = containercleaner.ComputeResourceContainerCleaner(
+            self.compute_resource)
+
+    def tearDown(self):
+        authtokens._local_tokens.clear()
+        # re-enable logging
+        logging.disable(logging.NOTSET)
+        logging.getLogger('plugininstances.services.containercleaner').setLevel(
+            logging.NOTSET)
+
+    def test_delete_all_remote_containers(self):
+        deleted = []
+
+        async def delete_job(client, job_type, job_id, timeout=200):
+            deleted.append((job_type, job_id))
+
+        with mock.patch.object(containercleaner.AsyncPfconClient, 'delete_job',
+                               delete_job):
+            results = self.cleaner.delete_all_remote_containers(
+                [self.plg_inst1, self.plg_inst2])
+
+        self.assertEqual(results, {self.plg_inst1.id: True, self.plg_inst2.id: True})
+        job_id = self.cleaner.str_job_id_prefix + str(self.plg_inst1.id)
+        self.assertEqual(sorted(job_type.name for job_type, jid in deleted
+                                if jid == job_id),
+                         sorted([JobType.COPY.name, JobType.PLUGIN.name,
+                                 JobType.DELETE.name]))
+
+    def test_delete_all_remote_containers_reports_failed_deletions(self):
+        failed_job_id = self.cleaner.str_job_id_prefix + str(self.plg_inst1.id)
+
+        async def delete_job(client, job_type, job_id, timeout=200):
+            if job_id == failed_job_id and job_type == JobType.PLUGIN:
+                raise PfconRequestException('error')
+
+        with mock.patch.object(containercleaner.AsyncPfconClient, 'delete_job',
+                               delete_job):
+            results = self.cleaner.delete_all_remote_containers(
+                [self.plg_inst1, self.plg_inst2])
+
+        self.assertEqual(results, {self.plg_inst1.id: False, self.plg_inst2.id: True})
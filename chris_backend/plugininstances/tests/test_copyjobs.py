@@ -296,6 +296,50 @@ class PluginInstanceCopyJobTests(TestCase):
             mock_app_job_class.assert_called_once_with(pl_inst)
             mock_app_job_instance.run.assert_called_once()
 
+    def test_handle_finished_successfully_status_records_input_dirs_locality(self):
+        user = User.objects.get(username=self.username)
+        plugin = Plugin.objects.get(meta__name=self.plugin_fs_name)
+        (pl_inst, tf) = PluginInstance.objects.get_or_create(
+            plugin=plugin, owner=user, status='copying',
+            compute_resource=plugin.compute_resources.all()[0])
+        pl_param = plugin.parameters.all()[0]
+        user_space_path = f'home/{self.username}/uploads'
+        PathParameter.objects.get_or_create(plugin_inst=pl_inst, plugin_param=pl_param,
+                                            value=user_space_path)
+        copy_job = copyjobs.PluginInstanceCopyJob(pl_inst)
+
+        with mock.patch.object(copyjobs, 'PluginInstanceAppJob'):
+            copy_job.handle_finished_successfully_status()
+
+        self.assertEqual(list(pl_inst.remote_data_locations.values_list('path',
+                                                                        flat=True)),
+                         [user_space_path])
+
+    def test_handle_finished_successfully_status_holds_prefetched_copy_job(self):
+        user = User.objects.get(username=self.username)
+        plugin = Plugin.objects.get(meta__name=self.plugin_fs_name)
+        (pl_meta, tf) = PluginMeta.objects.get_or_create(name='mri_convert', type='ds')
+        (plugin_ds, tf) = Plugin.objects.get_or_create(meta=pl_meta, version='0.1')
+        (pl_inst, tf) = PluginInstance.objects.get_or_create(
+            plugin=plugin, owner=user, status='registeringFiles',
+            compute_resource=self.compute_resource)
+        child = PluginInstance.objects.create(plugin=plugin_ds, owner=user,
+                                              previous=pl_inst, status='copying',
+                                              compute_resource=self.compute_resource)
+        copy_job = copyjobs.PluginInstanceCopyJob(child)
+
+        with mock.patch.object(copyjobs, 'PluginInstanceAppJob') as mock_app_job_class:
+            copy_job.handle_finished_successfully_status()
+            self.assertEqual(child.status, 'copying')
+            self.assertIn('copied', child.timeline)
+            mock_app_job_class.assert_not_called()
+
+            pl_inst.status = 'finishedSuccessfully'
+            pl_inst.save()
+            copy_job.handle_finished_successfully_status()
+            self.assertEqual(child.status, 'scheduled')
+            mock_app_job_class.assert_called_once_with(child)
+
     def test_handle_finished_with_error_status(self):
         user = User.objects.get(username=self.username)
         plugin = Plugin.objects.get(meta__name=self.plugin_fs_name)
@@ -0,0 +1,62 @@
+
+import logging
+
+from django.test import TestCase
+from django.contrib.auth.models import User
+from django.conf import settings
+
+from plugins.models import PluginMeta, Plugin, PluginParameter, ComputeResource
+from plugininstances.models import PluginInstance
+from plugininstances.services.dagbuilder import PluginInstanceDAGBuilder
+
+
+COMPUTE_RESOURCE_URL = settings.COMPUTE_RESOURCE_URL
+
+
+class PluginInstanceDAGBuilderTests(TestCase):
+
+    def setUp(self):
+        # avoid cluttered console output (for instance logging all the http requests)
+        logging.disable(logging.WARNING)
+
+        (self.compute_resource, tf) = ComputeResource.objects.get_or_create(
+            name='host', compute_url=COMPUTE_RESOURCE_URL, compute_user='pfcon',
+            compute_password='pfcon1234')
+
+        (pl_meta, tf) = PluginMeta.objects.get_or_create(name='pacspull', type='fs')
+        (plugin_fs, tf) = Plugin.objects.get_or_create(meta=pl_meta, version='0.1')
+        (pl_meta, tf) = PluginMeta.objects.get_or_create(name='mri_convert', type='ds')
+        (self.plugin_ds, tf) = Plugin.objects.get_or_create(meta=pl_meta, version='0.1')
+        (self.plg_param, tf) = PluginParameter.objects.get_or_create(
+            plugin=self.plugin_ds, name='dummyInt', type='integer', optional=True)
+
+        self.user = User.objects.create_user(username='foo', password='foo-pass')
+        self.plg_inst = PluginInstance.objects.create(
+            plugin=plugin_fs, owner=self.user, compute_resource=self.compute_resource)
+
+    def tearDown(self):
+        # re-enable logging
+        logging.disable(logging.NOTSET)
+
+    def _get_chain_builder(self, length):
+        builder = PluginInstanceDAGBuilder(self.user, self.plg_inst)
+        for i in range(length):
+            builder.add_node(i, self.plugin_ds, self.compute_resource,
+                             params=[(self.plg_param, i)],
+                             previous_key=i - 1 if i else None)
+        return builder
+
+    def test_create_uses_a_constant_number_of_queries(self):
+        self.plg_inst.output_folder.parent  # cache the output folder's parent
+        with self.assertNumQueries(7):
+            self._get_chain_builder(2).create()
+        with self.assertNumQueries(7):
+            instances = self._get_chain_builder(10).create()
+
+        last = instances[9]
+        last.refresh_from_db()
+        self.assertEqual(len(last.get_lineage_ids()), 11)
+        self.assertEqual(last.get_root_instance(), self.plg_inst)
+        self.assertEqual(last.integer_param.get().value, 9)
+        self.assertTrue(last.get_output_path().endswith(
+            f'mri_convert_{instances[8].id}/mri_convert_{last.id}/data'))
@@ -17,7 +17,8 @@ from core.models import ChrisInstance, ChrisFolder
 from core.storage import connect_storage
 from plugins.models import PluginMeta, Plugin
 from plugins.models import PluginParameter
-from plugininstances.models import PluginInstance, PathParameter, ComputeResource
+from plugininstances.models import (PluginInstance, PathParameter, ComputeResource,
+                                     RemoteDataLocation)
 from plugininstances.services import deletejobs
 from plugininstances.services.copyjobs import PluginInstanceCopyJob
 from plugininstances.services.pluginjobs import PluginInstanceAppJob
@@ -301,6 +302,9 @@ class PluginInstanceDeleteJobTests(TestCase):
             compute_resource=plugin.compute_resources.all()[0])
         pl_inst.remote_cleanup_status = 'deletingData'
         pl_inst.save(update_fields=['remote_cleanup_status'])
+        RemoteDataLocation.objects.create(path=pl_inst.get_output_path(),
+                                          plugin_inst=pl_inst,
+                                          compute_resource=pl_inst.compute_resource)
         delete_job = deletejobs.PluginInstanceDeleteJob(pl_inst)
         delete_job.delete_all_remote_containers = mock.Mock(return_value=True)
         delete_job.save_plugin_instance_final_status = mock.Mock()
@@ -308,6 +312,7 @@ class PluginInstanceDeleteJobTests(TestCase):
         delete_job.handle_finished_successfully_status()
 
         self.assertEqual(pl_inst.remote_cleanup_status, 'complete')
+        self.assertFalse(pl_inst.remote_data_locations.exists())
         delete_job.save_plugin_instance_final_status.assert_called_once()
 
     def test_handle_finished_successfully_status_cancelled_cleans_output(self):
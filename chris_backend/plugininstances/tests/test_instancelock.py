@@ -0,0 +1,128 @@
+
+import logging
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase
+from django.contrib.auth.models import User
+from django.conf import settings
+from django.utils import timezone
+
+from pfconclient.exceptions import PfconRequestException
+
+from plugins.models import PluginMeta, Plugin, ComputeResource
+from plugininstances.models import PluginInstance, PluginInstanceLock
+from plugininstances.services.instancelock import PluginInstanceLeaseLock
+from plugininstances.services.pluginjobs import PluginInstanceAppJob
+
+
+COMPUTE_RESOURCE_URL = settings.COMPUTE_RESOURCE_URL
+
+
+class PluginInstanceLeaseLockTests(TestCase):
+
+    def setUp(self):
+        # avoid cluttered console output (for instance logging all the http requests)
+        logging.disable(logging.WARNING)
+
+        (compute_resource, tf) = ComputeResource.objects.get_or_create(
+            name='host', compute_url=COMPUTE_RESOURCE_URL, compute_user='pfcon',
+            compute_password='pfcon1234')
+
+        (pl_meta, tf) = PluginMeta.objects.get_or_create(name='pacspull', type='fs')
+        (plugin, tf) = Plugin.objects.get_or_create(meta=pl_meta, version='0.1')
+        plugin.compute_resources.set([compute_resource])
+
+        user = User.objects.create_user(username='foo', password='foo-pass')
+        self.plg_inst = PluginInstance.objects.create(
+            plugin=plugin, owner=user, compute_resource=compute_resource,
+            status='registeringFiles')
+
+    def tearDown(self):
+        # re-enable logging
+        logging.disable(logging.NOTSET)
+
+    def _expire_lease(self):
+        PluginInstanceLock.objects.filter(plugin_inst=self.plg_inst).update(
+            expiration_date=timezone.now() - timedelta(seconds=1))
+
+    def test_acquire_only_takes_over_expired_leases(self):
+        lease_lock = PluginInstanceLeaseLock(self.plg_inst, lease_seconds=30)
+        self.assertTrue(lease_lock.acquire())
+        lease_lock.release()
+        lock = PluginInstanceLock.objects.get(plugin_inst=self.plg_inst)
+        self.assertEqual(lock.holder, lease_lock.holder)
+        self.assertGreater(lock.expiration_date, timezone.now())
+
+        other_lease_lock = PluginInstanceLeaseLock(self.plg_inst, lease_seconds=30)
+        self.assertFalse(other_lease_lock.acquire())
+        self.assertFalse(other_lease_lock.acquire(takeover=True))
+
+        self._expire_lease()
+        self.assertFalse(other_lease_lock.acquire())
+        self.assertTrue(other_lease_lock.acquire(takeover=True))
+        other_lease_lock.release()
+        self.assertTrue(other_lease_lock.taken_over)
+
+        # the previous holder can't renew its lease anymore
+        self.assertFalse(lease_lock.renew())
+        self.assertTrue(lease_lock.lost)
+        self.assertTrue(other_lease_lock.renew())
+
+    def test_acquire_does_not_take_over_finished_registrations(self):
+        lease_lock = PluginInstanceLeaseLock(self.plg_inst)
+        self.assertTrue(lease_lock.acquire())
+        lease_lock.release()
+        self.plg_inst.status = 'finishedSuccessfully'
+        self.plg_inst.save(update_fields=['status'])
+        self._expire_lease()
+
+        self.assertFalse(PluginInstanceLeaseLock(self.plg_inst).acquire(takeover=True))
+
+    @mock.patch('plugininstances.services.abstractjobs.get_compute_resource_auth_token',
+                return_value='token')
+    def test_app_job_resumes_registration_after_takeover(self, mock_token):
+        lease_lock = PluginInstanceLeaseLock(self.plg_inst)
+        self.assertTrue(lease_lock.acquire())
+        lease_lock.release()
+
+        job = PluginInstanceAppJob(self.plg_inst)
+        job._get_status = mock.Mock(
+            return_value={'compute': {'status': 'finishedWithError'}})
+        job.register_output_files_on_error = mock.Mock()
+        job.resume_output_files_registration()
+        job.register_output_files_on_error.assert_not_called()  # lease still held
+
+        self._expire_lease()
+        job.resume_output_files_registration()
+        job.register_output_files_on_error.assert_called_once_with(mock.ANY)
+        lock = PluginInstanceLock.objects.get(plugin_inst=self.plg_inst)
+        self.assertNotEqual(lock.holder, lease_lock.holder)
+
+    @mock.patch('plugininstances.services.abstractjobs.get_compute_resource_auth_token',
+                return_value='token')
+    def test_app_job_aborts_registration_after_losing_lease(self, mock_token):
+        lease_lock = PluginInstanceLeaseLock(self.plg_inst)
+        self.assertTrue(lease_lock.acquire())
+        lease_lock.release()
+        self._expire_lease()
+        other_lease_lock = PluginInstanceLeaseLock(self.plg_inst)
+        self.assertTrue(other_lease_lock.acquire(takeover=True))
+        other_lease_lock.release()
+
+        for holder_lease_lock, status in ((lease_lock, 'registeringFiles'),
+                                          (other_lease_lock, 'finishedWithError')):
+            job = PluginInstanceAppJob(self.plg_inst)
+            job._get_job_json_data = mock.Mock(side_effect=PfconRequestException('x'))
+            job._get_job_zip_data = mock.Mock(side_effect=PfconRequestException('x'))
+            job.schedule_dependent_plugin_instances = mock.Mock()
+            job.schedule_remote_cleanup = mock.Mock()
+            job.register_output_files_on_error(holder_lease_lock)
+
+            self.plg_inst.refresh_from_db()
+            self.assertEqual(self.plg_inst.status, status)
+            self.assertEqual(job.schedule_dependent_plugin_instances.called,
+                             status == 'finishedWithError')
+            self.assertEqual(job.schedule_remote_cleanup.called,
+                             status == 'finishedWithError')
+        self.assertIn('finishedWithError', self.plg_inst.timeline)
@@ -0,0 +1,61 @@
+
+import logging
+
+from django.test import TestCase
+from django.contrib.auth.models import User
+from django.conf import settings
+
+from plugins.models import PluginMeta, Plugin, ComputeResource
+from plugininstances.models import PluginInstance
+from plugininstances.services.locality import DataLocalityTracker
+
+
+COMPUTE_RESOURCE_URL = settings.COMPUTE_RESOURCE_URL
+
+
+class DataLocalityTrackerTests(TestCase):
+
+    def setUp(self):
+        # avoid cluttered console output (for instance logging all the http requests)
+        logging.disable(logging.WARNING)
+
+        (self.compute_resource, tf) = ComputeResource.objects.get_or_create(
+            name='host', compute_url=COMPUTE_RESOURCE_URL, compute_user='pfcon',
+            compute_password='pfcon1234')
+        (self.other_compute_resource, tf) = ComputeResource.objects.get_or_create(
+            name='moc', compute_url=COMPUTE_RESOURCE_URL, compute_user='pfcon',
+            compute_password='pfcon1234')
+
+        (pl_meta, tf) = PluginMeta.objects.get_or_create(name='pacspull', type='fs')
+        (plugin, tf) = Plugin.objects.get_or_create(meta=pl_meta, version='0.1')
+        plugin.compute_resources.set([self.compute_resource])
+
+        user = User.objects.create_user(username='foo', password='foo-pass')
+        self.plg_inst = PluginInstance.objects.create(
+            plugin=plugin, owner=user, compute_resource=self.compute_resource)
+
+    def tearDown(self):
+        # re-enable logging
+        logging.disable(logging.NOTSET)
+
+    def test_get_resident_paths_matches_paths_and_descendants(self):
+        DataLocalityTracker.record(self.plg_inst, ['home/foo/uploads/', 'home/foo/a'])
+
+        resident = DataLocalityTracker.get_resident_paths(
+            self.compute_resource,
+            ['home/foo/uploads', 'home/foo/uploads/data', 'home/foo/ab', 'home/bar'])
+
+        self.assertEqual(resident, {'home/foo/uploads': self.plg_inst.id,
+                                    'home/foo/uploads/data': self.plg_inst.id})
+        self.assertEqual(DataLocalityTracker.get_resident_paths(
+            self.other_compute_resource, ['home/foo/uploads']), {})
+
+    def test_record_is_idempotent_and_clear(self):
+        DataLocalityTracker.record(self.plg_inst, ['home/foo/uploads'])
+        DataLocalityTracker.record(self.plg_inst, ['home/foo/uploads'])
+        self.assertEqual(self.plg_inst.remote_data_locations.count(), 1)
+
+        DataLocalityTracker.clear(self.plg_inst)
+
+        self.assertEqual(DataLocalityTracker.get_resident_paths(
+            self.compute_resource, ['home/foo/uploads']), {})
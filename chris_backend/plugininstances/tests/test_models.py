@@ -157,6 +157,29 @@ class PluginInstanceModelTests(ModelTests):
         root_instance = plg_inst.get_root_instance()
         self.assertEqual(root_instance, plg_inst_root)
 
+    def test_get_ancestor_instances(self):
+        """
+        Test whether custom get_ancestor_instances method returns the ancestors of a
+        plugin instance from its lineage ordered from the root down.
+        """
+        user = User.objects.get(username=self.username)
+        plugin = Plugin.objects.get(meta__name=self.plugin_fs_name)
+        plg_inst_root = PluginInstance.objects.create(
+            plugin=plugin, owner=user, compute_resource=plugin.compute_resources.all()[0])
+        plugin = Plugin.objects.get(meta__name=self.plugin_ds_name)
+        plg_inst1 = PluginInstance.objects.create(
+            plugin=plugin, owner=user, previous=plg_inst_root,
+            compute_resource=plugin.compute_resources.all()[0])
+        plg_inst2 = PluginInstance.objects.create(
+            plugin=plugin, owner=user, previous=plg_inst1,
+            compute_resource=plugin.compute_resources.all()[0])
+
+        self.assertEqual(plg_inst2.lineage,
+                         f'/{plg_inst_root.id}/{plg_inst1.id}/{plg_inst2.id}/')
+        self.assertEqual(list(plg_inst2.get_ancestor_instances()),
+                         [plg_inst_root, plg_inst1])
+        self.assertEqual(list(plg_inst_root.get_ancestor_instances()), [])
+
     def test_get_descendant_instances(self):
         """
         Test whether custom get_descendant_instances method returns all the plugin
@@ -185,6 +208,25 @@ class PluginInstanceModelTests(ModelTests):
         self.assertEqual(decend_instances[1], plg_inst1)
         self.assertEqual(decend_instances[2], plg_inst2)
 
+    def test_get_descendant_instances_raises_for_empty_lineage(self):
+        """
+        Test whether custom get_descendant_instances and get_lineage_ids methods raise
+        ValueError instead of matching every plugin instance when the lineage is empty.
+        """
+        user = User.objects.get(username=self.username)
+        plugin = Plugin.objects.get(meta__name=self.plugin_fs_name)
+        plg_inst = PluginInstance.objects.create(
+            plugin=plugin, owner=user, compute_resource=plugin.compute_resources.all()[0])
+        PluginInstance.objects.filter(id=plg_inst.id).update(lineage='')
+        plg_inst.refresh_from_db()
+
+        with self.assertRaises(ValueError):
+            plg_inst.get_descendant_instances()
+        with self.assertRaises(ValueError):
+            plg_inst.get_lineage_ids()
+        with self.assertRaises(ValueError):
+            PluginInstance(plugin=plugin, owner=user).get_descendant_instances()
+
     def test_get_parameter_instances(self):
         """
         Test whether custom get_parameter_instances method returns all the parameter
@@ -210,7 +252,10 @@ class PluginInstanceModelTests(ModelTests):
         IntParameter.objects.create(plugin_inst=plg_inst, plugin_param=int_plg_param,
                                     value=1)
 
-        param_instances = plg_inst.get_parameter_instances()
+        with self.assertNumQueries(6):
+            param_instances = plg_inst.get_parameter_instances()
+            self.assertEqual({p.plugin_param.name for p in param_instances},
+                             {'prefix', 'dummyint'})
         self.assertEqual(len(param_instances), 2)
 
     def test_get_output_path(self):
@@ -247,6 +292,55 @@ class PluginInstanceModelTests(ModelTests):
                                                             pl_inst_ds.id))
         self.assertEqual(pl_inst_ds.get_output_path(), ds_output_path)
 
+    def test_add_timeline_events(self):
+        """
+        Test whether custom add_timeline_events method merges the passed events into
+        the timeline in the DB without losing events added by other tasks.
+        """
+        user = User.objects.get(username=self.username)
+        plugin = Plugin.objects.get(meta__name=self.plugin_fs_name)
+        pl_inst = PluginInstance.objects.create(
+            plugin=plugin,
+            owner=user,
+            compute_resource=plugin.compute_resources.all()[0])
+        other = PluginInstance.objects.get(id=pl_inst.id)  # another task's copy
+
+        pl_inst.add_timeline_events('copying')
+        other.add_timeline_events('copied', 'scheduled')
+
+        pl_inst.refresh_from_db()
+        self.assertEqual(set(pl_inst.timeline),
+                         {'created', 'copying', 'copied', 'scheduled'})
+
+    def test_save_records_status_transitions_in_timeline(self):
+        """
+        Test whether overriden save method records the plugin instance's status
+        transitions in its timeline.
+        """
+        user = User.objects.get(username=self.username)
+        plugin = Plugin.objects.get(meta__name=self.plugin_fs_name)
+        pl_inst = PluginInstance.objects.create(
+            plugin=plugin,
+            owner=user,
+            compute_resource=plugin.compute_resources.all()[0])
+        self.assertEqual(set(pl_inst.timeline), {'created'})
+
+        pl_inst = PluginInstance.objects.select_related(
+            'feed', 'plugin', 'output_folder').get(id=pl_inst.id)
+        pl_inst.status = 'started'
+        with self.assertNumQueries(1):  # timeline merged in the same UPDATE
+            pl_inst.save(update_fields=['status'])
+        self.assertEqual(set(pl_inst.timeline), {'created', 'started'})
+        pl_inst.title = 'test'
+        pl_inst.save(update_fields=['title'])  # not a status transition
+        PluginInstance.objects.filter(id=pl_inst.id).update(
+            status='cancelled',
+            timeline=PluginInstance.merge_timeline_events('cancelled'))
+
+        pl_inst.refresh_from_db()
+        self.assertEqual(set(pl_inst.timeline), {'created', 'started', 'cancelled'})
+        self.assertLess(pl_inst.timeline['created'], pl_inst.timeline['started'])
+
     def test_auto_delete_output_folder_with_plugin_instance(self):
         """
         Test whether deleting a plugin instance will automatically delete its output
@@ -0,0 +1,87 @@
+
+import logging
+
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.conf import settings
+
+from plugins.models import PluginMeta, Plugin, ComputeResource
+from plugininstances.models import PluginInstance
+from plugininstances.services.placement import (ComputeResourcePlacementPolicy,
+                                                LeastActivePlacementStrategy)
+
+
+COMPUTE_RESOURCE_URL = settings.COMPUTE_RESOURCE_URL
+
+
+class ComputeResourcePlacementPolicyTests(TestCase):
+
+    def setUp(self):
+        # avoid cluttered console output (for instance logging all the http requests)
+        logging.disable(logging.WARNING)
+
+        self.compute_resources = [ComputeResource.objects.create(
+            name=name, compute_url=COMPUTE_RESOURCE_URL, compute_user='pfcon',
+            compute_password='pfcon1234') for name in ('host', 'moc', 'hpc')]
+
+        (pl_meta, tf) = PluginMeta.objects.get_or_create(name='pacspull', type='fs')
+        (self.plugin, tf) = Plugin.objects.get_or_create(meta=pl_meta, version='0.1')
+        self.plugin.compute_resources.set(self.compute_resources)
+
+        self.user = User.objects.create_user(username='foo', password='foo-pass')
+
+    def tearDown(self):
+        # re-enable logging
+        logging.disable(logging.NOTSET)
+
+    def _create_plugin_instances(self, compute_resource, n, status='started'):
+        for _ in range(n):
+            PluginInstance.objects.create(plugin=self.plugin, owner=self.user,
+                                          status=status,
+                                          compute_resource=compute_resource)
+
+    def test_select_first(self):
+        (host, moc, hpc) = self.compute_resources
+        self._create_plugin_instances(host, 2)
+        policy = ComputeResourcePlacementPolicy('first')
+        self.assertEqual(policy.select(self.plugin.compute_resources), host)
+
+    def test_select_least_active_spreads_a_batch(self):
+        (host, moc, hpc) = self.compute_resources
+        self._create_plugin_instances(host, 2)
+        self._create_plugin_instances(moc, 1, status='waiting')
+        self._create_plugin_instances(hpc, 3, status='finishedSuccessfully')
+        policy = ComputeResourcePlacementPolicy('least_active')
+        selected = [policy.select(self.plugin.compute_resources) for _ in range(4)]
+        self.assertEqual(selected, [hpc, moc, hpc, host])
+
+    def test_select_weighted_capacity(self):
+        (host, moc, hpc) = self.compute_resources
+        host.max_active_jobs = 10
+        host.save()
+        moc.max_active_jobs = 4
+        moc.save()
+        hpc.max_active_jobs = 0
+        hpc.save()
+        self._create_plugin_instances(host, 8)
+        policy = ComputeResourcePlacementPolicy('weighted_capacity')
+        self.assertEqual(policy.select(self.plugin.compute_resources), moc)
+
+    def test_select_data_locality(self):
+        (host, moc, hpc) = self.compute_resources
+        self._create_plugin_instances(moc, 2)
+        policy = ComputeResourcePlacementPolicy('data_locality')
+        self.assertEqual(policy.select(self.plugin.compute_resources, moc.id), moc)
+        # falls back to the least active compute resource
+        self.assertEqual(policy.select(self.plugin.compute_resources), host)
+
+    def test_select_with_dotted_strategy_path(self):
+        path = f'{LeastActivePlacementStrategy.__module__}.LeastActivePlacementStrategy'
+        with override_settings(COMPUTE_RESOURCE_PLACEMENT_STRATEGY=path):
+            policy = ComputeResourcePlacementPolicy()
+        self.assertIsInstance(policy.strategy, LeastActivePlacementStrategy)
+
+    def test_select_returns_none_without_compute_resources(self):
+        self.plugin.compute_resources.clear()
+        policy = ComputeResourcePlacementPolicy()
+        self.assertIsNone(policy.select(self.plugin.compute_resources))
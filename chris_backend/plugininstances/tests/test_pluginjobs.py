@@ -6,6 +6,7 @@ import time
 import uuid
 from unittest import mock
 
+from django.db import IntegrityError
 from django.test import TestCase, tag
 from django.contrib.auth.models import User
 from django.conf import settings
@@ -19,6 +20,7 @@ from plugins.models import PluginParameter
 from plugininstances.models import PluginInstance, PathParameter, ComputeResource
 from plugininstances.services import pluginjobs, copyjobs
 from plugininstances.services.uploadjobs import PluginInstanceUploadJob
+from userfiles.models import UserFile
 
 
 COMPUTE_RESOURCE_URL = settings.COMPUTE_RESOURCE_URL
@@ -267,10 +269,6 @@ class PluginInstanceAppJobTests(TestCase):
                                             f.read(), content_type='text/plain')
 
         plg_inst_app_job = pluginjobs.PluginInstanceAppJob(pl_inst)
-        plg_inst_app_job.plugin_inst_output_files = {
-            outputdir + '/, ,/SAG,T1,MPRAGE/tes,t1.txt',
-            outputdir + '/, ,/SAG,T1,MPRAGE/test2.txt'}
-
         plg_inst_app_job._register_output_files()
 
         self.assertEqual(pl_inst.get_output_path(), outputdir)
@@ -285,11 +283,100 @@ class PluginInstanceAppJobTests(TestCase):
         self.assertIn(outputdir + '/SAGT1MPRAGE/test1.txt', fnames)
         self.assertIn(outputdir + '/SAGT1MPRAGE/test2.txt', fnames)
 
-        self.assertEqual(len(plg_inst_app_job.plugin_inst_output_files), 2)
-        self.assertIn(outputdir + '/SAGT1MPRAGE/test1.txt',
-                      plg_inst_app_job.plugin_inst_output_files)
-        self.assertIn(outputdir + '/SAGT1MPRAGE/test2.txt',
-                      plg_inst_app_job.plugin_inst_output_files)
+        pl_inst.refresh_from_db()
+        self.assertEqual(pl_inst.summary['registration'],
+                         {'status': True, 'nfiles': 2})
+
+        # delete files from storage
+        self.storage_manager.delete_path(outputdir)
+
+    @tag('integration')
+    def test_integration_plugin_job_can_register_output_files_in_batches(self):
+        """
+        Test whether the plugin job can register output files in bounded batches
+        while saving the registration progress in the plugin instance's summary.
+        """
+        # create a plugin's instance
+        user = User.objects.get(username=self.username)
+        plugin = Plugin.objects.get(meta__name=self.plugin_fs_name)
+
+        pl_inst = PluginInstance.objects.create(
+            plugin=plugin, owner=user, status='registeringFiles',
+            compute_resource=plugin.compute_resources.all()[0])
+
+        outputdir = pl_inst.get_output_path()
+
+        # upload three files to the plugin instance's output path
+        obj_paths = {outputdir + '/test1.txt', outputdir + '/data/test2.txt',
+                     outputdir + '/data/test3.txt'}
+        for obj_path in obj_paths:
+            self.storage_manager.upload_obj(obj_path, 'Test file',
+                                            content_type='text/plain')
+
+        plg_inst_app_job = pluginjobs.PluginInstanceAppJob(pl_inst)
+
+        with mock.patch.object(pluginjobs.PluginInstanceAppJob,
+                               'OUTPUT_FILES_BATCH_SIZE', 2):
+            with mock.patch.object(pluginjobs.UserFile.objects, 'bulk_create',
+                                   wraps=pluginjobs.UserFile.objects.bulk_create
+                                   ) as bulk_create_mock:
+                plg_inst_app_job._register_output_files()
+                self.assertEqual(bulk_create_mock.call_count, 2)
+
+        fnames = {f.fname.name for f in
+                  UserFile.objects.filter(fname__startswith=outputdir + '/')}
+        self.assertEqual(fnames, obj_paths)
+
+        pl_inst.refresh_from_db()
+        self.assertEqual(pl_inst.summary['registration'],
+                         {'status': True, 'nfiles': 3})
+
+        # delete files from storage
+        self.storage_manager.delete_path(outputdir)
+
+    @tag('integration')
+    def test_integration_plugin_job_can_resume_registering_output_files(self):
+        """
+        Test whether registering the output files again after a takeover of the lock
+        skips the files that were already registered.
+        """
+        # create a plugin's instance
+        user = User.objects.get(username=self.username)
+        plugin = Plugin.objects.get(meta__name=self.plugin_fs_name)
+
+        pl_inst = PluginInstance.objects.create(
+            plugin=plugin, owner=user, status='registeringFiles',
+            compute_resource=plugin.compute_resources.all()[0])
+
+        outputdir = pl_inst.get_output_path()
+
+        # the first file was registered before the registering worker crashed
+        obj_paths = {outputdir + '/test1.txt', outputdir + '/data/test2.txt'}
+        self.storage_manager.upload_obj(outputdir + '/test1.txt', 'Test file',
+                                        content_type='text/plain')
+        plg_inst_app_job = pluginjobs.PluginInstanceAppJob(pl_inst)
+        plg_inst_app_job._register_output_files()
+
+        self.storage_manager.upload_obj(outputdir + '/data/test2.txt', 'Test file',
+                                        content_type='text/plain')
+
+        # without a takeover of the lock the already registered file is an error
+        plg_inst_app_job = pluginjobs.PluginInstanceAppJob(pl_inst)
+        with self.assertRaises(IntegrityError):
+            plg_inst_app_job._register_output_files()
+
+        plg_inst_app_job = pluginjobs.PluginInstanceAppJob(pl_inst)
+        size = plg_inst_app_job.c_plugin_inst.size
+        plg_inst_app_job._register_output_files(mock.Mock(taken_over=True))
+
+        fnames = [f.fname.name for f in
+                  UserFile.objects.filter(fname__startswith=outputdir + '/')]
+        self.assertEqual(sorted(fnames), sorted(obj_paths))
+        # only the newly registered file is added to the size
+        self.assertEqual(plg_inst_app_job.c_plugin_inst.size - size, len('Test file'))
+        pl_inst.refresh_from_db()
+        self.assertEqual(pl_inst.summary['registration'],
+                         {'status': True, 'nfiles': 2})
 
         # delete files from storage
         self.storage_manager.delete_path(outputdir)
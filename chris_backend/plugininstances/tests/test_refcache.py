@@ -0,0 +1,75 @@
+
+import logging
+from unittest import mock
+
+from django.test import TestCase
+from django.contrib.auth.models import User
+from django.conf import settings
+
+from core.models import ChrisInstance
+from plugins.models import PluginMeta, Plugin, PluginParameter, ComputeResource
+from plugininstances.models import PluginInstance
+from plugininstances.services import refcache
+from plugininstances.services.pluginjobs import PluginInstanceAppJob
+
+
+COMPUTE_RESOURCE_URL = settings.COMPUTE_RESOURCE_URL
+
+
+class ReferenceDataCacheTests(TestCase):
+
+    def setUp(self):
+        # avoid cluttered console output (for instance logging all the http requests)
+        logging.disable(logging.WARNING)
+        refcache.clear()
+
+        (self.compute_resource, tf) = ComputeResource.objects.get_or_create(
+            name='host', compute_url=COMPUTE_RESOURCE_URL, compute_user='pfcon',
+            compute_password='pfcon1234')
+
+        (pl_meta, tf) = PluginMeta.objects.get_or_create(name='pacspull', type='fs')
+        (self.plugin, tf) = Plugin.objects.get_or_create(meta=pl_meta, version='0.1')
+        self.plugin.compute_resources.set([self.compute_resource])
+
+        user = User.objects.create_user(username='foo', password='foo-pass')
+        self.plg_inst = PluginInstance.objects.create(
+            plugin=self.plugin, owner=user, compute_resource=self.compute_resource)
+
+    def tearDown(self):
+        refcache.clear()
+        # re-enable logging
+        logging.disable(logging.NOTSET)
+
+    def test_entries_are_cached_and_invalidated_on_save(self):
+        refcache.get_compute_resource(self.compute_resource.id)
+        with self.assertNumQueries(0):
+            cr = refcache.get_compute_resource(self.compute_resource.id)
+        self.assertEqual(cr.max_job_exec_seconds,
+                         self.compute_resource.max_job_exec_seconds)
+
+        self.compute_resource.max_job_exec_seconds = 120
+        self.compute_resource.save()
+        cr = refcache.get_compute_resource(self.compute_resource.id)
+        self.assertEqual(cr.max_job_exec_seconds, 120)
+
+        self.assertEqual(refcache.get_plugin_parameters(self.plugin.id), [])
+        PluginParameter.objects.create(plugin=self.plugin, name='dir', type='string',
+                                       flag='--dir')
+        self.assertEqual(len(refcache.get_plugin_parameters(self.plugin.id)), 1)
+
+        chris_inst = ChrisInstance.load()
+        chris_inst.job_id_prefix = 'test-jid-'
+        chris_inst.save(update_fields=['job_id_prefix'])
+        self.assertEqual(refcache.get_chris_instance().job_id_prefix, 'test-jid-')
+
+    @mock.patch('plugininstances.services.abstractjobs.get_compute_resource_auth_token',
+                return_value='token')
+    def test_job_construction_queries_are_saved_when_warm(self, mock_token):
+        PluginInstanceAppJob(PluginInstance.objects.get(id=self.plg_inst.id))
+        plg_inst = PluginInstance.objects.get(id=self.plg_inst.id)
+
+        # no queries for the ChRIS instance, compute resource and plugin with its meta
+        with self.assertNumQueries(0):
+            job = PluginInstanceAppJob(plg_inst)
+            self.assertEqual(job.c_plugin_inst.plugin.meta.type, 'fs')
+            self.assertEqual(job.c_plugin_inst.compute_resource, self.compute_resource)
@@ -367,6 +367,34 @@ class PathParameterSerializerTests(SerializerTests):
         self.assertEqual(returned_value, "home/{}/uploads,home/{}/feeds/feed_{}".format(
             self.username, self.other_username, pl_inst.feed.id))
 
+    def test_validate_value_reports_all_offending_paths_with_batched_queries(self):
+        """
+        Test whether overriden validate_value method resolves and checks all the
+        paths with a fixed number of queries and reports an error for each offending
+        path.
+        """
+        user = User.objects.get(username=self.username)
+        user1 = User.objects.create_user(username=self.other_username,
+                                         password=self.other_password)
+        paths = []
+        for i in range(5):
+            (folder, tf) = ChrisFolder.objects.get_or_create(
+                path=f'home/{self.other_username}/uploads/{i}', owner=user1)
+            if i % 2:
+                folder.grant_user_permission(user, 'r')
+            paths.append(folder.path)
+        paths.append(f'home/{self.other_username}/uploads/missing')
+
+        path_parm_serializer = PathParameterSerializer(user=user)
+        with self.assertNumQueries(5):
+            with self.assertRaises(serializers.ValidationError) as e:
+                path_parm_serializer.validate_value(','.join(paths))
+        self.assertEqual(e.exception.detail, [
+            f"User does not have permission to access path '{paths[0]}'.",
+            f"User does not have permission to access path '{paths[2]}'.",
+            f"User does not have permission to access path '{paths[4]}'.",
+            f"This field may not reference an invalid path '{paths[5]}'."])
+
 
 class UnextpathParameterSerializerTests(SerializerTests):
 
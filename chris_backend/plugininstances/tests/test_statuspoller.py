@@ -0,0 +1,183 @@
+
+import logging
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.conf import settings
+from django.utils import timezone
+
+from pfconclient.exceptions import (PfconRequestException,
+                                    PfconRequestInvalidTokenException)
+
+from plugins.models import PluginMeta, Plugin, ComputeResource
+from plugininstances.models import PluginInstance
+from plugininstances.services import statuspoller, authtokens
+from plugininstances.services.abstractjobs import PluginInstanceJob
+
+
+COMPUTE_RESOURCE_URL = settings.COMPUTE_RESOURCE_URL
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ComputeResourceStatusPollerTests(TestCase):
+
+    def setUp(self):
+        # avoid cluttered console output (for instance logging all the http requests)
+        logging.disable(logging.WARNING)
+        logging.getLogger('plugininstances.services.statuspoller').setLevel(
+            logging.CRITICAL)
+
+        self.username = 'foo'
+        self.password = 'foo-pass'
+
+        (self.compute_resource, tf) = ComputeResource.objects.get_or_create(
+            name='host', compute_url=COMPUTE_RESOURCE_URL, compute_user='pfcon',
+            compute_password='pfcon1234')
+
+        (pl_meta, tf) = PluginMeta.objects.get_or_create(name='pacspull', type='fs')
+        (plugin, tf) = Plugin.objects.get_or_create(meta=pl_meta, version='0.1')
+        plugin.compute_resources.set([self.compute_resource])
+        plugin.save()
+
+        user = User.objects.create_user(username=self.username, password=self.password)
+
+        self.plg_inst1 = PluginInstance.objects.create(
+            plugin=plugin, owner=user, status='started',
+            compute_resource=self.compute_resource)
+        self.plg_inst2 = PluginInstance.objects.create(
+            plugin=plugin, owner=user, status='started',
+            compute_resource=self.compute_resource)
+
+        self.poller = statuspoller.ComputeResourceStatusPoller(self.compute_resource)
+
+    def tearDown(self):
+        authtokens._local_tokens.clear()
+        # re-enable logging
+        logging.disable(logging.NOTSET)
+        logging.getLogger('plugininstances.services.statuspoller').setLevel(
+            logging.NOTSET)
+
+    def _get_job_status(self, statuses):
+        async def get_job_status(client, job_type, job_id, timeout=100):
+            status = statuses[int(job_id.replace(self.poller.str_job_id_prefix, ''))]
+            if isinstance(status, Exception):
+                raise status
+            return {'compute': {'status': status, 'logs': f'logs {status}'}}
+        return get_job_status
+
+    def test_poll_only_returns_instances_whose_status_must_be_handled(self):
+        statuses = {self.plg_inst1.id: 'finishedSuccessfully',
+                    self.plg_inst2.id: 'started'}
+        with mock.patch.object(statuspoller.AsyncPfconClient, 'get_job_status',
+                               self._get_job_status(statuses)):
+            to_handle = self.poller.poll(PluginInstance.objects.all())
+
+        self.assertEqual(to_handle, [(self.plg_inst1, 'PluginInstanceAppJob')])
+
+        # the running instance's summary is updated in the DB
+        self.plg_inst2.refresh_from_db()
+        self.assertEqual(self.plg_inst2.summary['compute']['return']['job_status'],
+                         'started')
+        self.assertEqual(self.plg_inst2.summary['compute']['return']['job_logs'],
+                         'logs started')
+
+    def test_poll_only_persists_changed_fields(self):
+        statuses = {self.plg_inst1.id: 'started', self.plg_inst2.id: 'started'}
+        with mock.patch.object(statuspoller.AsyncPfconClient, 'get_job_status',
+                               self._get_job_status(statuses)):
+            self.poller.poll(PluginInstance.objects.all())
+        self.plg_inst2.refresh_from_db()
+        raw = self.plg_inst2.raw
+        self.assertTrue(raw)  # raw response is kept on the status transition
+
+        # same status and logs: nothing is written
+        d_resp = {'compute': {'status': 'started', 'logs': 'logs started'}}
+        fields = PluginInstanceJob.save_job_status_summary(self.plg_inst2, d_resp,
+                                                           status='started')
+        self.assertEqual(fields, [])
+
+        # new logs: only the summary is written
+        d_resp = {'compute': {'status': 'started', 'logs': 'more logs'}}
+        fields = PluginInstanceJob.save_job_status_summary(self.plg_inst2, d_resp,
+                                                           status='started')
+        self.assertEqual(fields, ['summary'])
+        self.plg_inst2.refresh_from_db()
+        self.assertEqual(self.plg_inst2.summary['compute']['return']['job_logs'],
+                         'more logs')
+        self.assertEqual(self.plg_inst2.raw, raw)
+
+    def test_poll_schedules_next_check_of_running_instances(self):
+        PluginInstance.objects.filter(id=self.plg_inst2.id).update(
+            start_date=timezone.now() - timedelta(seconds=600))
+        statuses = {self.plg_inst1.id: 'started', self.plg_inst2.id: 'started'}
+        with mock.patch.object(statuspoller.AsyncPfconClient, 'get_job_status',
+                               self._get_job_status(statuses)):
+            now = timezone.now()
+            self.poller.poll(PluginInstance.objects.all())
+
+        self.plg_inst1.refresh_from_db()
+        self.plg_inst2.refresh_from_db()
+        interval1 = (self.plg_inst1.next_check_date - now).total_seconds()
+        interval2 = (self.plg_inst2.next_check_date - now).total_seconds()
+        # checks slow down as the job runs for longer
+        self.assertAlmostEqual(interval1, self.poller.MIN_CHECK_INTERVAL, delta=1)
+        self.assertAlmostEqual(interval2, 60, delta=1)
+
+    def test_get_next_check_interval_uses_expected_runtime(self):
+        now = timezone.now()
+        self.plg_inst1.start_date = now - timedelta(seconds=100)
+        interval = self.poller._get_next_check_interval(self.plg_inst1, now, 500)
+        self.assertEqual(interval, 200)
+
+        self.compute_resource.max_job_exec_seconds = 150
+        interval = self.poller._get_next_check_interval(self.plg_inst1, now, 500)
+        self.assertEqual(interval, 51)
+
+    def test_poll_returns_timed_out_instances_without_fetching_their_status(self):
+        self.compute_resource.max_job_exec_seconds = 60
+        self.compute_resource.save()
+        PluginInstance.objects.filter(id=self.plg_inst1.id).update(
+            start_date=timezone.now() - timedelta(seconds=120))
+
+        statuses = {self.plg_inst2.id: 'started'}
+        with mock.patch.object(statuspoller.AsyncPfconClient, 'get_job_status',
+                               autospec=True,
+                               side_effect=self._get_job_status(statuses)
+                               ) as get_job_status_mock:
+            to_handle = self.poller.poll(PluginInstance.objects.all())
+            self.assertEqual(get_job_status_mock.call_count, 1)
+
+        self.assertEqual(to_handle, [(self.plg_inst1, 'PluginInstanceAppJob')])
+
+    def test_poll_skips_instances_whose_status_request_failed(self):
+        statuses = {self.plg_inst1.id: PfconRequestException('error'),
+                    self.plg_inst2.id: 'finishedWithError'}
+        with mock.patch.object(statuspoller.AsyncPfconClient, 'get_job_status',
+                               self._get_job_status(statuses)):
+            to_handle = self.poller.poll(PluginInstance.objects.all())
+
+        self.assertEqual(to_handle, [(self.plg_inst2, 'PluginInstanceAppJob')])
+
+    def test_poll_refreshes_expired_auth_token_once(self):
+        statuses = {self.plg_inst1.id: 'started', self.plg_inst2.id: 'started'}
+        get_job_status = self._get_job_status(statuses)
+
+        async def get_job_status_with_expired_token(client, job_type, job_id,
+                                                    timeout=100):
+            if client.auth_token != 'new-token':
+                raise PfconRequestInvalidTokenException('expired', code=401)
+            return await get_job_status(client, job_type, job_id, timeout)
+
+        with mock.patch.object(statuspoller.AsyncPfconClient, 'get_job_status',
+                               get_job_status_with_expired_token):
+            with mock.patch.object(statuspoller, 'refresh_compute_resource_auth_token',
+                                   return_value='new-token') as refresh_mock:
+                to_handle = self.poller.poll(PluginInstance.objects.all())
+
+        self.assertEqual(to_handle, [])
+        # the token is refreshed through the cluster-wide single-flight refresh
+        refresh_mock.assert_called_once_with(
+            self.compute_resource, self.compute_resource.compute_auth_token)
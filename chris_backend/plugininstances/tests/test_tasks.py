@@ -12,6 +12,7 @@ from django.utils import timezone
 from celery.contrib.testing.worker import start_worker
 from core.celery import app as celery_app
 from core.celery import task_routes
+from core.leaselock import get_redis_client
 
 from plugins.models import PluginMeta, Plugin, ComputeResource
 from plugininstances.models import PluginInstance, PluginInstanceLock
@@ -55,6 +56,11 @@ class TasksTests(TestCase):
         plugin_ds.save()
 
     def tearDown(self):
+        # clear the de-duplication keys of the tasks enqueued by the tests
+        client = get_redis_client()
+        for key in client.scan_iter('task_dedupe:plugininstances.tasks.*'):
+            client.delete(key)
+
         # re-enable logging
         logging.disable(logging.NOTSET)
 
@@ -90,6 +96,48 @@ class PluginInstanceTasksTests(TasksTests):
             tasks.check_plugin_instance_job_exec_status(self.plg_inst.id, 'PluginInstanceAppJob')
             check_exec_status_mock.assert_called_with()
 
+    def test_task_handle_plugin_instance_job_status_callback(self):
+        with mock.patch.object(tasks.PluginInstanceAppJob,
+                               'check_exec_status',
+                               return_value=None) as check_exec_status_mock:
+            tasks.handle_plugin_instance_job_status_callback(self.plg_inst.id)
+            check_exec_status_mock.assert_called_with()
+
+    def test_task_handle_plugin_instance_job_status_callback_skips_inactive_instance(self):
+        self.plg_inst.status = 'finishedSuccessfully'
+        self.plg_inst.save()
+        with mock.patch.object(tasks.PluginInstanceAppJob,
+                               'check_exec_status',
+                               return_value=None) as check_exec_status_mock:
+            tasks.handle_plugin_instance_job_status_callback(self.plg_inst.id)
+            check_exec_status_mock.assert_not_called()
+
+    def test_task_delete_compute_resource_containers_from_remote(self):
+        self.plg_inst.remote_cleanup_status = 'deletingContainers'
+        self.plg_inst.save()
+        with mock.patch.object(tasks.ComputeResourceContainerCleaner,
+                               'delete_all_remote_containers',
+                               return_value={self.plg_inst.id: True}) as delete_mock:
+            tasks.delete_compute_resource_containers_from_remote(
+                self.compute_resource.id)
+
+            self.assertEqual(delete_mock.call_args[0][0], [self.plg_inst])
+            self.plg_inst.refresh_from_db()
+            self.assertEqual(self.plg_inst.remote_cleanup_status, 'complete')
+
+    def test_task_delete_compute_resource_containers_from_remote_retries(self):
+        self.plg_inst.remote_cleanup_status = 'deletingContainers'
+        self.plg_inst.save()
+        with mock.patch.object(tasks.ComputeResourceContainerCleaner,
+                               'delete_all_remote_containers',
+                               return_value={self.plg_inst.id: False}):
+            tasks.delete_compute_resource_containers_from_remote(
+                self.compute_resource.id)
+
+            self.plg_inst.refresh_from_db()
+            self.assertEqual(self.plg_inst.remote_cleanup_status, 'deletingContainers')
+            self.assertEqual(self.plg_inst.remote_cleanup_retry_count, 1)
+
     def test_task_cancel_plugin_instance(self):
         with mock.patch.object(tasks.PluginInstanceAppJob,
                                'cancel_exec',
@@ -97,15 +145,334 @@ class PluginInstanceTasksTests(TasksTests):
             tasks.cancel_plugin_instance_job(self.plg_inst.id, 'PluginInstanceAppJob')
             cancel_mock.assert_called_with()
 
+    def test_task_resume_plugin_instances_with_expired_lock(self):
+        self.plg_inst.status = 'registeringFiles'
+        self.plg_inst.save(update_fields=['status'])
+        plg_inst_lock = PluginInstanceLock.objects.create(
+            plugin_inst=self.plg_inst,
+            expiration_date=timezone.now() + timedelta(seconds=60))
+
+        with mock.patch.object(tasks.resume_plugin_instance_files_registration,
+                               'delay', return_value=None) as delay_mock:
+            tasks.resume_plugin_instances_with_expired_lock()
+            delay_mock.assert_not_called()  # the lease hasn't expired yet
+
+            plg_inst_lock.expiration_date = timezone.now() - timedelta(seconds=1)
+            plg_inst_lock.save(update_fields=['expiration_date'])
+            tasks.resume_plugin_instances_with_expired_lock()
+            delay_mock.assert_called_once_with(self.plg_inst.id)
+
+    def test_task_resume_plugin_instance_files_registration(self):
+        with mock.patch.object(tasks.PluginInstanceAppJob,
+                               'resume_output_files_registration',
+                               return_value=None) as resume_mock:
+            tasks.resume_plugin_instance_files_registration(self.plg_inst.id)
+            resume_mock.assert_called_with()
+
     def test_task_check_running_plugin_instances_exec_status(self):
-        with mock.patch.object(tasks.check_plugin_instance_job_exec_status, 'delay',
+        with mock.patch.object(tasks.check_compute_resource_jobs_exec_status, 'delay',
                                return_value=None) as delay_mock:
             tasks.check_running_plugin_instances_exec_status()
 
-            # check that the check_plugin_instance_job_exec_status task was called with appropriate args
-            delay_mock.assert_called_with(self.plg_inst.id, 'PluginInstanceAppJob')
+            # check that the check_compute_resource_jobs_exec_status task was called with appropriate args
+            delay_mock.assert_called_once_with(self.compute_resource.id)
             self.assertEqual(self.plg_inst.status, 'started')
 
+            # check that the task is not enqueued again while the previous one is
+            # still queued or running
+            tasks.check_running_plugin_instances_exec_status()
+            delay_mock.assert_called_once()
+
+            tasks.clear_enqueue_once_key_on_task_end(
+                sender=tasks.check_compute_resource_jobs_exec_status,
+                args=[self.compute_resource.id])
+            tasks.check_running_plugin_instances_exec_status()
+            self.assertEqual(delay_mock.call_count, 2)
+
+    def test_task_check_running_plugin_instances_exec_status_skips_not_due(self):
+        self.plg_inst.next_check_date = timezone.now() + timedelta(seconds=60)
+        self.plg_inst.save()
+        with mock.patch.object(tasks.check_compute_resource_jobs_exec_status, 'delay',
+                               return_value=None) as delay_mock:
+            tasks.check_running_plugin_instances_exec_status()
+            delay_mock.assert_not_called()
+
+    def test_task_check_compute_resource_jobs_exec_status(self):
+        with mock.patch.object(tasks.ComputeResourceStatusPoller, 'poll',
+                               return_value=[(self.plg_inst, 'PluginInstanceAppJob')]
+                               ) as poll_mock:
+            with mock.patch.object(tasks.check_plugin_instance_job_exec_status,
+                                   'delay', return_value=None) as delay_mock:
+                tasks.check_compute_resource_jobs_exec_status(self.compute_resource.id)
+
+                self.assertEqual(list(poll_mock.call_args[0][0]), [self.plg_inst])
+                # check that only the returned instances are handled
+                delay_mock.assert_called_once_with(self.plg_inst.id,
+                                                   'PluginInstanceAppJob')
+
+
+    def test_task_schedule_plugin_instance_dependents(self):
+        self.plg_inst.status = 'finishedSuccessfully'
+        self.plg_inst.save()
+        plugin = Plugin.objects.get(meta__name="mri_convert")
+        user = User.objects.get(username=self.username)
+        child = PluginInstance.objects.create(plugin=plugin, owner=user,
+                                              previous=self.plg_inst,
+                                              compute_resource=self.compute_resource)
+        child.status = 'waiting'
+        child.save()
+        with mock.patch.object(tasks.run_plugin_instance_job, 'delay',
+                               return_value=None) as delay_mock:
+            tasks.schedule_plugin_instance_dependents(self.plg_inst.id)
+
+            child.refresh_from_db()
+            self.assertEqual(child.status, 'copying')
+            delay_mock.assert_called_once_with(child.id, 'PluginInstanceCopyJob')
+
+            # a concurrent scheduling task must not schedule the child again
+            tasks.schedule_plugin_instance_dependents(self.plg_inst.id)
+            tasks.schedule_waiting_plugin_instances()
+            delay_mock.assert_called_once()
+
+    def test_task_schedule_waiting_plugin_instances(self):
+        self.plg_inst.status = 'finishedSuccessfully'
+        self.plg_inst.save()
+        plugin = Plugin.objects.get(meta__name="mri_convert")
+        user = User.objects.get(username=self.username)
+        child = PluginInstance.objects.create(plugin=plugin, owner=user,
+                                              previous=self.plg_inst,
+                                              compute_resource=self.compute_resource)
+        child.status = 'waiting'
+        child.save()
+        with mock.patch.object(tasks.run_plugin_instance_job, 'delay',
+                               return_value=None) as delay_mock:
+            tasks.schedule_waiting_plugin_instances()
+
+            child.refresh_from_db()
+            self.assertEqual(child.status, 'copying')
+            delay_mock.assert_called_once_with(child.id, 'PluginInstanceCopyJob')
+
+    def test_task_schedule_new_plugin_instances(self):
+        self.plg_inst.status = 'finishedSuccessfully'
+        self.plg_inst.save()
+        plugin = Plugin.objects.get(meta__name="mri_convert")
+        user = User.objects.get(username=self.username)
+        children = []
+        for i in range(2):
+            child = PluginInstance.objects.create(plugin=plugin, owner=user,
+                                                  previous=self.plg_inst,
+                                                  compute_resource=self.compute_resource)
+            child.status = 'waiting'
+            child.save()
+            children.append(child)
+        with mock.patch.object(tasks.run_plugin_instance_job, 'delay',
+                               return_value=None) as delay_mock:
+            tasks.schedule_new_plugin_instances([children[0].id])
+
+            for child, status in zip(children, ('copying', 'waiting')):
+                child.refresh_from_db()
+                self.assertEqual(child.status, status)
+            delay_mock.assert_called_once_with(children[0].id, 'PluginInstanceCopyJob')
+
+    def test_schedule_plugin_instances_rolls_back_if_admission_lock_lost(self):
+        self.plg_inst.status = 'waiting'
+        self.plg_inst.save()
+        with mock.patch.object(tasks.run_plugin_instance_job, 'delay',
+                               return_value=None) as delay_mock:
+            with mock.patch.object(tasks.LeaseLock, 'check_fencing_token',
+                                   return_value=False):
+                tasks.schedule_plugin_instances(
+                    PluginInstance.objects.filter(id=self.plg_inst.id))
+
+            self.plg_inst.refresh_from_db()
+            self.assertEqual(self.plg_inst.status, 'waiting')
+            delay_mock.assert_not_called()
+
+    def test_schedule_plugin_instances_skips_admission_lock_without_candidates(self):
+        with mock.patch.object(tasks.LeaseLock, 'acquire') as acquire_mock:
+            tasks.schedule_plugin_instances(
+                PluginInstance.objects.filter(id=self.plg_inst.id, status='waiting'))
+        acquire_mock.assert_not_called()
+
+    def test_schedule_plugin_instances_does_not_wait_for_admission_lock(self):
+        self.plg_inst.status = 'waiting'
+        self.plg_inst.save()
+        lock = tasks.LeaseLock(tasks.ADMISSION_LOCK_NAME, lease_seconds=30)
+        self.assertTrue(lock.acquire())
+        try:
+            with mock.patch.object(tasks.run_plugin_instance_job, 'delay',
+                                   return_value=None) as delay_mock:
+                tasks.schedule_plugin_instances(
+                    PluginInstance.objects.filter(id=self.plg_inst.id))
+
+                self.plg_inst.refresh_from_db()
+                self.assertEqual(self.plg_inst.status, 'waiting')
+                delay_mock.assert_not_called()
+        finally:
+            lock.release()
+
+    def test_task_schedule_plugin_instance_dependents_cancels_on_error(self):
+        self.plg_inst.status = 'finishedWithError'
+        self.plg_inst.save()
+        plugin = Plugin.objects.get(meta__name="mri_convert")
+        user = User.objects.get(username=self.username)
+        child = PluginInstance.objects.create(plugin=plugin, owner=user,
+                                              previous=self.plg_inst,
+                                              compute_resource=self.compute_resource)
+        child.status = 'waiting'
+        child.save()
+        with mock.patch.object(tasks.run_plugin_instance_job, 'delay',
+                               return_value=None) as delay_mock:
+            tasks.schedule_plugin_instance_dependents(self.plg_inst.id)
+
+            child.refresh_from_db()
+            self.assertEqual(child.status, 'cancelled')
+            delay_mock.assert_not_called()
+
+    def test_task_prefetch_plugin_instance_dependents(self):
+        self.plg_inst.status = 'registeringFiles'
+        self.plg_inst.save()
+        plugin = Plugin.objects.get(meta__name="mri_convert")
+        user = User.objects.get(username=self.username)
+        child = PluginInstance.objects.create(plugin=plugin, owner=user,
+                                              previous=self.plg_inst,
+                                              compute_resource=self.compute_resource)
+        child.status = 'waiting'
+        child.save()
+        with mock.patch.object(tasks.run_plugin_instance_job, 'delay',
+                               return_value=None) as delay_mock:
+            tasks.prefetch_plugin_instance_dependents(self.plg_inst.id)
+
+            child.refresh_from_db()
+            self.assertEqual(child.status, 'copying')
+            delay_mock.assert_called_once_with(child.id, 'PluginInstanceCopyJob')
+
+        # the held child's copy job is checked again once the previous one finishes
+        self.plg_inst.status = 'finishedSuccessfully'
+        self.plg_inst.save()
+        with mock.patch.object(tasks.check_plugin_instance_job_exec_status, 'delay',
+                               return_value=None) as delay_mock:
+            tasks.schedule_plugin_instance_dependents(self.plg_inst.id)
+            delay_mock.assert_called_once_with(child.id, 'PluginInstanceCopyJob')
+
+    def test_task_schedule_plugin_instance_dependents_waits_for_all_ts_parents(self):
+        self.plg_inst.status = 'finishedSuccessfully'
+        self.plg_inst.save()
+        user = User.objects.get(username=self.username)
+        plugin_ds = Plugin.objects.get(meta__name="mri_convert")
+        parent = PluginInstance.objects.create(plugin=plugin_ds, owner=user,
+                                               previous=self.plg_inst,
+                                               compute_resource=self.compute_resource)
+        parent.status = 'started'
+        parent.save()
+        (pl_meta, tf) = PluginMeta.objects.get_or_create(name='pl-topologicalcopy',
+                                                         type='ts')
+        (plugin_ts, tf) = Plugin.objects.get_or_create(meta=pl_meta, version='0.1')
+        ts_inst = PluginInstance.objects.create(plugin=plugin_ts, owner=user,
+                                                previous=self.plg_inst,
+                                                compute_resource=self.compute_resource)
+        ts_inst.status = 'waiting'
+        ts_inst.save()
+        ts_inst.ts_parents.set([self.plg_inst, parent])
+
+        with mock.patch.object(tasks.run_plugin_instance_job, 'delay',
+                               return_value=None) as delay_mock:
+            tasks.schedule_plugin_instance_dependents(self.plg_inst.id)
+            delay_mock.assert_not_called()
+
+            parent.status = 'finishedSuccessfully'
+            parent.save()
+            tasks.schedule_plugin_instance_dependents(parent.id)
+            delay_mock.assert_called_once_with(ts_inst.id, 'PluginInstanceCopyJob')
+            ts_inst.refresh_from_db()
+            self.assertEqual(ts_inst.status, 'copying')
+
+    def test_task_cancel_waiting_plugin_instances_with_failed_ts_parent(self):
+        self.plg_inst.status = 'finishedSuccessfully'
+        self.plg_inst.save()
+        user = User.objects.get(username=self.username)
+        plugin_ds = Plugin.objects.get(meta__name="mri_convert")
+        parent = PluginInstance.objects.create(plugin=plugin_ds, owner=user,
+                                               previous=self.plg_inst,
+                                               compute_resource=self.compute_resource)
+        parent.status = 'finishedWithError'
+        parent.save()
+        (pl_meta, tf) = PluginMeta.objects.get_or_create(name='pl-topologicalcopy',
+                                                         type='ts')
+        (plugin_ts, tf) = Plugin.objects.get_or_create(meta=pl_meta, version='0.1')
+        ts_inst = PluginInstance.objects.create(plugin=plugin_ts, owner=user,
+                                                previous=self.plg_inst,
+                                                compute_resource=self.compute_resource)
+        ts_inst.status = 'waiting'
+        ts_inst.save()
+        ts_inst.ts_parents.set([self.plg_inst, parent])
+
+        tasks.cancel_waiting_plugin_instances()
+        ts_inst.refresh_from_db()
+        self.assertEqual(ts_inst.status, 'cancelled')
+
+    def test_task_cancel_waiting_plugin_instances_cancels_whole_subtree(self):
+        self.plg_inst.status = 'finishedWithError'
+        self.plg_inst.save()
+        user = User.objects.get(username=self.username)
+        plugin_ds = Plugin.objects.get(meta__name="mri_convert")
+        (pl_meta, tf) = PluginMeta.objects.get_or_create(name='pl-topologicalcopy',
+                                                         type='ts')
+        (plugin_ts, tf) = Plugin.objects.get_or_create(meta=pl_meta, version='0.1')
+
+        # a chain of waiting plugin instances below the failed one
+        chain = []
+        previous = self.plg_inst
+        for _ in range(5):
+            previous = PluginInstance.objects.create(
+                plugin=plugin_ds, owner=user, previous=previous, status='waiting',
+                compute_resource=self.compute_resource)
+            chain.append(previous)
+
+        # a 'ts' instance in another branch that depends on the end of the chain
+        other = PluginInstance.objects.create(plugin=plugin_ds, owner=user,
+                                              previous=self.plg_inst,
+                                              status='finishedSuccessfully',
+                                              compute_resource=self.compute_resource)
+        ts_inst = PluginInstance.objects.create(plugin=plugin_ts, owner=user,
+                                                previous=other, status='waiting',
+                                                compute_resource=self.compute_resource)
+        ts_inst.ts_parents.set([other, chain[-1]])
+        ts_child = PluginInstance.objects.create(plugin=plugin_ds, owner=user,
+                                                 previous=ts_inst, status='waiting',
+                                                 compute_resource=self.compute_resource)
+
+        tasks.cancel_waiting_plugin_instances()
+
+        cancelled = [chain[0], chain[-1], ts_inst, ts_child]
+        for plg_inst in cancelled:
+            plg_inst.refresh_from_db()
+            self.assertEqual(plg_inst.status, 'cancelled')
+        other.refresh_from_db()
+        self.assertEqual(other.status, 'finishedSuccessfully')
+
+    def test_plugin_instance_job_schedules_dependents_on_commit(self):
+        plg_inst_job = tasks.PluginInstanceAppJob(self.plg_inst)
+        with mock.patch.object(tasks.schedule_plugin_instance_dependents, 'delay',
+                               return_value=None) as delay_mock:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                plg_inst_job.schedule_dependent_plugin_instances()
+                delay_mock.assert_not_called()
+
+            self.assertEqual(len(callbacks), 1)
+            delay_mock.assert_called_once_with(self.plg_inst.id)
+
+    def test_plugin_instance_job_cancel_exec_schedules_dependents(self):
+        for job_class_name in ('PluginInstanceAppJob', 'PluginInstanceCopyJob',
+                               'PluginInstanceUploadJob'):
+            plg_inst_job = tasks.JOB_CLASSES[job_class_name](self.plg_inst)
+            plg_inst_job.schedule_dependent_plugin_instances = mock.Mock()
+            plg_inst_job.schedule_remote_cleanup = mock.Mock()
+            plg_inst_job.cancel_exec()
+
+            self.assertEqual(self.plg_inst.status, 'cancelled')
+            plg_inst_job.schedule_dependent_plugin_instances.assert_called_once_with()
+
 
 class TasksAsyncTests(TransactionTestCase):
 
@@ -233,7 +600,7 @@ class PluginInstanceAsyncTasksTests(TasksAsyncTests):
             self.assertEqual(self.plg_inst.status, 'cancelled')  # instance must be cancelled
 
     @tag('integration')
-    def test_task_cancel_plugin_instances_stuck_in_lock_during_async_run(self):
+    def test_task_resume_plugin_instances_with_expired_lock_cancels_stuck_in_lock_during_async_run(self):
         self.plg_inst.status = 'registeringFiles'
         self.plg_inst.save(update_fields=['status'])
 
@@ -244,7 +611,7 @@ class PluginInstanceAsyncTasksTests(TasksAsyncTests):
 
         with mock.patch.object(tasks.PluginInstanceAppJob, 'schedule_remote_cleanup',
                                return_value=None):
-            tasks.cancel_plugin_instances_stuck_in_lock.delay()  # call async task
+            tasks.resume_plugin_instances_with_expired_lock.delay()  # call async task
 
             for _ in range(10):
                 time.sleep(3)
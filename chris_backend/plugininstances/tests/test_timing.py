@@ -0,0 +1,142 @@
+
+import logging
+from datetime import timedelta
+
+from django.test import TestCase
+from django.contrib.auth.models import User
+from django.conf import settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+
+from plugins.models import PluginMeta, Plugin, ComputeResource
+from plugininstances.models import PluginInstance
+from plugininstances.services.timing import PluginInstanceTimingReport
+
+
+COMPUTE_RESOURCE_URL = settings.COMPUTE_RESOURCE_URL
+
+
+class PluginInstanceTimingReportTests(TestCase):
+
+    def setUp(self):
+        # avoid cluttered console output (for instance logging all the http requests)
+        logging.disable(logging.WARNING)
+
+        (self.compute_resource, tf) = ComputeResource.objects.get_or_create(
+            name='host', compute_url=COMPUTE_RESOURCE_URL, compute_user='pfcon',
+            compute_password='pfcon1234')
+
+        (pl_meta, tf) = PluginMeta.objects.get_or_create(name='pacspull', type='fs')
+        (self.plugin, tf) = Plugin.objects.get_or_create(meta=pl_meta, version='0.1')
+        self.plugin.compute_resources.set([self.compute_resource])
+
+        self.user = User.objects.create_user(username='foo', password='foo-pass')
+
+    def tearDown(self):
+        # re-enable logging
+        logging.disable(logging.NOTSET)
+
+    def _create_finished_instance(self, execution_seconds, status='finishedSuccessfully'):
+        start = timezone.now() - timedelta(hours=1)
+        timeline = {'created': start, 'scheduled': start + timedelta(seconds=10),
+                    'started': start + timedelta(seconds=12),
+                    'registeringFiles': start + timedelta(seconds=12 + execution_seconds),
+                    status: start + timedelta(seconds=20 + execution_seconds)}
+        pl_inst = PluginInstance.objects.create(
+            plugin=self.plugin, owner=self.user, compute_resource=self.compute_resource)
+        PluginInstance.objects.filter(id=pl_inst.id).update(
+            status=status, timeline={k: v.isoformat() for k, v in timeline.items()})
+        return pl_inst
+
+    def test_get_percentiles(self):
+        for execution_seconds in (100, 200, 300):
+            self._create_finished_instance(execution_seconds)
+        PluginInstance.objects.create(plugin=self.plugin, owner=self.user,
+                                      compute_resource=self.compute_resource)
+
+        with self.assertNumQueries(1):
+            d_report = PluginInstanceTimingReport().get_percentiles()
+
+        self.assertEqual(d_report['percentiles'], [50, 90, 99])
+        self.assertEqual(len(d_report['plugin_compute_resource']), 1)
+        entry = d_report['plugin_compute_resource'][0]
+        self.assertEqual(entry['plugin_name'], 'pacspull')
+        self.assertEqual(entry['compute_resource_name'], 'host')
+        self.assertEqual(entry['count'], 3)  # unfinished instances are excluded
+
+        phases = entry['phases']
+        self.assertEqual(phases['queued'], {'count': 3, 'p50': 10, 'p90': 10, 'p99': 10})
+        self.assertEqual(phases['execution']['p50'], 200)
+        self.assertEqual(phases['execution']['p90'], 280)
+        self.assertEqual(phases['registration']['p50'], 8)
+        self.assertEqual(phases['total']['p50'], 220)
+        self.assertEqual(phases['copy'], {'count': 0, 'p50': None, 'p90': None,
+                                          'p99': None})
+
+        self.assertEqual(d_report['plugin'][0]['phases'], phases)
+        self.assertEqual(d_report['compute_resource'][0]['phases'], phases)
+        self.assertEqual(d_report['all'][0]['count'], 3)
+
+    def test_get_percentiles_filters(self):
+        self._create_finished_instance(100, 'finishedWithError')
+
+        d_report = PluginInstanceTimingReport(plugin_name='other').get_percentiles()
+        self.assertEqual(d_report['plugin_compute_resource'], [])
+        self.assertEqual(d_report['all'][0]['count'], 0)
+
+        d_report = PluginInstanceTimingReport(
+            compute_resource_name='host').get_percentiles()
+        self.assertEqual(d_report['all'][0]['count'], 1)
+
+
+class PluginInstanceTimingAdminDetailViewTests(TestCase):
+    """
+    Test the admin-timing-detail view.
+    """
+
+    def setUp(self):
+        # avoid cluttered console output (for instance logging all the http requests)
+        logging.disable(logging.WARNING)
+
+        self.admin_username = 'admin'
+        self.admin_password = 'adminpass'
+        self.username = 'foo'
+        self.password = 'pass'
+        # create admin user
+        User.objects.create_superuser(username=self.admin_username,
+                                      password=self.admin_password,
+                                      email='admin@babymri.org')
+        # create normal user
+        User.objects.create_user(username=self.username,
+                                 password=self.password)
+
+        self.read_url = reverse('admin-timing-detail')
+
+    def tearDown(self):
+        # re-enable logging
+        logging.disable(logging.NOTSET)
+
+    def test_timing_detail_success(self):
+        self.client.login(username=self.admin_username, password=self.admin_password)
+        response = self.client.get(self.read_url, {'days': 30})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['days'], 30)
+        self.assertIn('registration', response.data['phases'])
+
+    def test_timing_detail_failure_invalid_days(self):
+        self.client.login(username=self.admin_username, password=self.admin_password)
+        response = self.client.get(self.read_url, {'days': 'a'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(self.read_url, {'days': '1000000000'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_timing_detail_failure_unauthenticated(self):
+        response = self.client.get(self.read_url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_timing_detail_failure_access_denied(self):
+        self.client.login(username=self.username, password=self.password)
+        response = self.client.get(self.read_url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
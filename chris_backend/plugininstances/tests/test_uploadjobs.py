@@ -17,7 +17,8 @@ from pfconclient.exceptions import PfconRequestException
 from core.models import ChrisInstance
 from core.storage import connect_storage
 from plugins.models import PluginMeta, Plugin, PluginParameter
-from plugininstances.models import PluginInstance, PathParameter, ComputeResource
+from plugininstances.models import (PluginInstance, PluginInstanceLock, PathParameter,
+                                    ComputeResource)
 from plugininstances.services import uploadjobs
 from plugininstances.services.pluginjobs import PluginInstanceAppJob
 
@@ -299,7 +300,7 @@ class PluginInstanceUploadJobTests(TestCase):
             compute_resource=plugin.compute_resources.all()[0])
         upload_job = uploadjobs.PluginInstanceUploadJob(pl_inst)
 
-        with mock.patch.object(uploadjobs.PluginInstanceLock, 'save',
+        with mock.patch.object(PluginInstanceLock, 'save',
                                side_effect=IntegrityError()):
             upload_job.handle_finished_successfully_status()
 
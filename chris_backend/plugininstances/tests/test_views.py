@@ -23,7 +23,7 @@ from core.celery import task_routes
 from core.storage import connect_storage
 from userfiles.models import UserFile
 from plugins.models import PluginMeta, Plugin, PluginParameter, ComputeResource
-from plugininstances.models import PluginInstance
+from plugininstances.models import PluginInstance, PluginInstanceSplit
 from plugininstances.models import PathParameter, FloatParameter
 from plugininstances.services.pluginjobs import PluginInstanceAppJob
 from plugininstances.services.copyjobs import PluginInstanceCopyJob
@@ -233,16 +233,17 @@ class PluginInstanceListViewTests(TasksViewTests):
 
         # first test 'fs' plugin instance (has no previous plugin instance)
 
-        with mock.patch('plugininstances.utils.run_plugin_instance_job') as run_job_mock:
+        with mock.patch('plugininstances.utils.schedule_new_plugin_instances') as \
+                schedule_mock:
             # make API request
             self.client.login(username=self.username, password=self.password)
             response = self.client.post(self.create_read_url, data=self.post,
                                         content_type=self.content_type)
             self.assertEqual(response.status_code, status.HTTP_201_CREATED)
 
-            # check that the run_plugin_instance task was called with appropriate args
-            run_job_mock.delay.assert_called_with(response.data['id'], 'PluginInstanceAppJob')
-            self.assertEqual(response.data['status'], 'scheduled')
+            # check that the scheduling task was enqueued with appropriate args
+            schedule_mock.delay.assert_called_with([response.data['id']])
+            self.assertEqual(response.data['status'], 'waiting')
 
         # now test 'ds' plugin instance (has previous plugin instance)
 
@@ -254,19 +255,20 @@ class PluginInstanceListViewTests(TasksViewTests):
 
         previous_plg_inst.status = 'finishedSuccessfully'
         previous_plg_inst.save()
-        with mock.patch('plugininstances.utils.run_plugin_instance_job') as run_job_mock:
+        with mock.patch('plugininstances.utils.schedule_new_plugin_instances') as \
+                schedule_mock:
             self.client.login(username=self.username, password=self.password)
             response = self.client.post(create_read_url, data=post,
                                         content_type=self.content_type)
             self.assertEqual(response.status_code, status.HTTP_201_CREATED)
 
-            # check that the run_plugin_instance task was called with appropriate args
-            run_job_mock.delay.assert_called_with(response.data['id'], 'PluginInstanceAppJob')
-            self.assertEqual(response.data['status'], 'scheduled')
+            # check that the scheduling task was enqueued with appropriate args
+            schedule_mock.delay.assert_called_with([response.data['id']])
+            self.assertEqual(response.data['status'], 'waiting')
 
         previous_plg_inst.status = 'started'
         previous_plg_inst.save()
-        with mock.patch('plugininstances.utils.run_plugin_instance_job') as run_job_mock:
+        with mock.patch('plugininstances.tasks.run_plugin_instance_job') as run_job_mock:
             self.client.login(username=self.username, password=self.password)
             response = self.client.post(create_read_url, data=post,
                                         content_type=self.content_type)
@@ -278,7 +280,7 @@ class PluginInstanceListViewTests(TasksViewTests):
 
         previous_plg_inst.status = 'finishedWithError'
         previous_plg_inst.save()
-        with mock.patch('plugininstances.utils.run_plugin_instance_job') as run_job_mock:
+        with mock.patch('plugininstances.tasks.run_plugin_instance_job') as run_job_mock:
             self.client.login(username=self.username, password=self.password)
             response = self.client.post(create_read_url, data=post,
                                         content_type=self.content_type)
@@ -318,19 +320,20 @@ class PluginInstanceListViewTests(TasksViewTests):
 
         parent_plg_inst.status = 'finishedSuccessfully'
         parent_plg_inst.save()
-        with mock.patch('plugininstances.utils.run_plugin_instance_job') as run_job_mock:
+        with mock.patch('plugininstances.utils.schedule_new_plugin_instances') as \
+                schedule_mock:
             self.client.login(username=self.username, password=self.password)
             response = self.client.post(create_read_url, data=post,
                                         content_type=self.content_type)
             self.assertEqual(response.status_code, status.HTTP_201_CREATED)
 
-            # check that the run_plugin_instance task was called with appropriate args
-            run_job_mock.delay.assert_called_with(response.data['id'], 'PluginInstanceAppJob')
-            self.assertEqual(response.data['status'], 'scheduled')
+            # check that the scheduling task was enqueued with appropriate args
+            schedule_mock.delay.assert_called_with([response.data['id']])
+            self.assertEqual(response.data['status'], 'waiting')
 
         parent_plg_inst.status = 'started'
         parent_plg_inst.save()
-        with mock.patch('plugininstances.utils.run_plugin_instance_job') as run_job_mock:
+        with mock.patch('plugininstances.tasks.run_plugin_instance_job') as run_job_mock:
             self.client.login(username=self.username, password=self.password)
             response = self.client.post(create_read_url, data=post,
                                         content_type=self.content_type)
@@ -342,7 +345,7 @@ class PluginInstanceListViewTests(TasksViewTests):
 
         parent_plg_inst.status = 'finishedWithError'
         parent_plg_inst.save()
-        with mock.patch('plugininstances.utils.run_plugin_instance_job') as run_job_mock:
+        with mock.patch('plugininstances.tasks.run_plugin_instance_job') as run_job_mock:
             self.client.login(username=self.username, password=self.password)
             response = self.client.post(create_read_url, data=post,
                                         content_type=self.content_type)
@@ -975,6 +978,10 @@ class PluginInstanceDetailViewTests(TasksViewTests):
                 # check that the delete_plugin_instance task was called with appropriate args
                 delay_mock.assert_called_with(ds_inst.id)
 
+        ds_inst.refresh_from_db()
+        self.assertEqual(ds_inst.status, 'cancelled')
+        self.assertIn('cancelled', ds_inst.timeline)
+
     @tag('integration')
     def test_integration_plugin_instance_delete_success(self):
         user = User.objects.get(username=self.username)
@@ -1079,7 +1086,8 @@ class PluginInstanceListQuerySearchViewTests(ViewTests):
         # response should only contain the instances that are not active
         self.assertContains(response, 'finishedSuccessfully')
         self.assertEqual(len(response.data['results']), 2)
-        self.assertNotContains(response, 'created')
+        # 'created' is also a key of the instances' timelines
+        self.assertNotIn('created', [r['status'] for r in response.data['results']])
 
     def test_plugin_instance_query_search_list_success_but_empty_unauthenticated(self):
         response = self.client.get(self.list_url)
@@ -1092,7 +1100,8 @@ class PluginInstanceListQuerySearchViewTests(ViewTests):
         # response should only contain the instances that match the query
         self.assertContains(response, 'finishedSuccessfully')
         self.assertEqual(len(response.data['results']), 2)
-        self.assertNotContains(response, 'created')
+        # 'created' is also a key of the instances' timelines
+        self.assertNotIn('created', [r['status'] for r in response.data['results']])
 
 
 class PluginInstanceDescendantListViewTests(ViewTests):
@@ -1148,6 +1157,58 @@ class PluginInstanceDescendantListViewTests(ViewTests):
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
+class PluginInstanceJobStatusCallbackViewTests(ViewTests):
+    """
+    Test the plugininstance-callback view.
+    """
+
+    def setUp(self):
+        super(PluginInstanceJobStatusCallbackViewTests, self).setUp()
+
+        user = User.objects.get(username=self.username)
+        plugin = Plugin.objects.get(meta__name="pacspull")
+        (self.plg_inst, tf) = PluginInstance.objects.get_or_create(
+            plugin=plugin, owner=user, compute_resource=plugin.compute_resources.all()[0])
+        self.plg_inst.status = 'started'
+        self.plg_inst.save()
+
+        self.callback_url = reverse("plugininstance-callback",
+                                    kwargs={"pk": self.plg_inst.id})
+
+    def test_plugin_instance_callback_success(self):
+        with mock.patch.object(views.handle_plugin_instance_job_status_callback,
+                               'delay', return_value=None) as delay_mock:
+            self.client.login(username=self.chris_username,
+                              password=self.chris_password)
+            response = self.client.post(self.callback_url, data={},
+                                        content_type='application/json')
+            self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+            delay_mock.assert_called_with(self.plg_inst.id)
+
+    def test_plugin_instance_callback_does_not_check_inactive_instance(self):
+        self.plg_inst.status = 'finishedSuccessfully'
+        self.plg_inst.save()
+        with mock.patch.object(views.handle_plugin_instance_job_status_callback,
+                               'delay', return_value=None) as delay_mock:
+            self.client.login(username=self.chris_username,
+                              password=self.chris_password)
+            response = self.client.post(self.callback_url, data={},
+                                        content_type='application/json')
+            self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+            delay_mock.assert_not_called()
+
+    def test_plugin_instance_callback_failure_unauthenticated(self):
+        response = self.client.post(self.callback_url, data={},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_plugin_instance_callback_failure_access_denied(self):
+        self.client.login(username=self.username, password=self.password)
+        response = self.client.post(self.callback_url, data={},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
 class PluginInstanceSplitListViewTests(ViewTests):
     """
     Test the plugininstancesplit-list view.
@@ -1196,13 +1257,46 @@ class PluginInstanceSplitListViewTests(ViewTests):
 
         self.fs_inst.status = 'finishedSuccessfully'
         self.fs_inst.save()
-        with mock.patch('plugininstances.utils.run_plugin_instance_job') as run_job_mock:
+        with mock.patch('plugininstances.views.schedule_new_plugin_instances') as \
+                schedule_mock:
 
-            response = self.client.post(self.create_read_url, data=post,
-                                        content_type=self.content_type)
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(self.create_read_url, data=post,
+                                            content_type=self.content_type)
             self.assertEqual(response.status_code, status.HTTP_201_CREATED)
-            # check that the run_plugin_instance task was called with appropriate args
-            run_job_mock.delay.assert_called_once()
+            # check that a single scheduling task was enqueued for the new instances
+            split = PluginInstanceSplit.objects.filter(
+                plugin_inst=self.fs_inst).latest('id')
+            ids = [int(i) for i in split.created_plugin_inst_ids.split(',')]
+            schedule_mock.delay.assert_called_once_with(ids)
+
+    def test_plugin_instance_split_create_success_creates_branches_in_bulk(self):
+        post = json.dumps({"template": {"data": [{"name": "filter",
+                                                  "value": "a.dcm,b.dcm,c.dcm"}]}})
+        plugin = Plugin.objects.get(meta__name="pl-topologicalcopy")
+        PluginParameter.objects.get_or_create(plugin=plugin, name='filter', type='string')
+        PluginParameter.objects.get_or_create(plugin=plugin, name='plugininstances',
+                                              type='string')
+        self.fs_inst.status = 'started'
+        self.fs_inst.save()
+
+        self.client.login(username=self.username, password=self.password)
+        response = self.client.post(self.create_read_url, data=post,
+                                    content_type=self.content_type)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        split = PluginInstanceSplit.objects.get(plugin_inst=self.fs_inst)
+        ids = [int(i) for i in split.created_plugin_inst_ids.split(',')]
+        branches = PluginInstance.objects.filter(id__in=ids).order_by('id')
+        self.assertEqual(len(branches), 3)
+        for branch, f in zip(branches, ['a.dcm', 'b.dcm', 'c.dcm']):
+            self.assertEqual(branch.status, 'waiting')
+            self.assertEqual(branch.previous, self.fs_inst)
+            self.assertEqual(list(branch.ts_parents.all()), [self.fs_inst])
+            self.assertEqual(branch.string_param.get(
+                plugin_param__name='plugininstances').value, str(self.fs_inst.id))
+            self.assertEqual(branch.string_param.get(
+                plugin_param__name='filter').value, f)
 
     def test_plugin_instance_split_list_success(self):
         self.client.login(username=self.username, password=self.password)
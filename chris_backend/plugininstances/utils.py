@@ -1,5 +1,7 @@
 
-from .tasks import run_plugin_instance_job
+from django.db import transaction
+
+from .tasks import schedule_new_plugin_instances
 from .models import PluginInstance, ACTIVE_STATUSES
 
 
@@ -7,13 +9,18 @@ def run_if_ready(plg_inst, previous):
     """
     Set the status of ``plg_inst`` accordingly depending on the status of its previous
     plugin instance. Plugin instances of type 'ts' also consider the status of each of
-    its possibly multiple parents.
+    its possibly multiple parents, which are first stored in the ts_parents join table
+    so the scheduling tasks can resolve these dependencies with set-based queries.
+    Plugin instances ready to run are left waiting for a scheduling task that is
+    enqueued once the current transaction commits, which only schedules them if
+    admitted by the admission controller.
     """
     parent_ids = []
     if plg_inst.plugin.meta.type == 'ts':
         param = plg_inst.string_param.filter(plugin_param__name='plugininstances').first()
         if param and param.value:
             parent_ids = [int(parent_id) for parent_id in param.value.split(',')]
+            plg_inst.ts_parents.set(PluginInstance.objects.filter(pk__in=parent_ids))
 
     if parent_ids:
         parents = PluginInstance.objects.filter(pk__in=parent_ids)
@@ -30,23 +37,24 @@ def run_if_ready(plg_inst, previous):
                 break
 
         if all_parents_finished:
-            if plg_inst.compute_resource.compute_requires_copy_job:
-                plg_inst.set_status('copying')
-                run_plugin_instance_job.delay(plg_inst.id, 'PluginInstanceCopyJob')
-            else:
-                plg_inst.set_status('scheduled')
-                run_plugin_instance_job.delay(plg_inst.id, 'PluginInstanceAppJob')
+            _schedule_on_commit(plg_inst)
 
     elif previous is None or previous.status == 'finishedSuccessfully':
-        if plg_inst.compute_resource.compute_requires_copy_job:
-            plg_inst.set_status('copying')
-            run_plugin_instance_job.delay(plg_inst.id, 'PluginInstanceCopyJob')
-        else:
-            plg_inst.set_status('scheduled')
-            run_plugin_instance_job.delay(plg_inst.id, 'PluginInstanceAppJob')
+        _schedule_on_commit(plg_inst)
 
     elif previous.status in ACTIVE_STATUSES:
         plg_inst.set_status('waiting')
 
     elif previous.status in ('finishedWithError', 'cancelled'):
         plg_inst.set_status('cancelled')
+
+
+def _schedule_on_commit(plg_inst):
+    """
+    Set a plugin instance ready to run in 'waiting' status and enqueue the task that
+    schedules it if admitted by the admission controller once the current transaction
+    commits. No admission lock is taken in the request path.
+    """
+    plg_inst.set_status('waiting')
+    plg_inst_id = plg_inst.id
+    transaction.on_commit(lambda: schedule_new_plugin_instances.delay([plg_inst_id]))
@@ -1,4 +1,5 @@
 
+from django.db import transaction
 from django.db.models import Q
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
@@ -15,9 +16,14 @@ from .models import (PluginInstance, PluginInstanceFilter, PluginInstanceSplit,
 from .serializers import (PARAMETER_SERIALIZERS, GenericParameterSerializer,
                           PluginInstanceSplitSerializer, PluginInstanceSerializer)
 from .permissions import (IsOwnerOrChrisOrHasFeedPermissionReadOnlyOrPublicFeedReadOnly,
-                          IsNotDeleteFSPluginInstance)
-from .tasks import cancel_plugin_instance_job, delete_plugin_instance
+                          IsNotDeleteFSPluginInstance, IsChris)
+from .tasks import (cancel_plugin_instance_job, delete_plugin_instance,
+                    handle_plugin_instance_job_status_callback,
+                    schedule_new_plugin_instances)
 from .utils import run_if_ready
+from .services.dagbuilder import PluginInstanceDAGBuilder
+from .services.placement import ComputeResourcePlacementPolicy
+from .services.refcache import get_plugin_parameters
 
 
 @extend_schema_view(
@@ -48,7 +54,7 @@ class PluginInstanceList(generics.ListCreateAPIView):
 
         # collect and validate parameters from the request
         parameter_serializers = []
-        for parameter in plugin.parameters.all():
+        for parameter in get_plugin_parameters(plugin.id):
             if parameter.name in request_data:
                 data = {'value': request_data[parameter.name]}
                 param_type = parameter.type
@@ -75,7 +81,9 @@ class PluginInstanceList(generics.ListCreateAPIView):
         if cr_data:
             compute_resource = plugin.compute_resources.get(name=cr_data['name'])
         else:
-            compute_resource = plugin.compute_resources.first()
+            compute_resource = ComputeResourcePlacementPolicy().select(
+                plugin.compute_resources,
+                previous.compute_resource_id if previous else None)
         plg_inst = serializer.save(owner=user, plugin=plugin, previous=previous,
                                    compute_resource=compute_resource)
         for param, param_serializer in parameter_serializers:
@@ -221,9 +229,9 @@ class PluginInstanceDetail(generics.RetrieveUpdateDestroyAPIView):
                 if instance.status in ACTIVE_STATUSES:
                     cancel_plugin_instance_job.delay(instance.id)  # call async task
 
-                PluginInstance.objects.filter(
-                    pk__in=[inst.id for inst in descendants]
-                ).update(status='cancelled')
+                descendants.update(
+                    status='cancelled',
+                    timeline=PluginInstance.merge_timeline_events('cancelled'))
 
         super(PluginInstanceDetail, self).perform_update(serializer)
 
@@ -240,12 +248,9 @@ class PluginInstanceDetail(generics.RetrieveUpdateDestroyAPIView):
         if instance.status in ACTIVE_STATUSES:
             cancel_plugin_instance_job(instance.id)
 
-        plg_inst_ids = []
-        for plg_inst in descendants:
-            if plg_inst.status in ACTIVE_STATUSES:
-                plg_inst_ids.append(plg_inst.id)
-
-        PluginInstance.objects.filter(pk__in=plg_inst_ids).update(status='cancelled')
+        descendants.filter(status__in=ACTIVE_STATUSES).update(
+            status='cancelled',
+            timeline=PluginInstance.merge_timeline_events('cancelled'))
 
         if instance.mark_deletion_pending():
             delete_plugin_instance.delay(instance.id)  # async task
@@ -254,6 +259,30 @@ class PluginInstanceDetail(generics.RetrieveUpdateDestroyAPIView):
         return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
 
 
+class PluginInstanceJobStatusCallback(generics.GenericAPIView):
+    """
+    A view for the remote compute to notify a job status change for a plugin instance.
+    """
+    http_method_names = ['post']
+    serializer_class = PluginInstanceSerializer
+    queryset = PluginInstance.objects.all()
+    permission_classes = (permissions.IsAuthenticated, IsChris)
+
+    def post(self, request, *args, **kwargs):
+        """
+        Custom method to asynchronously check the execution status of the plugin
+        instance's currently running job which in turn triggers the appropriate
+        status handler.
+        """
+        instance = self.get_object()
+
+        if instance.status in ('copying', 'started', 'uploading'):
+            handle_plugin_instance_job_status_callback.delay(instance.id)  # async task
+
+        serializer = self.get_serializer(instance)
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+
+
 class PluginInstanceDescendantList(generics.ListAPIView):
     """
     A view for the collection of plugin instances that are a descendant of this plugin
@@ -292,7 +321,8 @@ class PluginInstanceSplitList(generics.ListCreateAPIView):
         """
         Overriden to associate a plugin instance and a list of newly created
         'pl-topologicalcopy' plugin instance ids with the newly created split before
-        first saving to the DB.
+        first saving to the DB. The 'pl-topologicalcopy' plugin instances are created
+        in bulk and scheduled together as a group.
         """
         user = self.request.user
         instance = self.get_object()
@@ -302,31 +332,37 @@ class PluginInstanceSplitList(generics.ListCreateAPIView):
         if cr_name:
             compute_resource = plg_topologcopy.compute_resources.get(name=cr_name)
         else:
-            compute_resource = plg_topologcopy.compute_resources.first()
+            compute_resource = ComputeResourcePlacementPolicy().select(
+                plg_topologcopy.compute_resources, instance.compute_resource_id)
 
         plg_filter_param = plg_topologcopy.parameters.get(name='filter')
         plg_plugininstances_param = plg_topologcopy.parameters.get(name='plugininstances')
 
-        created_plg_inst_ids = []
+        if instance.status in ('finishedWithError', 'cancelled'):
+            plg_inst_status = 'cancelled'
+        else:
+            plg_inst_status = 'waiting'
+
+        builder = PluginInstanceDAGBuilder(user, instance)
         filter_list = serializer.validated_data.get('filter', '').split(',')
 
-        for f in filter_list:
-            plg_inst = PluginInstance.objects.create(
-                plugin=plg_topologcopy, owner=user, previous=instance,
-                compute_resource=compute_resource
-            )
-            StrParameter.objects.create(plugin_inst=plg_inst,
-                                        plugin_param=plg_plugininstances_param,
-                                        value=str(instance.id))
+        for i, f in enumerate(filter_list):
+            params = [(plg_plugininstances_param, str(instance.id))]
             if f:
-                StrParameter.objects.create(plugin_inst=plg_inst,
-                                            plugin_param=plg_filter_param,
-                                            value=f)
-            run_if_ready(plg_inst, instance)
-            created_plg_inst_ids.append(str(plg_inst.id))
+                params.append((plg_filter_param, f))
+            builder.add_node(i, plg_topologcopy, compute_resource, params=params,
+                             ts_parent_ids=[instance.id], status=plg_inst_status)
+
+        created_plg_inst_ids = [plg_inst.id for plg_inst in builder.create().values()]
+
+        if instance.status == 'finishedSuccessfully':
+            # schedule all the new plugin instances as a group in a single task
+            transaction.on_commit(
+                lambda: schedule_new_plugin_instances.delay(created_plg_inst_ids))
 
         serializer.save(
-            plugin_inst=instance, created_plugin_inst_ids=','.join(created_plg_inst_ids)
+            plugin_inst=instance,
+            created_plugin_inst_ids=','.join(str(i) for i in created_plg_inst_ids)
         )
 
     def list(self, request, *args, **kwargs):
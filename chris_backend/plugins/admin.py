@@ -88,7 +88,7 @@ class ComputeResourceAdmin(admin.ModelAdmin):
         """
         self.fields = ['name', 'compute_url', 'compute_auth_url', 'compute_user',
                        'compute_password', 'compute_auth_token', 'description', 
-                       'max_job_exec_seconds']
+                       'max_job_exec_seconds', 'max_active_jobs']
         return admin.ModelAdmin.add_view(self, request, form_url, extra_context)
 
     def change_view(self, request, object_id, form_url='', extra_context=None):
@@ -98,8 +98,8 @@ class ComputeResourceAdmin(admin.ModelAdmin):
         self.fields = ['name', 'compute_url', 'compute_auth_url', 'compute_user',
                        'compute_password', 'compute_auth_token', 'compute_innetwork',
                        'compute_requires_copy_job', 'compute_requires_upload_job',
-                       'description', 'max_job_exec_seconds', 'creation_date',
-                       'modification_date']
+                       'description', 'max_job_exec_seconds', 'max_active_jobs',
+                       'creation_date', 'modification_date']
         return admin.ModelAdmin.change_view(self, request, object_id, form_url,
                                             extra_context)
 
@@ -377,7 +377,7 @@ class ComputeResourceAdminList(generics.ListCreateAPIView):
         template_data = {'name': '', 'compute_url': '', 'compute_auth_url': '',
                          'compute_user': '', 'compute_password': '',
                          'compute_auth_token': '', 'description': '', 
-                         'max_job_exec_seconds': ''}
+                         'max_job_exec_seconds': '', 'max_active_jobs': ''}
         return services.append_collection_template(response, template_data)
 
 
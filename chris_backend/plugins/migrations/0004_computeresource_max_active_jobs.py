@@ -0,0 +1,18 @@
+# Generated by Django 5.2.9 on 2026-10-18 22:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('plugins', '0003_computeresource_compute_requires_copy_job_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='computeresource',
+            name='max_active_jobs',
+            field=models.IntegerField(blank=True, default=-1),
+        ),
+    ]
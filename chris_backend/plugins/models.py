@@ -27,6 +27,7 @@ class ComputeResource(models.Model):
                                           default='initial_token')
     description = models.CharField(max_length=600, blank=True)
     max_job_exec_seconds = models.IntegerField(blank=True, default=-1)  # unlimited
+    max_active_jobs = models.IntegerField(blank=True, default=-1)  # unlimited
 
     def __str__(self):
         return self.name
@@ -28,7 +28,7 @@ class ComputeResourceSerializer(serializers.HyperlinkedModelSerializer):
                   'compute_url', 'compute_auth_url', 'compute_innetwork',
                   'compute_requires_copy_job', 'compute_requires_upload_job',
                   'compute_user', 'compute_password', 'compute_auth_token', 'description',
-                  'max_job_exec_seconds')
+                  'max_job_exec_seconds', 'max_active_jobs')
 
     def validate(self, data):
         """
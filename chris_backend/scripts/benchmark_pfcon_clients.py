@@ -0,0 +1,125 @@
+"""
+Benchmark comparing the job status requests throughput (jobs/sec) of the synchronous
+pfcon client used by the prefork celery workers against the asynchronous pfcon client.
+
+A local fake pfcon server that answers every job status request after a fixed latency
+is started in a background thread, so no Django settings or remote compute environment
+are needed. Run it from the chris_backend directory:
+
+    python -m scripts.benchmark_pfcon_clients --jobs 1000 --latency 0.1
+"""
+
+import argparse
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing import Pool
+
+from pfconclient import client as pfcon
+from pfconclient.client import JobType
+
+from plugininstances.services.asyncpfcon import AsyncPfconClient
+
+
+class FakePfconServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+class FakePfconRequestHandler(BaseHTTPRequestHandler):
+    """
+    Answer every job status request with a 'started' status after a fixed latency.
+    """
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    latency = 0.1
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        body = json.dumps({'compute': {'status': 'started', 'logs': ''}}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_fake_pfcon(latency):
+    """
+    Start a fake pfcon server in a background thread and return its url.
+    """
+    FakePfconRequestHandler.latency = latency
+    server = FakePfconServer(('127.0.0.1', 0), FakePfconRequestHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{server.server_port}/api/v1/'
+
+
+def _get_sync_job_statuses(args):
+    """
+    Sequentially get job statuses with the synchronous client as a prefork worker
+    process does.
+    """
+    url, job_ids = args
+    pfcon_client = pfcon.Client(url, 'token')
+    for job_id in job_ids:
+        pfcon_client.get_job_status(JobType.PLUGIN, job_id, timeout=100)
+    return len(job_ids)
+
+
+def run_prefork(url, job_ids, nprocesses):
+    """
+    Get all the job statuses with a pool of worker processes.
+    """
+    chunks = [(url, job_ids[i::nprocesses]) for i in range(nprocesses)]
+    with Pool(nprocesses) as pool:
+        start = time.perf_counter()
+        pool.map(_get_sync_job_statuses, chunks)
+        return time.perf_counter() - start
+
+
+async def _get_async_job_statuses(url, job_ids, concurrency):
+    async with AsyncPfconClient(url, 'token', concurrency) as pfcon_client:
+        await asyncio.gather(*[pfcon_client.get_job_status(JobType.PLUGIN, job_id)
+                               for job_id in job_ids])
+
+
+def run_async(url, job_ids, concurrency):
+    """
+    Get all the job statuses from a single process with the asynchronous client.
+    """
+    start = time.perf_counter()
+    asyncio.run(_get_async_job_statuses(url, job_ids, concurrency))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark pfcon job status '
+                                                 'requests throughput')
+    parser.add_argument('--jobs', type=int, default=1000,
+                        help='number of job status requests')
+    parser.add_argument('--latency', type=float, default=0.1,
+                        help='fake pfcon response latency in seconds')
+    parser.add_argument('--processes', type=int, default=4,
+                        help='number of prefork worker processes')
+    parser.add_argument('--concurrency', type=int, default=20,
+                        help='maximum in-flight requests for the async client')
+    args = parser.parse_args()
+
+    url = start_fake_pfcon(args.latency)
+    job_ids = [f'chris-jid-{i}' for i in range(args.jobs)]
+
+    elapsed = run_prefork(url, job_ids, args.processes)
+    print(f'prefork ({args.processes} processes): {args.jobs / elapsed:.1f} jobs/sec')
+
+    elapsed = run_async(url, job_ids, args.concurrency)
+    print(f'async (1 process, {args.concurrency} in-flight): '
+          f'{args.jobs / elapsed:.1f} jobs/sec')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,10 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import TypedDict, NewType, List, Any, Optional, Sequence, Tuple, Dict, Union
 
 from pipelines.models import PluginPiping, DefaultPipingStrParameter, DefaultPipingIntParameter, \
     DefaultPipingFloatParameter, DefaultPipingBoolParameter
 from plugins.models import ComputeResource, PluginParameter
+from plugininstances.services.placement import ComputeResourcePlacementPolicy
 
 PipingId = NewType('PipingId', int)
 ComputeResourceName = NewType('ComputeResourceName', str)
@@ -48,6 +49,10 @@ class WorkflowPluginInstanceTemplateFactory:
     Converter for :class:`GivenNodeInfo` to :class:`WorkflowPluginInstanceTemplate`
     """
     tree: Dict[PipingId, Dict]
+    previous_compute_resource_id: Optional[int] = None
+    placement: ComputeResourcePlacementPolicy = field(
+        default_factory=ComputeResourcePlacementPolicy)
+    placed: Dict[PipingId, ComputeResource] = field(default_factory=dict)
 
     def get_piping(self, piping_id: PipingId) -> PluginPiping:
         return self.tree[piping_id]['piping']
@@ -55,8 +60,17 @@ class WorkflowPluginInstanceTemplateFactory:
     def get_compute_resource(self, piping: PluginPiping, name: Optional[ComputeResourceName]) -> ComputeResource:
         compute_resources = piping.plugin.compute_resources
         if name:
-            compute_resources = compute_resources.filter(name=name)
-        return compute_resources.first()
+            compute_resource = compute_resources.filter(name=name).first()
+        else:
+            # the previous piping's compute resource is known if it's already placed
+            if piping.previous_id is None:
+                previous_cr_id = self.previous_compute_resource_id
+            else:
+                previous_cr = self.placed.get(piping.previous_id)
+                previous_cr_id = previous_cr.id if previous_cr else None
+            compute_resource = self.placement.select(compute_resources, previous_cr_id)
+        self.placed[piping.id] = compute_resource
+        return compute_resource
 
     def inflate(self, node_info: GivenNodeInfo) -> WorkflowPluginInstanceTemplate:
         piping = self.get_piping(node_info['piping_id'])
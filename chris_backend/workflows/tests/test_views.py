@@ -160,7 +160,7 @@ class WorkflowListViewTests(ViewTests):
                                             "compute_resource_name": "host"}])}]}})
 
         plg_instances_count = PluginInstance.objects.count()
-        with mock.patch('plugininstances.utils.run_plugin_instance_job') as run_job_mock:
+        with mock.patch('plugininstances.tasks.run_plugin_instance_job') as run_job_mock:
             self.client.login(username=self.username, password=self.password)
             response = self.client.post(self.create_read_url, data=post,
                                         content_type=self.content_type)
@@ -176,6 +176,44 @@ class WorkflowListViewTests(ViewTests):
             for inst_id in parent_ids:
                 self.assertIn(inst_id, [inst_ds1.id, inst_ds2.id])
 
+    def test_workflow_create_success_creates_plugin_instances_dag(self):
+        post = json.dumps(
+            {"template": {"data": [{"name": "previous_plugin_inst_id", "value": self.pl_inst.id},
+                                   {"name": "nodes_info",
+                                    "value": json.dumps([{"piping_id": self.pips[0].id,
+                                           "compute_resource_name": "host", "title": "Inst_ds1"},
+                                          {"piping_id": self.pips[1].id, "title": "Inst_ds2",
+                                           "compute_resource_name": "host"},
+                                          {"piping_id": self.pips[2].id, "title": "Inst_ts",
+                                            "compute_resource_name": "host"}])}]}})
+
+        with mock.patch('plugininstances.tasks.run_plugin_instance_job'):
+            self.client.login(username=self.username, password=self.password)
+            response = self.client.post(self.create_read_url, data=post,
+                                        content_type=self.content_type)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        inst_ds1 = PluginInstance.objects.get(title="Inst_ds1")
+        inst_ds2 = PluginInstance.objects.get(title="Inst_ds2")
+        inst_ts = PluginInstance.objects.get(title="Inst_ts")
+        self.assertEqual(inst_ds1.previous, self.pl_inst)
+        self.assertEqual(inst_ds2.previous, inst_ds1)
+        self.assertEqual(inst_ts.previous, inst_ds1)
+        self.assertEqual(inst_ds2.feed, self.pl_inst.feed)
+        self.assertEqual(inst_ds2.lineage,
+                         f'/{self.pl_inst.id}/{inst_ds1.id}/{inst_ds2.id}/')
+        self.assertEqual(inst_ds2.get_output_path(),
+                         f'{self.pl_inst.output_folder.parent.path}/'
+                         f'{self.plugin_ds_name}_{inst_ds1.id}/'
+                         f'{self.plugin_ds_name}_{inst_ds2.id}/data')
+        self.assertEqual(inst_ds2.output_folder.parent.parent,
+                         inst_ds1.output_folder.parent)
+        self.assertEqual(set(inst_ts.ts_parents.all()), {inst_ds1, inst_ds2})
+        param = inst_ts.string_param.get(plugin_param__name='plugininstances')
+        self.assertEqual(param.value, f'{inst_ds1.id},{inst_ds2.id}')
+        self.assertEqual(inst_ds2.status, 'waiting')
+        self.assertEqual(inst_ts.status, 'waiting')
+
     def test_workflow_list_success(self):
         pipeline = Pipeline.objects.get(name=self.pipeline_name)
         owner = User.objects.get(username=self.username)
@@ -1,5 +1,5 @@
 
-from typing import List, Dict
+from typing import List, Dict, Optional
 from collections import deque
 
 from rest_framework import generics, permissions
@@ -8,9 +8,10 @@ from drf_spectacular.utils import extend_schema, extend_schema_view
 
 from collectionjson import services
 from pipelines.models import Pipeline
-from plugininstances.models import PluginInstance, PARAMETER_MODELS
+from plugininstances.models import PluginInstance
 from plugininstances.serializers import PluginInstanceSerializer
 from plugininstances.utils import run_if_ready
+from plugininstances.services.dagbuilder import PluginInstanceDAGBuilder
 from plugininstances.tasks import cancel_plugin_instance_job
 from ._types import (GivenNodeInfo, WorkflowPluginInstanceTemplateFactory,
                      WorkflowPluginInstanceTemplate, PipingId)
@@ -34,7 +35,8 @@ class WorkflowList(generics.ListCreateAPIView):
         """
         Overriden to associate a pipeline with the newly created workflow before
         first saving to the DB. All the workflow's parameters in the request are
-        parsed and properly saved to the DB with the corresponding plugin instances.
+        parsed and properly saved to the DB with the corresponding plugin instances,
+        which are all created in bulk with a constant number of queries.
         """
         previous_plugin_inst = serializer.validated_data['previous_plugin_inst_id']
         nodes_info: List[GivenNodeInfo] = serializer.validated_data['nodes_info']
@@ -47,7 +49,9 @@ class WorkflowList(generics.ListCreateAPIView):
 
         pipings_tree = pipeline.get_pipings_tree()
         tree = pipings_tree['tree']
-        factory = WorkflowPluginInstanceTemplateFactory(tree=tree)
+        factory = WorkflowPluginInstanceTemplateFactory(
+            tree=tree,
+            previous_compute_resource_id=previous_plugin_inst.compute_resource_id)
 
         inst_data: Dict[PipingId, WorkflowPluginInstanceTemplate] = {
             info['piping_id']: factory.inflate(info)
@@ -55,41 +59,28 @@ class WorkflowList(generics.ListCreateAPIView):
         }
 
         root_id = pipings_tree['root_id']
-        plugin_inst = self.create_plugin_inst(inst_data[root_id], previous_plugin_inst,
-                                              workflow)
-
-        plugin_instances_dict = {root_id: plugin_inst}  # map from pip id to plg inst id
-
+        builder = PluginInstanceDAGBuilder(self.request.user, previous_plugin_inst,
+                                           workflow)
         # breath-first traversal
-        plugin_inst_queue = deque()
-        plugin_inst_queue.append(plugin_inst)
         pip_id_queue = deque()
         pip_id_queue.append(root_id)
         while len(pip_id_queue):
             curr_id = pip_id_queue.popleft()
-            curr_plugin_inst = plugin_inst_queue.popleft()
-            child_ids = tree[curr_id]['child_ids']
-            for id in child_ids:
-                plugin_inst = self.create_plugin_inst(inst_data[id], curr_plugin_inst,
-                                                      workflow)
-                plugin_instances_dict[id] = plugin_inst
-                pip_id_queue.append(id)
-                plugin_inst_queue.append(plugin_inst)
-
-        # update 'plugininstances' param with parent plg inst ids for any 'ts' plg inst
-        for plg_inst in plugin_instances_dict.values():
-            if plg_inst.plugin.meta.type == 'ts':
-                param = plg_inst.string_param.filter(
-                    plugin_param__name='plugininstances').first()
-                if param and param.value:
-                    parent_pip_ids = [int(pip_id) for pip_id in param.value.split(',')]
-                    parent_plg_inst_ids = [str(plugin_instances_dict[pip_id].id) for
-                                           pip_id in parent_pip_ids]
-                    param.value = ','.join(parent_plg_inst_ids)
-                    param.save()
-
-            # run plugin instance
-            run_if_ready(plg_inst, plg_inst.previous)
+            self.add_plugin_inst_node(builder, curr_id, inst_data[curr_id],
+                                      None if curr_id == root_id else
+                                      tree[curr_id]['piping'].previous_id)
+            pip_id_queue.extend(tree[curr_id]['child_ids'])
+
+        # map from pip id to plg inst
+        plugin_instances_dict = builder.create()
+
+        # run the root plugin instance, the others wait for their parents
+        root_plg_inst = plugin_instances_dict[root_id]
+        run_if_ready(root_plg_inst, previous_plugin_inst)
+        if root_plg_inst.status == 'cancelled':
+            PluginInstance.objects.filter(workflow=workflow, status='waiting').update(
+                status='cancelled',
+                timeline=PluginInstance.merge_timeline_events('cancelled'))
 
     def list(self, request, *args, **kwargs):
         """
@@ -115,26 +106,24 @@ class WorkflowList(generics.ListCreateAPIView):
         pipeline = self.get_object()
         return Workflow.add_jobs_status_count(pipeline.workflows.all())
 
-    def create_plugin_inst(self, data: WorkflowPluginInstanceTemplate, previous:
-    PluginInstance, workflow: Workflow) -> PluginInstance:
-        """
-        Custom method to create a plugin instance and set its parameters.
-        """
-        plg_inst = PluginInstance.objects.create(
-            plugin=data.piping.plugin,
-            owner=self.request.user,
-            previous=previous,
-            title=data.title,
-            compute_resource=data.compute_resource,
-            workflow=workflow
-        )
-        for plugin_param, value in data.params:
-            PARAMETER_MODELS[plugin_param.type].objects.create(
-                plugin_inst=plg_inst,
-                plugin_param=plugin_param,
-                value=value
-            )
-        return plg_inst
+    @staticmethod
+    def add_plugin_inst_node(builder: PluginInstanceDAGBuilder, pip_id: PipingId,
+                             data: WorkflowPluginInstanceTemplate,
+                             previous_pip_id: Optional[PipingId]):
+        """
+        Custom method to add a plugin instance and its parameters to the DAG builder.
+        The parents of a 'ts' plugin instance are given by the pipings' ids in its
+        'plugininstances' parameter.
+        """
+        ts_parent_pip_ids = []
+        if data.piping.plugin.meta.type == 'ts':
+            for plugin_param, value in data.params:
+                if plugin_param.name == 'plugininstances' and value:
+                    ts_parent_pip_ids = [int(pip_id) for pip_id in value.split(',')]
+        builder.add_node(pip_id, data.piping.plugin, data.compute_resource,
+                         title=data.title, params=data.params,
+                         previous_key=previous_pip_id, ts_parent_keys=ts_parent_pip_ids,
+                         status='created' if previous_pip_id is None else 'waiting')
 
 
 @extend_schema_view(